@@ -1,17 +1,64 @@
+from importlib import import_module
+from typing import Any, List
 from .data import zipcodes, zipcodes_IT, readme as readme_data
-from .italy import Italy, readme as readme_italy
-from .datamodel import configuration, ZipCodes, ZipCodesIT, SqlEngine, Controller, readme as readme_datamodel
+
+# The attributes imported on first access, with the module and the name defining them (None for the module itself),
+# so that importing the package pulls in neither pandas nor SQLAlchemy until they are needed.
+LAZY = {
+    'Italy': ('.italy', 'Italy'),
+    'readme_italy': ('.italy', 'readme'),
+    'configuration': ('.datamodel.configuration', None),
+    'ZipCodes': ('.datamodel', 'ZipCodes'),
+    'ZipCodesIT': ('.datamodel', 'ZipCodesIT'),
+    'SqlEngine': ('.datamodel', 'SqlEngine'),
+    'Controller': ('.datamodel', 'Controller'),
+    'AsyncController': ('.datamodel', 'AsyncController'),
+    'metrics': ('.datamodel', 'metrics'),
+    'readme_datamodel': ('.datamodel', 'readme'),
+}
 
 __all__ = [
-    zipcodes,
-    zipcodes_IT,
-    readme_data,
-    Italy,
-    readme_italy,
-    configuration,
-    ZipCodes,
-    ZipCodesIT,
-    SqlEngine,
-    Controller,
-    readme_datamodel,
-]
\ No newline at end of file
+    'zipcodes',
+    'zipcodes_IT',
+    'readme_data',
+    'Italy',
+    'readme_italy',
+    'configuration',
+    'ZipCodes',
+    'ZipCodesIT',
+    'SqlEngine',
+    'Controller',
+    'AsyncController',
+    'metrics',
+    'readme_datamodel',
+]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    It imports the module defining the given attribute on its first access and caches the attribute.
+
+    :param name: The name of the attribute.
+    :type name: str.
+
+    :return: See description.
+    :rtype: Any.
+    """
+    if name not in LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module, attribute = LAZY[name]
+    value = import_module(module, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """
+    It lists the attributes of the package, the ones not imported yet included.
+
+    :return: See description.
+    :rtype: List[str].
+    """
+    return sorted(set(globals()) | set(LAZY))
@@ -0,0 +1,157 @@
+from argparse import ArgumentParser, Namespace
+from logging import getLogger
+from pathlib import Path
+from sqlite3 import Error as SQLiteError
+from sys import exit, argv
+from typing import Any, Dict, List, Optional as Opt, Tuple
+
+from datamodel.configuration import configuration as cfg
+from datamodel.memoryindex import CountryIndex, load_country
+from datamodel.mmapindex import MAGIC, HEADER, COUNTRY, ENTRY, REF
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+
+class Pool:
+    """
+    String pool of the index, every distinct string is stored once.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self.data = bytearray()
+        self.refs = {}
+        self.base = 0
+
+    def ref(self, value: Any) -> Tuple[int, int]:
+        """
+        Store the given value, if not already there, and return its reference.
+
+        :arg value: Placename or canonical postal code.
+        :type value: Any.
+
+        :return: Absolute offset and length of the string.
+        :rtype: Tuple[int, int].
+        """
+        encoded = f'{value}'.encode('utf-8')
+        offset = self.refs.get(encoded)
+        if offset is None:
+            offset = self.refs[encoded] = len(self.data)
+            self.data.extend(encoded)
+        return self.base + offset, len(encoded)
+
+
+def tables(index: CountryIndex) -> List[List[Tuple[Any, List[Any]]]]:
+    """
+    Return the placename and the zipcode tables of a country, each one sorted by key bytes, the zipcodes keyed by their
+    canonical postal codes.
+
+    :arg index: In-memory index of the country.
+    :type index: CountryIndex.
+
+    :return: Both tables as lists of (key, values) pairs.
+    :rtype: List[List[Tuple[Any, List[Any]]]].
+    """
+    offsets, ids = index.place_postings
+    places = [(place, [index.zipcodes[i] for i in ids[offsets[n]:offsets[n + 1]]])
+              for n, place in enumerate(index.places)]
+    offsets, ids = index.zipcode_postings
+    zipcodes = [(key, [index.places[i] for i in ids[offsets[n]:offsets[n + 1]]])
+                for key, n in index.zipcode_ids.items()]
+    return [sorted(table, key=lambda item: f'{item[0]}'.encode('utf-8')) for table in (places, zipcodes)]
+
+
+def compile_index(countries: Dict[str, CountryIndex], path: Path) -> None:
+    """
+    Write the memory-mappable index of the given countries.
+
+    :arg countries: In-memory indexes keyed by country code.
+    :type countries: Dict[str, CountryIndex].
+
+    :arg path: Destination file.
+    :type path: Path.
+    """
+    codes = sorted(countries)
+    country_tables = {code: tables(countries[code]) for code in codes}
+    entries = sum(len(table) for code in codes for table in country_tables[code])
+    postings = sum(len(values) for code in codes for table in country_tables[code] for _, values in table)
+
+    entry_base = HEADER.size + COUNTRY.size * len(codes)
+    posting_base = entry_base + ENTRY.size * entries
+    pool = Pool()
+    pool.base = posting_base + REF.size * postings
+
+    directory = bytearray(HEADER.pack(MAGIC, len(codes)))
+    entry_data = bytearray()
+    posting_data = bytearray()
+    for code in codes:
+        offsets = []
+        for table in country_tables[code]:
+            offsets.append((entry_base + len(entry_data), len(table)))
+            for key, values in table:
+                entry_data.extend(ENTRY.pack(
+                    *pool.ref(key), posting_base + len(posting_data), len(values)
+                ))
+                for value in values:
+                    posting_data.extend(REF.pack(*pool.ref(value)))
+        directory.extend(COUNTRY.pack(code.encode('ascii'), countries[code].width, *offsets[0], *offsets[1]))
+
+    with open(path, 'wb') as target:
+        for data in (directory, entry_data, posting_data, pool.data):
+            target.write(data)
+
+
+def usage(args: List[str]) -> Opt[Namespace]:
+    """
+    Parse command line arguments.
+
+    :arg args: Command line arguments
+    :type args: List[str].
+
+    :return: Parsed arguments if successful, None otherwise.
+    :rtype: Optional[Namespace].
+    """
+    helps = {
+        'mode': 'Mode of operation',
+        'output': 'Index file, defaults to the configured one',
+    }
+
+    parser = ArgumentParser(description='Compile the per-country databases into a single memory-mappable index.')
+    parser.add_argument('mode', choices=['compile'], help=helps['mode'])
+    parser.add_argument('--output', type=Path, default=cfg['index_file'], help=helps['output'])
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    Main entry point.
+
+    :arg args: Parsed command line arguments.
+    :type args: Namespace.
+
+    :return: Exit status code.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    if args.mode == 'compile':
+        try:
+            countries = {}
+            for path in sorted(cfg['db_folder'].glob('zipcodes_*.db')):
+                code = path.stem[len('zipcodes_'):]
+                index = load_country(code)
+                if index is not None:
+                    countries[code] = index
+            compile_index(countries, args.output)
+            logger.info(f'{args.output}: {len(countries)} countries')
+        except (SQLiteError, IOError) as e:
+            logger.error(f'{e.__str__()}')
+            return EXIT_FAILURE
+
+    return EXIT_SUCCESS
+
+
+if __name__ == '__main__':
+    exit(main(usage(argv[1:])))
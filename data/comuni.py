@@ -0,0 +1,148 @@
+"""
+It builds the Italian database, zipcodes_IT.db, from the list of the Italian comuni loaded by the Italy class: the
+columns of the data frame are inserted in bulk in one transaction with the bulk pragmas, together with the normalized
+placenames and the canonical postal codes, then the lookup indexes are created. The database is written to a
+temporary file replacing the existing one only once complete.
+"""
+
+from argparse import ArgumentParser, Namespace
+from logging import getLogger, basicConfig, INFO
+from os import replace
+from pathlib import Path
+from sqlite3 import connect, Error as SQLiteError
+from sys import exit, argv
+from time import perf_counter
+from typing import List, Optional as Opt
+
+from pandas import DataFrame
+
+from datamodel.configuration import configuration as cfg
+from datamodel.normalize import keywidth, placekey, postalkey
+from italy.italy import Italy
+from splitter import BULK_PRAGMAS, INDEXES, create_indexes
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+# The character replacing the bytes that could not be decoded, which must not end up in the database.
+REPLACEMENT = '\ufffd'
+
+# noinspection SqlNoDataSourceInspection
+TABLE = '''
+CREATE TABLE "listacomuni" (
+    "Istat"	    INTEGER,
+    "Comune"	TEXT,
+    "Provincia"	TEXT,
+    "Regione"	TEXT,
+    "Prefisso"	INTEGER,
+    "CAP"	    INTEGER,
+    "CodFisco"	TEXT,
+    "Abitanti"	INTEGER,
+    "Link"	    TEXT,
+    "placekey"	TEXT,
+    "postalkey"	TEXT);
+'''
+
+# The columns of the table, in the order of the list of the comuni.
+COLUMNS = ('Istat', 'Comune', 'Provincia', 'Regione', 'Prefisso', 'CAP', 'CodFisco', 'Abitanti', 'Link')
+
+
+def build(frame: DataFrame, path: Path) -> int:
+    """
+    Write the list of the comuni to the given database in one transaction with the bulk pragmas, then index it. The
+    temporary database is removed on failure, leaving the existing one untouched. It raises ValueError when some names
+    hold the Unicode replacement character, left by a wrong decoding of the list.
+
+    :arg frame: List of the comuni, as loaded by the Italy class.
+    :type frame: DataFrame.
+
+    :arg path: Database to write.
+    :type path: Path.
+
+    :return: Number of rows written.
+    :rtype: int.
+    """
+    garbled = frame['Comune'][frame['Comune'].str.contains(REPLACEMENT, regex=False)]
+    if len(garbled):
+        raise ValueError(f'{len(garbled)} comuni were decoded with the wrong encoding, e.g. {garbled.iloc[0]}')
+    placekeys = frame['Comune'].map(lambda comune: placekey(comune, 'IT'))
+    width = keywidth(frame['CAP'])
+    postalkeys = frame['CAP'].map(lambda cap: postalkey(cap, width))
+    # Missing values, e.g. the nullable population, are written as NULL.
+    values = frame[list(COLUMNS)].astype(object)
+    values = values.where(frame[list(COLUMNS)].notna(), None)
+    columns = [values[column].tolist() for column in COLUMNS] + [placekeys.tolist(), postalkeys.tolist()]
+    temporary = path.with_name(f'{path.name}.tmp')
+    if temporary.exists():
+        temporary.unlink()
+    connection = connect(temporary, isolation_level=None)
+    try:
+        try:
+            for pragma in BULK_PRAGMAS:
+                connection.execute(pragma)
+            connection.execute('BEGIN')
+            connection.execute(TABLE)
+            connection.executemany(f'INSERT INTO "listacomuni" VALUES ({", ".join("?" * len(columns))})',
+                                   zip(*columns))
+            create_indexes(connection, INDEXES)
+            connection.execute('VACUUM')
+        finally:
+            connection.close()
+        replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    return len(frame)
+
+
+def usage(args: List[str]) -> Opt[Namespace]:
+    """
+    Parse command line arguments.
+
+    :arg args: Command line arguments
+    :type args: List[str].
+
+    :return: Parsed arguments if successful, None otherwise.
+    :rtype: Optional[Namespace].
+    """
+    helps = {
+        'source': 'Folder of listacomuni.zip or listacomuni.txt, downloaded if missing, the data folder by default',
+        'output': 'Database to write, zipcodes_IT.db in the database folder by default',
+    }
+
+    parser = ArgumentParser(description='Build the Italian database from the list of the Italian comuni.')
+    parser.add_argument('--source', type=Path, help=helps['source'])
+    parser.add_argument('--output', type=Path, default=cfg['db_folder'] / 'zipcodes_IT.db', help=helps['output'])
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    Main entry point.
+
+    :arg args: Parsed command line arguments.
+    :type args: Namespace.
+
+    :return: Exit status code.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    start = perf_counter()
+    italy = Italy(args.source)
+    if not italy.ready():
+        logger.error('The list of the comuni could not be loaded')
+        return EXIT_FAILURE
+
+    try:
+        rows = build(italy.dataframe, args.output)
+    except (SQLiteError, ValueError) as e:
+        logger.error(f'{e.__str__()}')
+        return EXIT_FAILURE
+
+    logger.info(f'{args.output.name}: {rows} rows in {perf_counter() - start:.2f} s')
+    return EXIT_SUCCESS
+
+
+if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
+    exit(main(usage(argv[1:])))
@@ -0,0 +1,298 @@
+"""
+It applies a GeoNames postal code dump (a per-country or the allCountries text file, or its zip archive) to the
+per-country databases incrementally: each country present in the dump is diffed against its database by row hash and
+only the inserted, updated and deleted rows are written, in one transaction per country. Untouched countries are not
+written at all, countries without a database get a new one.
+"""
+
+from argparse import ArgumentParser, Namespace
+from csv import reader as csv_reader, QUOTE_NONE
+from hashlib import blake2b
+from io import TextIOWrapper
+from itertools import groupby
+from json import dump
+from logging import getLogger, basicConfig, INFO
+from operator import itemgetter
+from pathlib import Path
+from sqlite3 import connect, Connection, Error as SQLiteError
+from sys import exit, argv
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional as Opt, Tuple
+from zipfile import ZipFile, BadZipFile
+
+from countrycodes import countrycodes
+from datamodel.configuration import configuration as cfg
+from datamodel.normalize import keywidth, placekey
+from splitter import COLUMNS, INDEXES, TABLE, add_postalkeys, create_indexes, write_country
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+# The temporary table the rows of the dump are loaded into, so that they get the column affinities of the databases.
+INCOMING = TABLE.replace('CREATE TABLE "geonames-postal-code"', 'CREATE TEMP TABLE "incoming"')
+
+
+class Changes(NamedTuple):
+    """
+    The changes applied to the database of a country.
+    """
+
+    country: str
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+    created: bool
+
+
+def rows(path: Path) -> Iterator[Tuple[Opt[str], ...]]:
+    """
+    Stream the rows of a GeoNames postal code dump, empty fields as None and the coordinates column added.
+
+    :arg path: Dump, either a tab separated text file or a zip archive holding one.
+    :type path: Path.
+
+    :return: It yields the rows with the columns in the order of COLUMNS.
+    :rtype: Iterator[Tuple[Opt[str], ...]].
+    """
+    def parse(lines: Iterator[str]) -> Iterator[Tuple[Opt[str], ...]]:
+        for fields in csv_reader(lines, delimiter='\t', quoting=QUOTE_NONE):
+            if not fields:
+                continue
+            fields = [field.strip() or None for field in fields[:len(COLUMNS) - 1]]
+            fields += [None] * (len(COLUMNS) - 1 - len(fields))
+            latitude, longitude = fields[9], fields[10]
+            yield tuple(fields) + (f'{latitude}, {longitude}' if latitude and longitude else None,)
+
+    if path.suffix.lower() != '.zip':
+        with open(path, encoding='utf-8', newline='') as source:
+            yield from parse(source)
+        return
+
+    with ZipFile(path) as archive:
+        for name in archive.namelist():
+            if name.lower().endswith('.txt') and not name.lower().endswith('readme.txt'):
+                with TextIOWrapper(archive.open(name), encoding='utf-8', newline='') as source:
+                    yield from parse(source)
+
+
+def countries(path: Path) -> Iterator[Tuple[str, List[Tuple[Opt[str], ...]]]]:
+    """
+    Group the rows of a dump by country, the dumps listing the rows of each country together.
+
+    :arg path: Dump, either a tab separated text file or a zip archive holding one.
+    :type path: Path.
+
+    :return: It yields each country code with its rows.
+    :rtype: Iterator[Tuple[str, List[Tuple[Opt[str], ...]]]].
+    """
+    seen = set()
+    for code, group in groupby(rows(path), key=itemgetter(0)):
+        if code in seen:
+            raise ValueError(f'The rows of {code} are not contiguous in {path}')
+        seen.add(code)
+        yield code, list(group)
+
+
+def digest(row: Tuple[Any, ...]) -> bytes:
+    """
+    Hash a row of a country.
+
+    :arg row: Row, with the columns in the order of COLUMNS.
+    :type row: Tuple[Any, ...].
+
+    :return: Digest of the row.
+    :rtype: bytes.
+    """
+    return blake2b(repr(row).encode('utf-8'), digest_size=16).digest()
+
+
+def diff(connection: Connection, incoming: List[Tuple[Opt[str], ...]]) \
+        -> Tuple[List[int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[Any, ...]], int]:
+    """
+    Compare the rows of a database with the ones of the dump by row hash. A row of the database and a row of the dump
+    having the same postal code and placename but a different hash are an update.
+
+    :arg connection: Connection to the database of the country.
+    :type connection: Connection.
+
+    :arg incoming: Rows of the country in the dump.
+    :type incoming: List[Tuple[Opt[str], ...]].
+
+    :return: Rowids to delete, rowids to update with their new rows, rows to insert and number of unchanged rows.
+    :rtype: Tuple[List[int], List[Tuple[int, Tuple[Any, ...]]], List[Tuple[Any, ...]], int].
+    """
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    connection.execute('DROP TABLE IF EXISTS temp."incoming"')
+    connection.execute(INCOMING)
+    connection.executemany(f'INSERT INTO "incoming" VALUES ({", ".join("?" * len(COLUMNS))}, NULL, NULL)', incoming)
+    typed = connection.execute(f'SELECT {columns} FROM "incoming"').fetchall()
+    connection.execute('DROP TABLE temp."incoming"')
+
+    existing: Dict[bytes, List[Tuple[int, Tuple[Any, ...]]]] = {}
+    for rowid, *row in connection.execute(f'SELECT rowid, {columns} FROM "geonames-postal-code"'):
+        existing.setdefault(digest(tuple(row)), []).append((rowid, (row[1], row[2])))
+
+    added = []
+    unchanged = 0
+    for row in typed:
+        matches = existing.get(digest(row))
+        if matches:
+            matches.pop()
+            unchanged += 1
+        else:
+            added.append(row)
+
+    removed: Dict[Tuple[Any, Any], List[int]] = {}
+    for matches in existing.values():
+        for rowid, key in matches:
+            removed.setdefault(key, []).append(rowid)
+    updates = []
+    inserts = []
+    for row in added:
+        rowids = removed.get((row[1], row[2]))
+        if rowids:
+            updates.append((rowids.pop(), row))
+        else:
+            inserts.append(row)
+    deletes = [rowid for rowids in removed.values() for rowid in rowids]
+    return deletes, updates, inserts, unchanged
+
+
+def apply(folder: Path, code: str, incoming: List[Tuple[Opt[str], ...]], dry_run: bool = False) -> Changes:
+    """
+    Apply the rows of a country in the dump to its database in one transaction, creating the database if missing. The
+    canonical postal codes are computed again for all the rows, since the new ones may change their width, which is
+    taken from the postal codes of the dump as well since they keep their leading zeros.
+
+    :arg folder: Folder of the per-country databases.
+    :type folder: Path.
+
+    :arg code: Country code.
+    :type code: str.
+
+    :arg incoming: Rows of the country in the dump.
+    :type incoming: List[Tuple[Opt[str], ...]].
+
+    :arg dry_run: Whether to compute the changes without writing them.
+    :type dry_run: bool.
+
+    :return: Changes applied.
+    :rtype: Changes.
+    """
+    path = folder / f'zipcodes_{code}.db'
+    if not path.exists():
+        if not dry_run:
+            write_country(folder, code, incoming)
+        return Changes(code, len(incoming), 0, 0, 0, True)
+
+    connection = connect(path, isolation_level=None)
+    try:
+        deletes, updates, inserts, unchanged = diff(connection, incoming)
+        if not dry_run and (deletes or updates or inserts):
+            assignments = ', '.join(f'"{column}" = ?' for column in COLUMNS + ('placekey',))
+            connection.execute('BEGIN')
+            connection.executemany('DELETE FROM "geonames-postal-code" WHERE rowid = ?',
+                                   [(rowid,) for rowid in deletes])
+            connection.executemany(f'UPDATE "geonames-postal-code" SET {assignments} WHERE rowid = ?',
+                                   [row + (placekey(row[2], code), rowid) for rowid, row in updates])
+            connection.executemany(
+                f'INSERT INTO "geonames-postal-code" VALUES ({", ".join("?" * (len(COLUMNS) + 1))}, NULL)',
+                [row + (placekey(row[2], code),) for row in inserts])
+            add_postalkeys(connection, code, keywidth(row[1] for row in incoming))
+            create_indexes(connection, INDEXES)
+        return Changes(code, len(inserts), len(updates), len(deletes), unchanged, False)
+    finally:
+        connection.close()
+
+
+def ingest(path: Path, folder: Path, dry_run: bool = False) -> List[Changes]:
+    """
+    Apply a dump to the per-country databases, Italy excluded since it has a more complete dataset.
+
+    :arg path: Dump, either a tab separated text file or a zip archive holding one.
+    :type path: Path.
+
+    :arg folder: Folder of the per-country databases.
+    :type folder: Path.
+
+    :arg dry_run: Whether to compute the changes without writing them.
+    :type dry_run: bool.
+
+    :return: Changes of each country in the dump.
+    :rtype: List[Changes].
+    """
+    logger = getLogger(__name__)
+    report = []
+    for code, incoming in countries(path):
+        if code not in countrycodes or code == 'IT':
+            logger.info(f'{code}: skipped, {len(incoming)} rows')
+            continue
+        changes = apply(folder, code, incoming, dry_run)
+        report.append(changes)
+        if changes.created:
+            logger.info(f'{code}: created with {changes.inserted} rows')
+        elif changes.inserted or changes.updated or changes.deleted:
+            logger.info(f'{code}: {changes.inserted} inserted, {changes.updated} updated, '
+                        f'{changes.deleted} deleted, {changes.unchanged} unchanged')
+    return report
+
+
+def usage(args: List[str]) -> Opt[Namespace]:
+    """
+    Parse command line arguments.
+
+    :arg args: Command line arguments
+    :type args: List[str].
+
+    :return: Parsed arguments if successful, None otherwise.
+    :rtype: Optional[Namespace].
+    """
+    helps = {
+        'dump': 'GeoNames postal code dump, e.g. allCountries.zip or DE.txt from download.geonames.org/export/zip',
+        'output': 'Folder of the per-country databases, the database folder by default',
+        'report': 'JSON file the changes of each country are saved to',
+        'dry_run': 'Report the changes without writing them',
+    }
+
+    parser = ArgumentParser(description='Apply a GeoNames postal code dump to the per-country databases.')
+    parser.add_argument('dump', type=Path, help=helps['dump'])
+    parser.add_argument('--output', type=Path, default=cfg['db_folder'], help=helps['output'])
+    parser.add_argument('--report', type=Path, help=helps['report'])
+    parser.add_argument('--dry-run', action='store_true', help=helps['dry_run'])
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    Main entry point.
+
+    :arg args: Parsed command line arguments.
+    :type args: Namespace.
+
+    :return: Exit status code.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    try:
+        start = perf_counter()
+        report = ingest(args.dump, args.output, args.dry_run)
+    except (BadZipFile, IOError, SQLiteError, ValueError) as e:
+        logger.error(f'{e.__str__()}')
+        return EXIT_FAILURE
+
+    totals = {field: sum(getattr(changes, field) for changes in report) for field in Changes._fields[1:]}
+    touched = sum(1 for changes in report if changes.inserted or changes.updated or changes.deleted)
+    logger.info(f'{len(report)} countries in {perf_counter() - start:.2f} s, {touched} changed '
+                f'({totals["created"]} created): {totals["inserted"]} inserted, {totals["updated"]} updated, '
+                f'{totals["deleted"]} deleted, {totals["unchanged"]} unchanged'
+                f'{" (dry run)" if args.dry_run else ""}')
+    if args.report:
+        with open(args.report, 'w') as target:
+            dump([changes._asdict() for changes in report], target, indent=2)
+    return EXIT_SUCCESS
+
+
+if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
+    exit(main(usage(argv[1:])))
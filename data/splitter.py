@@ -1,16 +1,19 @@
 from argparse import ArgumentParser, Namespace
-from logging import getLogger
-from sqlite3 import connect
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, groupby
+from logging import getLogger, basicConfig, INFO
+from operator import itemgetter
+from os import cpu_count, replace
+from pathlib import Path
+from sqlite3 import connect, Connection, Error as SQLiteError
 from sys import exit, argv
-from typing import List, Optional as Opt
-
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from time import perf_counter
+from typing import Any, Deque, Dict, Iterator, List, Optional as Opt, Tuple
 
 from countrycodes import countrycodes
-from datamodel import SqlEngine
-from datamodel import ZipCodes
 from datamodel.configuration import configuration as cfg
+from datamodel.normalize import keywidth, placekey, postalkey
 
 EXIT_SUCCESS = 0
 EXIT_FAILURE = 1
@@ -30,9 +33,267 @@ CREATE TABLE "geonames-postal-code" (
     "latitude"	    REAL,
     "longitude"	    REAL,
     "accuracy"	    INTEGER,
-    "coordinates"	TEXT);
+    "coordinates"	TEXT,
+    "placekey"	    TEXT,
+    "postalkey"	    TEXT);
 '''
 
+# The columns of the source table, in the order of the per-country tables.
+COLUMNS = ('countrycode', 'postalcode', 'placename', 'adminname1', 'admincode1', 'adminname2', 'admincode2',
+           'adminname3', 'admincode3', 'latitude', 'longitude', 'accuracy', 'coordinates')
+
+# The pragmas of a database being written from scratch: nothing to recover if the process dies, it is rebuilt.
+BULK_PRAGMAS = (
+    'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',
+)
+
+# noinspection SqlNoDataSourceInspection
+INDEXES = {
+    'geonames-postal-code': [
+        'CREATE INDEX IF NOT EXISTS "idx_placename" ON "geonames-postal-code" ("placename", "postalcode")',
+        'CREATE INDEX IF NOT EXISTS "idx_postalcode" ON "geonames-postal-code" ("postalcode", "placename")',
+        'CREATE INDEX IF NOT EXISTS "idx_placekey" ON "geonames-postal-code" ("placekey", "postalcode")',
+        'CREATE INDEX IF NOT EXISTS "idx_postalkey" ON "geonames-postal-code" ("postalkey", "placename")',
+    ],
+    'listacomuni': [
+        'CREATE INDEX IF NOT EXISTS "idx_comune" ON "listacomuni" ("Comune", "CAP")',
+        'CREATE INDEX IF NOT EXISTS "idx_cap" ON "listacomuni" ("CAP", "Comune")',
+        'CREATE INDEX IF NOT EXISTS "idx_comunekey" ON "listacomuni" ("placekey", "CAP")',
+        'CREATE INDEX IF NOT EXISTS "idx_capkey" ON "listacomuni" ("postalkey", "Comune")',
+        'CREATE UNIQUE INDEX IF NOT EXISTS "idx_istat" ON "listacomuni" ("Istat")',
+        'CREATE INDEX IF NOT EXISTS "idx_codfisco" ON "listacomuni" ("CodFisco")',
+    ],
+}
+
+
+def create_indexes(connection: Connection, indexes: Dict[str, List[str]]) -> None:
+    """
+    Create the lookup indexes of the tables found in the database and refresh the planner statistics.
+
+    :arg connection: Connection to the database.
+    :type connection: Connection.
+
+    :arg indexes: Index statements keyed by table name.
+    :type indexes: Dict[str, List[str]].
+    """
+    cursor = connection.cursor()
+    tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, statements in indexes.items():
+        if table not in tables:
+            continue
+        for statement in statements:
+            cursor.execute(statement)
+    cursor.execute('ANALYZE')
+    connection.commit()
+
+
+def repair_columns(connection: Connection, code: str) -> int:
+    """
+    Swap back "countrycode" and "postalcode" in the rows written with the two columns exchanged.
+
+    :arg connection: Connection to the database.
+    :type connection: Connection.
+
+    :arg code: Country code of the database.
+    :type code: str.
+
+    :return: Number of repaired rows.
+    :rtype: int.
+    """
+    cursor = connection.execute('UPDATE "geonames-postal-code" '
+                                'SET "countrycode" = "postalcode", "postalcode" = "countrycode" '
+                                'WHERE "postalcode" = ? AND "countrycode" <> ?', (code, code))
+    connection.commit()
+    return cursor.rowcount
+
+
+def add_placekeys(connection: Connection, code: str) -> None:
+    """
+    Add the "placekey" column, if missing, and fill it with the normalized placenames.
+
+    :arg connection: Connection to the database.
+    :type connection: Connection.
+
+    :arg code: Country code of the database.
+    :type code: str.
+    """
+    table, column = ('listacomuni', 'Comune') if code == 'IT' else ('geonames-postal-code', 'placename')
+    columns = {row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')}
+    if 'placekey' not in columns:
+        connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "placekey" TEXT')
+    connection.create_function('placekey', 2, placekey, deterministic=True)
+    connection.execute(f'UPDATE "{table}" SET "placekey" = placekey("{column}", ?)', (code,))
+    connection.commit()
+
+
+def add_postalkeys(connection: Connection, code: str, width: int = 0) -> None:
+    """
+    Add the "postalkey" column, if missing, and fill it with the canonical postal codes: zero padded to the width of
+    the longest postal code made of digits only, since the integer affinity of the postal code column drops the
+    leading zeros.
+
+    :arg connection: Connection to the database.
+    :type connection: Connection.
+
+    :arg code: Country code of the database.
+    :type code: str.
+
+    :arg width: Minimum width, e.g. the one of the postal codes of a dump, leading zeros included.
+    :type width: int.
+    """
+    table, column = ('listacomuni', 'CAP') if code == 'IT' else ('geonames-postal-code', 'postalcode')
+    columns = {row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')}
+    if 'postalkey' not in columns:
+        connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "postalkey" TEXT')
+    width = max(width, keywidth(row[0] for row in connection.execute(f'SELECT DISTINCT "{column}" FROM "{table}"')))
+    connection.create_function('postalkey', 2, postalkey, deterministic=True)
+    connection.execute(f'UPDATE "{table}" SET "postalkey" = postalkey("{column}", ?)', (width,))
+    connection.commit()
+
+
+def migrate(folder: Path) -> None:
+    """
+    Add the normalized placenames, the canonical postal codes and the lookup indexes to the per-country databases
+    already in the given folder.
+
+    :arg folder: Folder of the per-country databases.
+    :type folder: Path.
+    """
+    logger = getLogger(__name__)
+    for path in sorted(folder.glob('zipcodes_*.db')):
+        code = path.stem[len('zipcodes_'):]
+        connection = connect(path)
+        try:
+            if code != 'IT':
+                repaired = repair_columns(connection, code)
+                if repaired:
+                    logger.info(f'{path.name}: repaired {repaired} rows')
+            add_placekeys(connection, code)
+            add_postalkeys(connection, code)
+            create_indexes(connection, INDEXES)
+            connection.execute('VACUUM')
+            logger.info(f'{path.name}: indexed')
+        finally:
+            connection.close()
+
+
+def write_country(folder: Path, code: str, rows: List[Tuple[Any, ...]]) -> Tuple[str, int]:
+    """
+    Write the database of a country in one transaction with the bulk pragmas, then index it. The database is written
+    to a temporary file replacing the existing one only once complete, and removed on failure.
+
+    :arg folder: Folder of the per-country databases.
+    :type folder: Path.
+
+    :arg code: Country code.
+    :type code: str.
+
+    :arg rows: Rows of the country, with the columns in the order of COLUMNS.
+    :type rows: List[Tuple[Any, ...]].
+
+    :return: Country code and number of rows written.
+    :rtype: Tuple[str, int].
+    """
+    path = folder / f'zipcodes_{code}.db'
+    temporary = folder / f'zipcodes_{code}.db.tmp'
+    if temporary.exists():
+        temporary.unlink()
+    connection = connect(temporary, isolation_level=None)
+    try:
+        try:
+            for pragma in BULK_PRAGMAS:
+                connection.execute(pragma)
+            connection.execute('BEGIN')
+            connection.execute(TABLE)
+            width = keywidth(row[1] for row in rows)
+            connection.executemany(
+                f'INSERT INTO "geonames-postal-code" VALUES ({", ".join("?" * (len(COLUMNS) + 2))})',
+                (row + (placekey(row[2], code), postalkey(row[1], width)) for row in rows)
+            )
+            create_indexes(connection, INDEXES)
+        finally:
+            connection.close()
+        replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    return code, len(rows)
+
+
+def countries(source: Path, size: int) -> Iterator[Tuple[str, List[Tuple[Any, ...]]]]:
+    """
+    Stream the source table once, ordered by country code, and group its rows by country.
+
+    :arg source: Source database holding the rows of all the countries.
+    :type source: Path.
+
+    :arg size: Number of rows fetched at a time.
+    :type size: int.
+
+    :return: It yields each country code with its rows.
+    :rtype: Iterator[Tuple[str, List[Tuple[Any, ...]]]].
+    """
+    connection = connect(f'{source.absolute().as_uri()}?mode=ro', uri=True)
+    try:
+        columns = ', '.join(f'"{column}"' for column in COLUMNS)
+        cursor = connection.execute(f'SELECT {columns} FROM "geonames-postal-code" ORDER BY "countrycode"')
+        rows = chain.from_iterable(iter(lambda: cursor.fetchmany(size), []))
+        for code, group in groupby(rows, key=itemgetter(0)):
+            yield code, list(group)
+    finally:
+        connection.close()
+
+
+def split(source: Path, folder: Path, workers: int) -> Tuple[int, int]:
+    """
+    Split the source database into one database per country, Italy excluded since it has a more complete dataset,
+    writing the countries on a pool of worker processes while the source is still being read.
+
+    :arg source: Source database holding the rows of all the countries.
+    :type source: Path.
+
+    :arg folder: Folder of the per-country databases.
+    :type folder: Path.
+
+    :arg workers: Number of worker processes, 1 to write in the current process.
+    :type workers: int.
+
+    :return: Number of countries and rows written.
+    :rtype: Tuple[int, int].
+    """
+    logger = getLogger(__name__)
+    if not source.exists():
+        raise SQLiteError(f'No such database: {source}')
+    folder.mkdir(parents=True, exist_ok=True)
+    databases = total = 0
+
+    def done(code: str, count: int) -> None:
+        nonlocal databases, total
+        databases += 1
+        total += count
+        logger.info(f'zipcodes_{code}.db: {count} rows')
+
+    selected = ((code, rows) for code, rows in countries(source, cfg['batch_chunk_size'] * 20)
+                if code in countrycodes and code != 'IT')
+    if workers <= 1:
+        for code, rows in selected:
+            done(*write_country(folder, code, rows))
+        return databases, total
+
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for code, rows in selected:
+            pending.append(executor.submit(write_country, folder, code, rows))
+            while len(pending) > 2 * workers:
+                done(*pending.popleft().result())
+        while pending:
+            done(*pending.popleft().result())
+    return databases, total
+
 
 def usage(args: List[str]) -> Opt[Namespace]:
     """
@@ -45,11 +306,17 @@ def usage(args: List[str]) -> Opt[Namespace]:
     :rtype: Optional[Namespace].
     """
     helps = {
-        'mode': 'Mode of operation',
+        'mode': 'Mode of operation: split zipcodes.db, or index the per-country databases already there',
+        'source': 'Database to split, zipcodes.db in the database folder by default',
+        'output': 'Folder of the per-country databases, the database folder by default',
+        'workers': 'Number of worker processes writing the per-country databases',
     }
 
     parser = ArgumentParser(description='Split the database into chunks divided by countrycode.')
-    parser.add_argument('mode', choices=['split'], help=helps['mode'])
+    parser.add_argument('mode', choices=['split', 'index'], help=helps['mode'])
+    parser.add_argument('--source', type=Path, default=cfg['db_folder'] / 'zipcodes.db', help=helps['source'])
+    parser.add_argument('--output', type=Path, default=cfg['db_folder'], help=helps['output'])
+    parser.add_argument('--workers', type=int, default=cpu_count() or 1, help=helps['workers'])
     return parser.parse_args(args)
 
 
@@ -66,25 +333,17 @@ def main(args: Namespace) -> int:
     logger = getLogger(__name__)
     if args.mode == 'split':
         try:
-            engine = SqlEngine.get_sqlite_engine(cfg['db_folder'] / 'zipcodes.db')
-            for code, name in countrycodes.items():
-
-                # Skip Italy because we have a more complete dataset.
-                if code == 'IT':
-                    continue
-                with Session(bind=engine) as session, session.begin():
-                    data = session.query(ZipCodes).filter(ZipCodes.countrycode == code).all()
-                    if not data:
-                        continue
-                    connection = connect(cfg['db_folder'] / f'zipcodes_{code}.db')
-                    cursor = connection.cursor()
-                    cursor.execute(TABLE)
-                    cursor.executemany('INSERT INTO "geonames-postal-code" '
-                                       'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                       [d.to_tuple() for d in data])
-                    connection.commit()
-                    connection.close()
-        except SQLAlchemyError as e:
+            start = perf_counter()
+            count, rows = split(args.source, args.output, args.workers)
+            logger.info(f'Split {rows} rows into {count} databases in {perf_counter() - start:.2f} s')
+        except SQLiteError as e:
+            logger.error(f'{e.__str__()}')
+            return EXIT_FAILURE
+
+    if args.mode == 'index':
+        try:
+            migrate(args.output)
+        except SQLiteError as e:
             logger.error(f'{e.__str__()}')
             return EXIT_FAILURE
 
@@ -92,4 +351,5 @@ def main(args: Namespace) -> int:
 
 
 if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
     exit(main(usage(argv[1:])))
@@ -1,14 +1,57 @@
+from importlib import import_module
 from pathlib import Path
-from .model import ZipCodes, ZipCodesIT
-from .sqlengine import SqlEngine, Base
-from .controller import Controller
+from typing import Any, List
+
 readme = Path(__file__).parent / "ReadMe.md"
 
+# The attributes imported on first access, with the module defining them, so that importing the package does not pull
+# in SQLAlchemy until a class needing it is used.
+LAZY = {
+    'ZipCodes': '.model',
+    'ZipCodesIT': '.model',
+    'SqlEngine': '.sqlengine',
+    'Base': '.sqlengine',
+    'Controller': '.controller',
+    'AsyncController': '.asynccontroller',
+    # The modules of the package import each other by their top level names, so the metrics they update are the ones
+    # of the top level module.
+    'metrics': 'metrics',
+}
+
 __all__ = [
-    ZipCodes,
-    ZipCodesIT,
-    SqlEngine,
-    Controller,
-    Base,
-    readme,
+    'ZipCodes',
+    'ZipCodesIT',
+    'SqlEngine',
+    'Controller',
+    'AsyncController',
+    'metrics',
+    'Base',
+    'readme',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    It imports the module defining the given attribute on its first access and caches the attribute.
+
+    :param name: The name of the attribute.
+    :type name: str.
+
+    :return: See description.
+    :rtype: Any.
+    """
+    if name not in LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """
+    It lists the attributes of the package, the ones not imported yet included.
+
+    :return: See description.
+    :rtype: List[str].
+    """
+    return sorted(set(globals()) | set(LAZY))
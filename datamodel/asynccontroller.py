@@ -0,0 +1,183 @@
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import TracebackType
+from typing import Any, Callable, Dict, Iterable, List, Optional as Opt, Type
+from zlib import crc32
+from configuration import configuration as cfg
+from controller import Controller
+
+
+class AsyncController:
+    """
+    It exposes the Controller lookups as coroutines. The blocking work runs on a bounded set of single-threaded
+    executors and every country is always served by the same one, so that its connection never changes thread. The
+    wrapped controller is shared by the executors, so by default it reads the databases through the stdlib driver in
+    thread-safe mode, each executor thread keeping its own connections instead of queuing on a shared lock.
+    """
+
+    def __init__(self, controller: Opt[Controller] = None, workers: Opt[int] = None, **kwargs: Any) -> None:
+        """
+        Constructor.
+
+        :param controller: The wrapped controller, by default one is created with the given keyword arguments. A
+            controller on the 'sqlite' backend must be in thread-safe mode, else ValueError is raised.
+        :type controller: Opt[Controller].
+
+        :param workers: The number of worker threads, defaults to the configured one.
+        :type workers: Opt[int].
+
+        :param kwargs: The keyword arguments of the Controller created when none is given, the backend defaults to
+            'sqlite' and the thread-safe mode to True on the backends supporting it.
+        :type kwargs: Any.
+        """
+        if controller is None:
+            kwargs.setdefault('backend', 'sqlite')
+            kwargs.setdefault('thread_safe', kwargs['backend'] != 'orm')
+            controller = Controller(**kwargs)
+        elif controller.backend == 'sqlite' and not controller.thread_safe:
+            raise ValueError('A controller shared by the executors on the sqlite backend must be thread-safe')
+        self.controller = controller
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'zipcodes-{n}')
+            for n in range(workers or cfg['async_workers'])
+        ]
+
+    def executor(self, countrycode: str) -> ThreadPoolExecutor:
+        """
+        It gets the executor serving the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: See description.
+        :rtype: ThreadPoolExecutor.
+        """
+        return self._executors[crc32(countrycode.encode('utf-8')) % len(self._executors)]
+
+    async def run(self, countrycode: str, function: Callable[..., Any], *args: Any) -> Any:
+        """
+        It runs the given blocking function on the executor of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param function: The blocking function.
+        :type function: Callable[..., Any].
+
+        :param args: The positional arguments of the function.
+        :type args: Any.
+
+        :return: It returns the result of the function.
+        :rtype: Any.
+        """
+        return await get_running_loop().run_in_executor(self.executor(countrycode), partial(function, *args))
+
+    async def zipcode_by_placename(self, placename: str, countrycode: str, normalize: bool = False) -> Opt[str]:
+        """
+        It gets the zipcode of the place in placename or None.
+
+        :param placename: The name of the place to retrieve the zipcode from.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param normalize: Whether to ignore case, accents and punctuation.
+        :type normalize: bool.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None.
+        :rtype: Opt[str].
+        """
+        return await self.run(countrycode, self.controller.zipcode_by_placename, placename, countrycode,
+                              normalize)
+
+    async def placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
+        """
+        It gets the names of the places in the country with the given pair (countrycode, zipcode) or None.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode.
+        :type zipcode: int.
+
+        :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
+        :rtype: Opt[List[str]].
+        """
+        return await self.run(countrycode, self.controller.placenames_by_zipcode, countrycode, zipcode)
+
+    async def zipcodes_by_placenames(self, countrycode: str, placenames: Iterable[str],
+                                     normalize: bool = False) -> Dict[str, Opt[str]]:
+        """
+        It gets the zipcodes of many places of the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param placenames: The names of the places to retrieve the zipcodes from.
+        :type placenames: Iterable[str].
+
+        :param normalize: Whether to ignore case, accents and punctuation.
+        :type normalize: bool.
+
+        :return: It returns a mapping from each given placename to its canonical postal code or None.
+        :rtype: Dict[str, Opt[str]].
+        """
+        return await self.run(countrycode, self.controller.zipcodes_by_placenames, countrycode,
+                              list(placenames), normalize)
+
+    async def placenames_by_zipcodes(self, countrycode: str, zipcodes: Iterable[int]) -> Dict[int, Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes in the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The zipcodes.
+        :type zipcodes: Iterable[int].
+
+        :return: It returns a mapping from each given zipcode to the names of its places or None.
+        :rtype: Dict[int, Opt[List[str]]].
+        """
+        return await self.run(countrycode, self.controller.placenames_by_zipcodes, countrycode, list(zipcodes))
+
+    def _shutdown(self) -> None:
+        """
+        It waits for the pending work, then stops the executors and closes the wrapped controller.
+
+        :return: None.
+        :rtype: None.
+        """
+        for executor in self._executors:
+            executor.shutdown(wait=True)
+        self.controller.close()
+
+    async def close(self) -> None:
+        """
+        It releases the executors and the wrapped controller without blocking the event loop.
+
+        :return: None.
+        :rtype: None.
+        """
+        await get_running_loop().run_in_executor(None, self._shutdown)
+
+    async def __aenter__(self) -> 'AsyncController':
+        """
+        It returns the current instance when entering an async with statement.
+
+        :return: See description.
+        :rtype: AsyncController.
+        """
+        return self
+
+    async def __aexit__(self, exc_type: Opt[Type[BaseException]], exc: Opt[BaseException],
+                        traceback: Opt[TracebackType]) -> None:
+        """
+        It closes the current instance when leaving an async with statement.
+
+        :return: None.
+        :rtype: None.
+        """
+        _, _, _ = exc_type, exc, traceback
+        await self.close()
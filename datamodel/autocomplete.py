@@ -0,0 +1,95 @@
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional as Opt, Tuple
+from numpy import argpartition, argsort, array, int64
+from normalize import fold
+from rawengine import POSTALKEY, open_readonly, schema
+
+# It sorts after any character a folded prefix can be followed by.
+SENTINEL = '\U0010ffff'
+
+
+class Completion(NamedTuple):
+    """
+    It represents a suggestion for a typed prefix: a placename with its zipcode, or a zipcode with its placename.
+    """
+
+    placename: str
+    zipcode: str
+    weight: int
+
+
+class PrefixIndex:
+    """
+    It keeps the folded placenames and the zipcodes of a country in one sorted array, so that the entries starting
+    with a prefix are a contiguous slice found by binary search, ranked by weight.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str, str, int]]) -> None:
+        """
+        Constructor.
+
+        :param entries: The (key, placename, zipcode, weight) entries, in any order.
+        :type entries: List[Tuple[str, str, str, int]].
+        """
+        entries = sorted(entries, key=lambda entry: (entry[0], -entry[3]))
+        self.keys = [entry[0] for entry in entries]
+        self.completions = [Completion(placename, zipcode, weight) for _, placename, zipcode, weight in entries]
+        self.weights = array([entry[3] for entry in entries], dtype=int64)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Completion]:
+        """
+        It gets the entries whose key starts with the folded prefix, the heaviest first.
+
+        :param prefix: The typed prefix.
+        :type prefix: str.
+
+        :param limit: The maximum number of completions.
+        :type limit: int.
+
+        :return: See description.
+        :rtype: List[Completion].
+        """
+        key = fold(prefix)
+        if not key or limit < 1:
+            return []
+        start = bisect_left(self.keys, key)
+        stop = bisect_left(self.keys, key + SENTINEL, start)
+        if stop - start > limit:
+            best = argpartition(-self.weights[start:stop], limit - 1)[:limit]
+            positions = best[argsort(-self.weights[start:stop][best], kind='stable')] + start
+        else:
+            positions = start + argsort(-self.weights[start:stop], kind='stable')
+        return [self.completions[position] for position in positions.tolist()]
+
+
+def load_prefixes(countrycode: str) -> Opt[PrefixIndex]:
+    """
+    It builds the prefix index of the given country: Italian places are weighted by population, the others by the
+    number of their rows, and each zipcode by the number of its rows. The zipcodes are their canonical postal codes,
+    so that the prefix '005' completes to '00501' and '501' does not.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the index or None if the country has no database.
+    :rtype: Opt[PrefixIndex].
+    """
+    connection = open_readonly(countrycode)
+    if connection is None:
+        return None
+    table, placename, _ = schema(countrycode)
+    weight = 'MAX(Abitanti)' if countrycode == 'IT' else 'COUNT(*)'
+    try:
+        places = connection.execute(
+            f'SELECT "{placename}", MIN("{POSTALKEY}"), {weight} FROM {table} '
+            f'WHERE "{placename}" IS NOT NULL GROUP BY "{placename}"'
+        ).fetchall()
+        zipcodes = connection.execute(
+            f'SELECT "{POSTALKEY}", MIN("{placename}"), COUNT(*) FROM {table} '
+            f'WHERE "{POSTALKEY}" IS NOT NULL GROUP BY "{POSTALKEY}"'
+        ).fetchall()
+    finally:
+        connection.close()
+    entries = [(fold(name), name, code, count or 0) for name, code, count in places]
+    entries.extend((fold(code), name, code, count) for code, name, count in zipcodes)
+    return PrefixIndex(entries)
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from sys import getsizeof
+from threading import Lock
+from time import monotonic
+from typing import Any, Hashable, NamedTuple, Optional as Opt, Tuple
+
+# The value returned by ResultCache.get on a miss, since None is a legitimate cached result.
+MISSING = object()
+
+
+class CacheInfo(NamedTuple):
+    """
+    It reports the statistics of a ResultCache.
+    """
+
+    hits: int
+    misses: int
+    maxsize: Opt[int]
+    currsize: int
+    maxbytes: Opt[int]
+    currbytes: int
+
+
+def nbytes(key: Tuple[Any, ...], value: Any) -> int:
+    """
+    It estimates the memory held by a cache entry, in bytes.
+
+    :param key: The key of the entry.
+    :type key: Tuple[Any, ...].
+
+    :param value: The value of the entry.
+    :type value: Any.
+
+    :return: See description.
+    :rtype: int.
+    """
+    size = getsizeof(key) + sum(getsizeof(item) for item in key) + getsizeof(value)
+    if isinstance(value, list):
+        size += sum(getsizeof(item) for item in value)
+    return size
+
+
+class ResultCache:
+    """
+    It caches lookup results, negative ones included, with LRU eviction bounded by entry count and/or bytes and an
+    optional time to live. The first item of every key is the country code, so that entries can be invalidated per
+    country.
+    """
+
+    def __init__(self, maxsize: Opt[int] = None, maxbytes: Opt[int] = None, ttl: Opt[float] = None) -> None:
+        """
+        Constructor.
+
+        :param maxsize: The maximum number of entries, unbounded if None.
+        :type maxsize: Opt[int].
+
+        :param maxbytes: The maximum estimated size of the entries in bytes, unbounded if None.
+        :type maxbytes: Opt[int].
+
+        :param ttl: The number of seconds an entry stays valid, forever if None.
+        :type ttl: Opt[float].
+        """
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    def get(self, key: Tuple[Hashable, ...]) -> Any:
+        """
+        It gets the value cached for the given key.
+
+        :param key: The key, starting with the country code.
+        :type key: Tuple[Hashable, ...].
+
+        :return: It returns the cached value or MISSING.
+        :rtype: Any.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires, _ = entry
+                if expires is None or expires > monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                self._remove(key)
+            self._misses += 1
+            return MISSING
+
+    def put(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        """
+        It caches the given value for the given key, evicting the least recently used entries when over bounds.
+
+        :param key: The key, starting with the country code.
+        :type key: Tuple[Hashable, ...].
+
+        :param value: The value.
+        :type value: Any.
+
+        :return: None.
+        :rtype: None.
+        """
+        size = nbytes(key, value)
+        expires = monotonic() + self._ttl if self._ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while self._entries and (
+                    (self._maxsize is not None and len(self._entries) > self._maxsize) or
+                    (self._maxbytes is not None and self._bytes > self._maxbytes)):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[Hashable, ...]) -> None:
+        """
+        It removes the entry of the given key, the lock must be held.
+
+        :param key: The key.
+        :type key: Tuple[Hashable, ...].
+
+        :return: None.
+        :rtype: None.
+        """
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, countrycode: Opt[str] = None) -> None:
+        """
+        It drops the entries of the given country, or all of them if countrycode is None.
+
+        :param countrycode: The country code.
+        :type countrycode: Opt[str].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            if countrycode is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [key for key in self._entries if key[0] == countrycode]:
+                self._remove(key)
+
+    def cache_info(self) -> CacheInfo:
+        """
+        It returns the statistics of the current instance.
+
+        :return: See description.
+        :rtype: CacheInfo.
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._entries), self._maxbytes, self._bytes)
@@ -1,5 +1,16 @@
 from pathlib import Path
 
 configuration = {
+    'async_workers': 4,
     'db_folder': Path(__file__).parent.parent / 'data',
-}
\ No newline at end of file
+    'batch_chunk_size': 500,
+    'cached_statements': 128,
+    'engine_cache_size': 16,
+    'index_cache_size': 16,
+    'index_file': Path(__file__).parent.parent / 'data' / 'zipcodes.idx',
+    'spatial_cell_degrees': 0.5,
+    'metrics': False,
+    'result_cache_size': 10000,
+    'sql_echo': False,
+    'stream_batch_size': 1000,
+}
@@ -1,29 +1,368 @@
 from datetime import datetime
-from typing import Optional as Opt, List
+from time import perf_counter
+from threading import Lock
+from types import TracebackType
+from typing import Any, Dict, Iterable, Iterator, Optional as Opt, List, Tuple, Type, TYPE_CHECKING
 from logging import getLogger, INFO
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, InstrumentedAttribute
+from cache import ResultCache, CacheInfo, MISSING
 from configuration import configuration as cfg
+from memoryindex import MemoryIndex
+from metrics import instrumented, metrics
+from mmapindex import MmapIndex
+from normalize import placekey
 from model import ZipCodes, ZipCodesIT
+from rawengine import RawEngine, canonical
+from registry import Registry
 from sqlengine import SqlEngine
 
+if TYPE_CHECKING:
+    from autocomplete import Completion, PrefixIndex
+    from fuzzy import FuzzyMatch, TrigramIndex
+    from spatial import Nearby, SpatialIndexes
+    from validation import PostalCodeRules
+
+
+def chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """
+    It splits the given list in consecutive chunks having at most the given size.
+
+    :param items: The list to split.
+    :type items: List[Any].
+
+    :param size: The maximum size of each chunk.
+    :type size: int.
+
+    :return: It yields the chunks in order.
+    :rtype: Iterator[List[Any]].
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class Controller:
     """
-    It mediates access to the database data through
+    It mediates access to the database data through the chosen backend. Instances are not meant to be shared by many
+    threads unless they are created in thread-safe mode.
     """
 
-    def __init__(self) -> None:
+    BACKENDS = ('orm', 'sqlite', 'memory', 'mmap')
+
+    def __init__(self, max_engines: Opt[int] = None, backend: str = 'orm',
+                 hot_countries: Opt[Iterable[str]] = None, cache_size: Opt[int] = None,
+                 cache_bytes: Opt[int] = None, cache_ttl: Opt[float] = None, thread_safe: bool = False) -> None:
         """
         Constructor.
+
+        :param max_engines: The maximum number of per-country engines kept open, defaults to the configured one.
+        :type max_engines: Opt[int].
+
+        :param backend: The lookup engine: 'orm' goes through SQLAlchemy, 'sqlite' reads the databases through the
+            stdlib driver without building ORM objects, 'memory' loads every country in memory on first use, 'mmap'
+            searches the memory mapped index compiled by data/compiler.py.
+        :type backend: str.
+
+        :param hot_countries: The countries served from memory, loaded on first use, while the others go through
+            the chosen backend.
+        :type hot_countries: Opt[Iterable[str]].
+
+        :param cache_size: The maximum number of lookup results cached, negative ones included.
+        :type cache_size: Opt[int].
+
+        :param cache_bytes: The maximum estimated size of the cached lookup results in bytes.
+        :type cache_bytes: Opt[int].
+
+        :param cache_ttl: The number of seconds a cached lookup result stays valid. Given alone, it enables the cache
+            bounded by the configured result_cache_size entries.
+        :type cache_ttl: Opt[float].
+
+        :param thread_safe: Whether the instance is shared by many threads: the 'sqlite' backend then keeps one
+            read-only connection per thread and country and takes no shared lock on the read path, while the 'memory'
+            and 'mmap' backends are lock-free on reads anyway. The result cache, when enabled, is guarded by a lock.
+            The 'orm' backend does not support this mode.
+        :type thread_safe: bool.
         """
+        if backend not in Controller.BACKENDS:
+            raise ValueError(f'Unknown backend: {backend}')
+        if thread_safe and backend == 'orm':
+            raise ValueError('The thread-safe mode requires the sqlite, memory or mmap backend')
+        self.backend = backend
+        self.thread_safe = thread_safe
         self.logger = getLogger(__name__)
         self.logger.debug(f'Controller created at: {datetime.now().strftime("%Y/%m/%d %H:%M:%S")}')
         self.dbname_it = cfg['db_folder'] / 'zipcodes_IT.db'
-        self.engine_it = SqlEngine.get_sqlite_engine(self.dbname_it.__str__())
-        self.logger.debug(f'SqlEngine created at: {datetime.now().strftime("%Y/%m/%d %H:%M:%S")}')
+        self._engines = Registry(
+            Controller._open_engine,
+            Controller._close_engine,
+            max_engines or cfg['engine_cache_size']
+        )
+        self._backend = None
+        if backend == 'sqlite':
+            self._backend = RawEngine(max_engines or cfg['engine_cache_size'], thread_safe)
+        elif backend == 'mmap':
+            self._backend = MmapIndex()
+        # The in-memory and mmap indexes hold no normalized placenames, so those lookups go to the databases.
+        self._keys = self._backend if backend == 'sqlite' else \
+            RawEngine(max_engines or cfg['engine_cache_size'], thread_safe)
+        self._memory = MemoryIndex() if backend == 'memory' or hot_countries else None
+        self._hot = frozenset(hot_countries) if backend != 'memory' and hot_countries else None
+        # The indexes below need numpy, imported on their first use only.
+        self._spatial = None
+        self._spatial_lock = Lock()
+        self._trigrams = Registry(Controller._load_trigrams, lambda index: None, cfg['index_cache_size'])
+        self._prefixes = Registry(Controller._load_prefixes, lambda index: None, cfg['index_cache_size'])
+        self._rules = Registry(Controller._load_rules, lambda rules: None, cfg['index_cache_size'])
+        self._cache = None
+        if cache_size is None and cache_bytes is None and cache_ttl is not None:
+            cache_size = cfg['result_cache_size']
+        if cache_size is not None or cache_bytes is not None:
+            self._cache = ResultCache(cache_size, cache_bytes, cache_ttl)
+
+    @staticmethod
+    def _open_engine(countrycode: str) -> Opt[Engine]:
+        """
+        It creates the pooled engine for the database of the given country, if the database exists.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: Upon success, it returns the just created Engine instance object, None otherwise.
+        :rtype: Opt[Engine].
+        """
+        dbname = cfg['db_folder'] / f'zipcodes_{countrycode}.db'
+        if not dbname.exists():
+            return None
+        start = perf_counter()
+        engine = SqlEngine.get_sqlite_engine(dbname.__str__(), echo=cfg['sql_echo'], pooled=True)
+        if metrics.enabled:
+            metrics.opened('engine', countrycode, perf_counter() - start)
+        return engine
+
+    @staticmethod
+    def _close_engine(engine: Engine) -> None:
+        """
+        It releases the connections held by the given engine.
+
+        :param engine: The engine to dispose.
+        :type engine: Engine.
+
+        :return: None.
+        :rtype: None.
+        """
+        engine.dispose()
+
+    @staticmethod
+    def _load_trigrams(countrycode: str) -> Opt['TrigramIndex']:
+        """
+        It builds the trigram index of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the index or None if the country has no database.
+        :rtype: Opt[TrigramIndex].
+        """
+        from fuzzy import load_trigrams
+        return load_trigrams(countrycode)
+
+    @staticmethod
+    def _load_prefixes(countrycode: str) -> Opt['PrefixIndex']:
+        """
+        It builds the prefix index of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the index or None if the country has no database.
+        :rtype: Opt[PrefixIndex].
+        """
+        from autocomplete import load_prefixes
+        return load_prefixes(countrycode)
+
+    @staticmethod
+    def _load_rules(countrycode: str) -> Opt['PostalCodeRules']:
+        """
+        It derives the postal code validation rules of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the rules or None if the country has no database.
+        :rtype: Opt[PostalCodeRules].
+        """
+        from validation import load_rules
+        return load_rules(countrycode)
+
+    def spatial(self) -> 'SpatialIndexes':
+        """
+        It gets the spatial indexes, creating them on first use.
+
+        :return: See description.
+        :rtype: SpatialIndexes.
+        """
+        if self._spatial is None:
+            with self._spatial_lock:
+                if self._spatial is None:
+                    from spatial import SpatialIndexes
+                    self._spatial = SpatialIndexes()
+        return self._spatial
+
+    @property
+    def engine_it(self) -> Opt[Engine]:
+        """
+        Getter for the engine of the Italian database.
+
+        :return: See description.
+        :rtype: Opt[Engine].
+        """
+        return self._engines.get('IT')
 
-    def zipcode_by_placename(self, placename: str, countrycode: str) -> Opt[int]:
+    def engine(self, countrycode: str) -> Opt[Engine]:
+        """
+        It gets the engine of the given country, creating it on first use.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the engine for the given country or None.
+        :rtype: Opt[Engine].
+        """
+        return self._engines.get(countrycode)
+
+    def delegate(self, countrycode: str) -> Opt[Any]:
+        """
+        It gets the engine serving the lookups of the given country, or None when they go through the ORM.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: See description.
+        :rtype: Opt[Any].
+        """
+        if self._memory is not None and (self._hot is None or countrycode in self._hot):
+            return self._memory
+        return self._backend
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        It reports the estimated memory held by each country loaded in memory, in bytes.
+
+        :return: See description.
+        :rtype: Dict[str, int].
+        """
+        return self._memory.memory_usage() if self._memory is not None else {}
+
+    def cache_info(self) -> Opt[CacheInfo]:
+        """
+        It returns the statistics of the lookup result cache, or None if the cache is disabled.
+
+        :return: See description.
+        :rtype: Opt[CacheInfo].
+        """
+        return self._cache.cache_info() if self._cache is not None else None
+
+    def cache_clear(self, countrycode: Opt[str] = None) -> None:
+        """
+        It drops the cached lookup results of the given country, or all of them if countrycode is None.
+
+        :param countrycode: The country code.
+        :type countrycode: Opt[str].
+
+        :return: None.
+        :rtype: None.
+        """
+        if self._cache is not None:
+            self._cache.invalidate(countrycode)
+
+    @staticmethod
+    def columns(countrycode: str) -> Tuple[InstrumentedAttribute, InstrumentedAttribute]:
+        """
+        It gets the placename and canonical postal code columns of the table holding the data of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: See description.
+        :rtype: Tuple[InstrumentedAttribute, InstrumentedAttribute].
+        """
+        if countrycode == 'IT':
+            return ZipCodesIT.Comune, ZipCodesIT.postalkey
+        return ZipCodes.placename, ZipCodes.postalkey
+
+    def close(self) -> None:
+        """
+        It releases all the engines and connections held by the current instance.
+
+        :return: None.
+        :rtype: None.
+        """
+        self._engines.close()
+        if self._backend is not None:
+            self._backend.close()
+        if self._memory is not None:
+            self._memory.close()
+        if self._keys is not self._backend:
+            self._keys.close()
+        if self._spatial is not None:
+            self._spatial.close()
+        self._trigrams.close()
+        self._prefixes.close()
+        self._rules.close()
+
+    def __enter__(self) -> 'Controller':
+        """
+        It returns the current instance when entering a with statement.
+
+        :return: See description.
+        :rtype: Controller.
+        """
+        return self
+
+    def __exit__(self, exc_type: Opt[Type[BaseException]], exc: Opt[BaseException],
+                 traceback: Opt[TracebackType]) -> None:
+        """
+        It closes the current instance when leaving a with statement.
+
+        :return: None.
+        :rtype: None.
+        """
+        _, _, _ = exc_type, exc, traceback
+        self.close()
+
+    @instrumented('zipcode_by_placename', 1)
+    def zipcode_by_placename(self, placename: str, countrycode: str, normalize: bool = False) -> Opt[str]:
+        """
+        It gets the zipcode of the place in placename or None, going through the result cache when enabled.
+
+        :param placename: The name of the place to retrieve the zipcode from.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param normalize: Whether to ignore case, accents and punctuation, matching the normalized placename against
+            the indexed placekey column built by data/splitter.py.
+        :type normalize: bool.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None, e.g. '00501'.
+        :rtype: Opt[str].
+        """
+        if self._cache is None:
+            return self._zipcode_by_placename(placename, countrycode, normalize)
+
+        key = (countrycode, 'placekey', placekey(placename, countrycode)) if normalize else \
+            (countrycode, 'zipcode', f'{placename}')
+        value = self._cache.get(key)
+        if metrics.enabled:
+            metrics.cached(countrycode, value is not MISSING)
+        if value is MISSING:
+            value = self._zipcode_by_placename(placename, countrycode, normalize)
+            self._cache.put(key, value)
+        return value
+
+    def _zipcode_by_placename(self, placename: str, countrycode: str, normalize: bool = False) -> Opt[str]:
         """
         It gets the zipcode of the place in placename or None.
 
@@ -33,28 +372,69 @@ class Controller:
         :param countrycode: The country code.
         :type countrycode: str.
 
-        :return: It returns the zipcode for the given placename if it exists or None.
-        :rtype: Opt[int].
+        :param normalize: Whether to match the normalized placename against the placekey column.
+        :type normalize: bool.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None, e.g. '00501'.
+        :rtype: Opt[str].
         """
+        delegate = self.delegate(countrycode)
+        if normalize and delegate is not None:
+            return self._keys.zipcode_by_placename(placename, countrycode, normalize)
+        if delegate is not None:
+            return delegate.zipcode_by_placename(placename, countrycode)
+
         try:
             if countrycode == 'IT':
+                column, key = (ZipCodesIT.placekey, placekey(placename, countrycode)) if normalize else \
+                    (ZipCodesIT.Comune, placename)
                 with Session(bind=self.engine_it) as session, session.begin():
-                    data = session.query(ZipCodesIT).\
-                        filter(ZipCodesIT.Comune == f'{placename}').all()
-                    return data[0].CAP if data else None
+                    data = session.query(ZipCodesIT.postalkey).\
+                        filter(column == f'{key}').first()
+                    return data[0] if data else None
 
-            dbname = cfg['db_folder'] / f'zipcodes_{countrycode}.db'
-            engine = SqlEngine.get_sqlite_engine(dbname.__str__())
+            engine = self.engine(countrycode)
+            if engine is None:
+                return None
+            column, key = (ZipCodes.placekey, placekey(placename, countrycode)) if normalize else \
+                (ZipCodes.placename, placename)
             with Session(bind=engine) as session, session.begin():
-                data = session.query(ZipCodes).filter(
-                    ZipCodes.placename == f'{placename}',
-                    ZipCodes.countrycode == f'{countrycode}').all()
-                return data[0].postalcode if data else None
+                data = session.query(ZipCodes.postalkey).filter(
+                    column == f'{key}',
+                    ZipCodes.countrycode == f'{countrycode}').first()
+                return data[0] if data else None
         except SQLAlchemyError as e:
             self.logger.error(f'{e.__str__()}')
             return None
 
+    @instrumented('placenames_by_zipcode', 0)
     def placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
+        """
+        It gets the names of the places in the country with the given pair (countrycode, zipcode) or None, going
+        through the result cache when enabled.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode.
+        :type zipcode: int.
+
+        :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
+        :rtype: Opt[List[str]].
+        """
+        if self._cache is None:
+            return self._placenames_by_zipcode(countrycode, zipcode)
+
+        key = (countrycode, 'placenames', canonical(countrycode, zipcode))
+        value = self._cache.get(key)
+        if metrics.enabled:
+            metrics.cached(countrycode, value is not MISSING)
+        if value is MISSING:
+            value = self._placenames_by_zipcode(countrycode, zipcode)
+            self._cache.put(key, value)
+        return list(value) if value is not None else None
+
+    def _placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
         """
         It gets the names of the places in the country with the given pair (countrycode, zipcode) or None.
 
@@ -67,29 +447,307 @@ class Controller:
         :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
         :rtype: Opt[List[str]].
         """
+        delegate = self.delegate(countrycode)
+        if delegate is not None:
+            return delegate.placenames_by_zipcode(countrycode, zipcode)
+
         try:
             if countrycode == 'IT':
                 with Session(bind=self.engine_it) as session, session.begin():
                     data = session.query(ZipCodesIT).filter(
-                        ZipCodesIT.CAP == f'{zipcode}'
+                        ZipCodesIT.postalkey == canonical(countrycode, zipcode)
                     ).all()
                     return [item.Comune for item in data] if data else None
 
-            dbname = cfg['db_folder'] / f'zipcodes_{countrycode}.db'
-            engine = SqlEngine.get_sqlite_engine(dbname.__str__())
+            engine = self.engine(countrycode)
+            if engine is None:
+                return None
             with Session(bind=engine) as session, session.begin():
                 data = session.query(ZipCodes).filter(
                     ZipCodes.countrycode == f'{countrycode}',
-                    ZipCodes.postalcode == f'{zipcode}'
+                    ZipCodes.postalkey == canonical(countrycode, zipcode)
                 ).all()
                 return [item.placename for item in data] if data else None
         except SQLAlchemyError as e:
             self.logger.error(f'{e.__str__()}')
             return None
 
+    @instrumented('zipcodes_by_placenames', 0)
+    def zipcodes_by_placenames(self, countrycode: str, placenames: Iterable[str],
+                               normalize: bool = False) -> Dict[str, Opt[str]]:
+        """
+        It gets the zipcodes of many places of the same country at once, querying them in chunks.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param placenames: The names of the places to retrieve the zipcodes from.
+        :type placenames: Iterable[str].
+
+        :param normalize: Whether to ignore case, accents and punctuation, matching the normalized placenames against
+            the indexed placekey column built by data/splitter.py.
+        :type normalize: bool.
+
+        :return: It returns a mapping from each given placename to its canonical postal code or None.
+        :rtype: Dict[str, Opt[str]].
+        """
+        delegate = self.delegate(countrycode)
+        if normalize and delegate is not None:
+            return self._keys.zipcodes_by_placenames(countrycode, placenames, normalize)
+        if delegate is not None:
+            return delegate.zipcodes_by_placenames(countrycode, placenames)
+
+        result = {f'{placename}': None for placename in placenames}
+        engine = self.engine(countrycode)
+        if engine is None or not result:
+            return result
+
+        placename_column, postalkey_column = Controller.columns(countrycode)
+        keys = {placename: placekey(placename, countrycode) if normalize else placename for placename in result}
+        if normalize:
+            placename_column = ZipCodesIT.placekey if countrycode == 'IT' else ZipCodes.placekey
+        found = {}
+        try:
+            with Session(bind=engine) as session, session.begin():
+                for chunk in chunks(list(set(keys.values())), cfg['batch_chunk_size']):
+                    data = session.query(placename_column, postalkey_column).\
+                        filter(placename_column.in_(chunk)).all()
+                    for key, zipcode in data:
+                        found.setdefault(key, zipcode)
+            return {placename: found.get(key) for placename, key in keys.items()}
+        except SQLAlchemyError as e:
+            self.logger.error(f'{e.__str__()}')
+            return result
+
+    @instrumented('placenames_by_zipcodes', 0)
+    def placenames_by_zipcodes(self, countrycode: str, zipcodes: Iterable[int]) -> Dict[int, Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes in the same country at once, querying them
+        in chunks.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The zipcodes.
+        :type zipcodes: Iterable[int].
+
+        :return: It returns a mapping from each given zipcode to the names of its places or None.
+        :rtype: Dict[int, Opt[List[str]]].
+        """
+        delegate = self.delegate(countrycode)
+        if delegate is not None:
+            return delegate.placenames_by_zipcodes(countrycode, zipcodes)
+
+        result = {zipcode: None for zipcode in zipcodes}
+        engine = self.engine(countrycode)
+        if engine is None or not result:
+            return result
+
+        placename_column, postalkey_column = Controller.columns(countrycode)
+        keys = {zipcode: canonical(countrycode, zipcode) for zipcode in result}
+        found: Dict[str, List[str]] = {}
+        try:
+            with Session(bind=engine) as session, session.begin():
+                for chunk in chunks(list(set(keys.values())), cfg['batch_chunk_size']):
+                    data = session.query(postalkey_column, placename_column).\
+                        filter(postalkey_column.in_(chunk)).all()
+                    for key, placename in data:
+                        found.setdefault(key, []).append(placename)
+            return {zipcode: list(found[key]) if key in found else None for zipcode, key in keys.items()}
+        except SQLAlchemyError as e:
+            self.logger.error(f'{e.__str__()}')
+            return result
+
+    def zipcodes_by_pairs(self, pairs: Iterable[Tuple[str, str]],
+                          normalize: bool = False) -> Dict[Tuple[str, str], Opt[str]]:
+        """
+        It gets the zipcodes of many places of any country at once, grouping them by country so that each country is
+        resolved by one zipcodes_by_placenames call.
+
+        :param pairs: The (countrycode, placename) pairs.
+        :type pairs: Iterable[Tuple[str, str]].
+
+        :param normalize: Whether to match the normalized placenames against the placekey column.
+        :type normalize: bool.
+
+        :return: It returns a mapping from each given pair to its canonical postal code or None.
+        :rtype: Dict[Tuple[str, str], Opt[str]].
+        """
+        groups: Dict[str, List[str]] = {}
+        for countrycode, placename in pairs:
+            groups.setdefault(countrycode, []).append(placename)
+        result = {}
+        for countrycode, placenames in groups.items():
+            found = self.zipcodes_by_placenames(countrycode, placenames, normalize)
+            result.update(((countrycode, placename), found[f'{placename}']) for placename in placenames)
+        return result
+
+    def placenames_by_pairs(self, pairs: Iterable[Tuple[str, Any]]) -> Dict[Tuple[str, Any], Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes of any country at once, grouping them by
+        country so that each country is resolved by one placenames_by_zipcodes call.
+
+        :param pairs: The (countrycode, zipcode) pairs.
+        :type pairs: Iterable[Tuple[str, Any]].
+
+        :return: It returns a mapping from each given pair to the names of its places or None.
+        :rtype: Dict[Tuple[str, Any], Opt[List[str]]].
+        """
+        groups: Dict[str, List[Any]] = {}
+        for countrycode, zipcode in pairs:
+            groups.setdefault(countrycode, []).append(zipcode)
+        result = {}
+        for countrycode, zipcodes in groups.items():
+            found = self.placenames_by_zipcodes(countrycode, zipcodes)
+            result.update(((countrycode, zipcode), found[zipcode]) for zipcode in zipcodes)
+        return result
+
+    @instrumented('autocomplete', 0)
+    def autocomplete(self, countrycode: str, prefix: str, limit: int = 10) -> List['Completion']:
+        """
+        It gets the placenames and the zipcodes of the country starting with the given prefix, ignoring case and
+        accents, by means of a sorted prefix index built on first use of each country. The most populated places come
+        first in Italy, the places and the zipcodes having the most rows elsewhere.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param prefix: The typed prefix.
+        :type prefix: str.
+
+        :param limit: The maximum number of completions.
+        :type limit: int.
+
+        :return: See description.
+        :rtype: List[Completion].
+        """
+        index = self._prefixes.get(countrycode)
+        return index.complete(prefix, limit) if index is not None else []
+
+    @instrumented('fuzzy_placenames', 1)
+    def fuzzy_placenames(self, placename: str, countrycode: str, k: int = 5,
+                         threshold: float = 0.0) -> List['FuzzyMatch']:
+        """
+        It gets the placenames of the country most similar to the given one, with their zipcodes and similarity
+        scores, by means of a trigram index built on first use of each country.
+
+        :param placename: The searched placename, misspelled or not.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param k: The maximum number of matches.
+        :type k: int.
+
+        :param threshold: The minimum score of a match, in [0, 1].
+        :type threshold: float.
+
+        :return: It returns the matches sorted by descending score.
+        :rtype: List[FuzzyMatch].
+        """
+        index = self._trigrams.get(countrycode)
+        return index.search(placename, k, threshold) if index is not None else []
+
+    def validate_zipcodes(self, countrycode: str, zipcodes: Any, exact: bool = True) -> Any:
+        """
+        It validates one postal code or a batch of them without querying the database, against the formats and the
+        values of the postal codes of the country, derived on first use of each country. Batches, e.g. lists, NumPy
+        arrays or pandas columns, are validated on whole arrays at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The postal code or the batch of them.
+        :type zipcodes: Any.
+
+        :param exact: Whether the postal codes must exist, rather than just be well formed.
+        :type exact: bool.
+
+        :return: It returns a bool for a single postal code, a boolean array for a batch, all False if the country has
+        no database.
+        :rtype: Any.
+        """
+        rules = self._rules.get(countrycode)
+        if rules is None:
+            from validation import PostalCodeRules
+            rules = PostalCodeRules([])
+        return rules.validate(zipcodes, exact)
+
+    def nearest_zipcodes(self, lat: float, lon: float, k: int = 1, countrycode: Opt[str] = None) -> List['Nearby']:
+        """
+        It gets the postal codes nearest to the given point, by means of a spatial index built on first use of each
+        country and cached. Italy has no coordinates, so it is never part of the results.
+
+        :param lat: The latitude in degrees.
+        :type lat: float.
+
+        :param lon: The longitude in degrees.
+        :type lon: float.
+
+        :param k: The number of postal codes.
+        :type k: int.
+
+        :param countrycode: The country code, or None to search all the countries.
+        :type countrycode: Opt[str].
+
+        :return: It returns up to k postal codes sorted by distance in km.
+        :rtype: List[Nearby].
+        """
+        return self.spatial().get(countrycode).nearest(lat, lon, k)
+
+    def zipcodes_within(self, lat: float, lon: float, km: float, countrycode: Opt[str] = None) -> List['Nearby']:
+        """
+        It gets the postal codes within the given distance from the given point. Italy has no coordinates, so it is
+        never part of the results.
+
+        :param lat: The latitude in degrees.
+        :type lat: float.
+
+        :param lon: The longitude in degrees.
+        :type lon: float.
+
+        :param km: The radius in km.
+        :type km: float.
+
+        :param countrycode: The country code, or None to search all the countries.
+        :type countrycode: Opt[str].
+
+        :return: It returns the postal codes sorted by distance in km.
+        :rtype: List[Nearby].
+        """
+        return self.spatial().get(countrycode).within(lat, lon, km)
+
+    def zipcodes_within_zipcode(self, countrycode: str, zipcode: int, km: float,
+                                all_countries: bool = False) -> Opt[List['Nearby']]:
+        """
+        It gets the postal codes within the given distance from the given one, itself included.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode at the center.
+        :type zipcode: int.
+
+        :param km: The radius in km.
+        :type km: float.
+
+        :param all_countries: Whether to search the postal codes of all the countries instead of just the given one.
+        :type all_countries: bool.
+
+        :return: It returns the postal codes sorted by distance in km, or None if the zipcode has no coordinates.
+        :rtype: Opt[List[Nearby]].
+        """
+        center = self.spatial().get(countrycode).locate(zipcode)
+        if center is None:
+            return None
+        return self.zipcodes_within(*center, km, None if all_countries else countrycode)
+
 
 if __name__ == '__main__':
     getLogger(__name__).setLevel(INFO)
-    ctr = Controller()
-    print(ctr.zipcode_by_placename('Leggiuno', 'IT'))
-    print(ctr.placenames_by_zipcode('IT', 21038))
+    with Controller() as ctr:
+        print(ctr.zipcode_by_placename('Leggiuno', 'IT'))
+        print(ctr.placenames_by_zipcode('IT', 21038))
+        print(ctr.zipcodes_by_placenames('IT', ['Leggiuno', 'Sangiano']))
+        print(ctr.placenames_by_zipcodes('IT', [21038, 21100]))
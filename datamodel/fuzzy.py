@@ -0,0 +1,105 @@
+from typing import List, NamedTuple, Optional as Opt, Set
+from numpy import argpartition, argsort, array, bincount, concatenate, int32, nonzero
+from memoryindex import load_country
+from normalize import fold
+
+
+class FuzzyMatch(NamedTuple):
+    """
+    It represents a placename similar to a searched one, with its zipcode and the similarity score in [0, 1].
+    """
+
+    placename: str
+    zipcode: str
+    score: float
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    It gets the trigrams of the folded text, padded so that the beginning and the end of words weigh more.
+
+    :param text: The text.
+    :type text: str.
+
+    :return: See description.
+    :rtype: Set[str].
+    """
+    padded = f'  {fold(text)} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    It indexes the placenames of a country by trigram, with one array of placename ids for each trigram, so that the
+    trigrams shared by a query and every placename are counted in bulk.
+    """
+
+    def __init__(self, placenames: List[str], zipcodes: List[str]) -> None:
+        """
+        Constructor.
+
+        :param placenames: The distinct placenames.
+        :type placenames: List[str].
+
+        :param zipcodes: The canonical postal code of the first zipcode of each placename.
+        :type zipcodes: List[str].
+        """
+        self.placenames = placenames
+        self.zipcodes = zipcodes
+        lists = {}
+        sizes = []
+        for place_id, placename in enumerate(placenames):
+            grams = trigrams(placename)
+            sizes.append(len(grams))
+            for gram in grams:
+                lists.setdefault(gram, []).append(place_id)
+        self.sizes = array(sizes, dtype=int32)
+        self.postings = {gram: array(ids, dtype=int32) for gram, ids in lists.items()}
+
+    def search(self, placename: str, k: int = 5, threshold: float = 0.0) -> List[FuzzyMatch]:
+        """
+        It gets the placenames most similar to the given one, scored by the Jaccard similarity of their trigrams.
+
+        :param placename: The searched placename.
+        :type placename: str.
+
+        :param k: The maximum number of matches.
+        :type k: int.
+
+        :param threshold: The minimum score of a match.
+        :type threshold: float.
+
+        :return: It returns the matches sorted by descending score.
+        :rtype: List[FuzzyMatch].
+        """
+        grams = trigrams(placename)
+        found = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not found or k < 1:
+            return []
+        shared = bincount(concatenate(found), minlength=len(self.placenames))
+        candidates = nonzero(shared)[0]
+        scores = shared[candidates] / (len(grams) + self.sizes[candidates] - shared[candidates])
+        if len(candidates) > k:
+            best = argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[best], scores[best]
+        order = argsort(-scores, kind='stable')
+        return [
+            FuzzyMatch(self.placenames[i], self.zipcodes[i], float(score))
+            for i, score in zip(candidates[order].tolist(), scores[order].tolist()) if score >= threshold
+        ]
+
+
+def load_trigrams(countrycode: str) -> Opt[TrigramIndex]:
+    """
+    It builds the trigram index of the placenames of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the index or None if the country has no database.
+    :rtype: Opt[TrigramIndex].
+    """
+    index = load_country(countrycode)
+    if index is None:
+        return None
+    return TrigramIndex(index.places, [index.zipcode(placename) for placename in index.places])
@@ -0,0 +1,266 @@
+from array import array
+from logging import getLogger
+from sys import getsizeof, intern
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional as Opt, Tuple
+from normalize import keywidth, postalkey
+from rawengine import POSTALKEY, open_readonly, schema
+
+
+def postings(lists: List[List[int]]) -> Tuple[array, array]:
+    """
+    It packs the given lists of ids into a compressed sparse row pair of arrays.
+
+    :param lists: The lists of ids, one for each key id.
+    :type lists: List[List[int]].
+
+    :return: It returns the offsets array, having one more item than lists, and the flat ids array.
+    :rtype: Tuple[array, array].
+    """
+    offsets = array('I', [0])
+    ids = array('I')
+    for items in lists:
+        ids.extend(items)
+        offsets.append(len(ids))
+    return offsets, ids
+
+
+class CountryIndex:
+    """
+    It holds the placename to zipcodes and zipcode to placenames mappings of a country in compact memory structures:
+    interned strings, one dictionary per direction mapping keys to ids, and array backed postings. The zipcodes are
+    held as their canonical postal codes, zero padded to the width of the country when made of digits only.
+    """
+
+    __slots__ = ('places', 'zipcodes', 'place_ids', 'zipcode_ids', 'place_postings', 'zipcode_postings', 'width')
+
+    def __init__(self, rows: Iterable[Tuple[str, str]]) -> None:
+        """
+        Constructor.
+
+        :param rows: The (placename, postalkey) pairs of the country, sorted by placename and zipcode.
+        :type rows: Iterable[Tuple[str, str]].
+        """
+        self.places = []
+        self.zipcodes = []
+        self.place_ids = {}
+        self.zipcode_ids = {}
+        place_lists = []
+        zipcode_lists = []
+        for placename, key in rows:
+            placename = intern(f'{placename}')
+            key = intern(f'{key}')
+            place_id = self.place_ids.get(placename)
+            if place_id is None:
+                place_id = self.place_ids[placename] = len(self.places)
+                self.places.append(placename)
+                place_lists.append([])
+            zipcode_id = self.zipcode_ids.get(key)
+            if zipcode_id is None:
+                zipcode_id = self.zipcode_ids[key] = len(self.zipcodes)
+                self.zipcodes.append(key)
+                zipcode_lists.append([])
+            place_lists[place_id].append(zipcode_id)
+            zipcode_lists[zipcode_id].append(place_id)
+        self.place_postings = postings(place_lists)
+        self.zipcode_postings = postings(zipcode_lists)
+        self.width = keywidth(self.zipcode_ids)
+
+    def zipcode(self, placename: str) -> Opt[str]:
+        """
+        It gets the canonical postal code of the first zipcode of the given place or None.
+
+        :param placename: The name of the place.
+        :type placename: str.
+
+        :return: See description.
+        :rtype: Opt[str].
+        """
+        place_id = self.place_ids.get(f'{placename}')
+        if place_id is None:
+            return None
+        offsets, ids = self.place_postings
+        return self.zipcodes[ids[offsets[place_id]]]
+
+    def placenames(self, zipcode: Any) -> Opt[List[str]]:
+        """
+        It gets the names of the places having the given zipcode or None.
+
+        :param zipcode: The zipcode.
+        :type zipcode: Any.
+
+        :return: See description.
+        :rtype: Opt[List[str]].
+        """
+        zipcode_id = self.zipcode_ids.get(postalkey(zipcode, self.width))
+        if zipcode_id is None:
+            return None
+        offsets, ids = self.zipcode_postings
+        places = self.places
+        return [places[place_id] for place_id in ids[offsets[zipcode_id]:offsets[zipcode_id + 1]]]
+
+    def nbytes(self) -> int:
+        """
+        It returns an estimate of the memory held by the current instance, in bytes.
+
+        :return: See description.
+        :rtype: int.
+        """
+        size = sum(getsizeof(item) for item in (self.places, self.zipcodes, self.place_ids, self.zipcode_ids))
+        size += sum(getsizeof(item) for item in self.place_postings + self.zipcode_postings)
+        size += sum(getsizeof(item) for item in self.places)
+        size += sum(getsizeof(item) for item in self.zipcodes)
+        size += sum(getsizeof(item) for item in self.zipcode_ids)
+        return size
+
+
+def load_country(countrycode: str) -> Opt[CountryIndex]:
+    """
+    It builds the in-memory index of the given country from its database.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the index or None if the database does not exist.
+    :rtype: Opt[CountryIndex].
+    """
+    connection = open_readonly(countrycode)
+    if connection is None:
+        return None
+    try:
+        table, placename_column, zipcode_column = schema(countrycode)
+        return CountryIndex(connection.execute(
+            f'SELECT "{placename_column}", "{POSTALKEY}" FROM {table} '
+            f'WHERE "{placename_column}" IS NOT NULL AND "{zipcode_column}" IS NOT NULL '
+            f'ORDER BY "{placename_column}", "{zipcode_column}"'
+        ))
+    finally:
+        connection.close()
+
+
+class MemoryIndex:
+    """
+    It serves the Controller lookups from in-memory indexes loaded on first use of each country.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self.logger = getLogger(__name__)
+        self._countries = {}
+        self._missing = set()
+        self._lock = Lock()
+
+    def country(self, countrycode: str) -> Opt[CountryIndex]:
+        """
+        It gets the index of the given country, loading it on first use.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the index or None if the country has no database.
+        :rtype: Opt[CountryIndex].
+        """
+        index = self._countries.get(countrycode)
+        if index is not None or countrycode in self._missing:
+            return index
+
+        with self._lock:
+            index = self._countries.get(countrycode)
+            if index is None and countrycode not in self._missing:
+                index = load_country(countrycode)
+                if index is None:
+                    self._missing.add(countrycode)
+                else:
+                    self._countries[countrycode] = index
+                    self.logger.debug(f'Loaded {countrycode}: {index.nbytes()} bytes')
+            return index
+
+    def zipcode_by_placename(self, placename: str, countrycode: str) -> Opt[str]:
+        """
+        It gets the zipcode of the place in placename or None.
+
+        :param placename: The name of the place to retrieve the zipcode from.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None.
+        :rtype: Opt[str].
+        """
+        index = self.country(countrycode)
+        return index.zipcode(placename) if index is not None else None
+
+    def placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
+        """
+        It gets the names of the places in the country with the given pair (countrycode, zipcode) or None.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode.
+        :type zipcode: int.
+
+        :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
+        :rtype: Opt[List[str]].
+        """
+        index = self.country(countrycode)
+        return index.placenames(zipcode) if index is not None else None
+
+    def zipcodes_by_placenames(self, countrycode: str, placenames: Iterable[str]) -> Dict[str, Opt[str]]:
+        """
+        It gets the zipcodes of many places of the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param placenames: The names of the places to retrieve the zipcodes from.
+        :type placenames: Iterable[str].
+
+        :return: It returns a mapping from each given placename to its canonical postal code or None.
+        :rtype: Dict[str, Opt[str]].
+        """
+        index = self.country(countrycode)
+        if index is None:
+            return {f'{placename}': None for placename in placenames}
+        return {f'{placename}': index.zipcode(placename) for placename in placenames}
+
+    def placenames_by_zipcodes(self, countrycode: str, zipcodes: Iterable[int]) -> Dict[int, Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes in the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The zipcodes.
+        :type zipcodes: Iterable[int].
+
+        :return: It returns a mapping from each given zipcode to the names of its places or None.
+        :rtype: Dict[int, Opt[List[str]]].
+        """
+        index = self.country(countrycode)
+        if index is None:
+            return {zipcode: None for zipcode in zipcodes}
+        return {zipcode: index.placenames(zipcode) for zipcode in zipcodes}
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        It reports the estimated memory held by each loaded country, in bytes.
+
+        :return: See description.
+        :rtype: Dict[str, int].
+        """
+        return {countrycode: index.nbytes() for countrycode, index in self._countries.items()}
+
+    def close(self) -> None:
+        """
+        It drops all the loaded indexes.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._countries = {}
+            self._missing = set()
@@ -0,0 +1,395 @@
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache, wraps
+from pathlib import Path
+from runpy import run_path
+from threading import Lock
+from time import perf_counter
+from typing import Any, Callable, Dict, FrozenSet, List, NamedTuple, Tuple
+from configuration import configuration as cfg
+
+# The upper bounds in seconds of the latency histogram buckets, from 1 microsecond to 5 seconds.
+BUCKETS = tuple(scale * 10 ** exponent for exponent in range(-6, 1) for scale in (1, 2.5, 5))
+
+# The country label of the exported metrics whose country code is unknown, bounding the number of series.
+OTHER = 'other'
+
+
+class Sample(NamedTuple):
+    """
+    It represents an observed operation, as passed to the registered callbacks.
+    """
+
+    operation: str
+    countrycode: str
+    seconds: float
+    rows: int
+
+
+class Histogram:
+    """
+    It counts the observed latencies falling in each bucket, Prometheus style.
+    """
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        """
+        It adds the given latency to the histogram.
+
+        :param seconds: The latency.
+        :type seconds: float.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """
+        It estimates the given quantile as the upper bound of the bucket holding it.
+
+        :param fraction: The quantile as a fraction in [0, 1].
+        :type fraction: float.
+
+        :return: It returns the estimate in seconds, infinity if it falls beyond the last bucket.
+        :rtype: float.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+@lru_cache(maxsize=1)
+def countrycodes() -> FrozenSet[str]:
+    """
+    It loads the known country codes from the data folder, on the first call only.
+
+    :return: See description.
+    :rtype: FrozenSet[str].
+    """
+    return frozenset(run_path(f'{Path(__file__).parent.parent / "data" / "countrycodes.py"}')['countrycodes'])
+
+
+def label(value: Any) -> str:
+    """
+    It escapes the given label value as the Prometheus text exposition format requires: backslash, double quote and
+    newline.
+
+    :param value: The label value.
+    :type value: Any.
+
+    :return: See description.
+    :rtype: str.
+    """
+    return f'{value}'.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def country(countrycode: str) -> str:
+    """
+    It gets the label the given country code is recorded under, OTHER when it is not a known one.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: See description.
+    :rtype: str.
+    """
+    return countrycode if countrycode in countrycodes() else OTHER
+
+
+def rows(result: Any) -> int:
+    """
+    It counts the rows held by a lookup result: the placenames of a list, one for a zipcode, none for None, the sum over
+    the values of a batch mapping.
+
+    :param result: The lookup result.
+    :type result: Any.
+
+    :return: See description.
+    :rtype: int.
+    """
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(rows(value) for value in result.values())
+    return 1
+
+
+class Metrics:
+    """
+    It collects per-country call counts, latency histograms, returned rows, engine and connection opens and cache
+    hits of the lookups. It is disabled by default, in which case the instrumented code only checks the enabled flag.
+    The country codes that are not known ones are recorded as OTHER, so that the caller input cannot grow the metrics.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Constructor.
+
+        :param enabled: Whether the metrics are collected.
+        :type enabled: bool.
+        """
+        self.enabled = enabled
+        self._lock = Lock()
+        self._callbacks: List[Callable[[Sample], None]] = []
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._rows = Counter()
+        self._opens = Counter()
+        self._cache = Counter()
+
+    def enable(self) -> None:
+        """
+        It starts collecting the metrics.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.enabled = True
+
+    def disable(self) -> None:
+        """
+        It stops collecting the metrics, keeping the ones collected so far.
+
+        :return: None.
+        :rtype: None.
+        """
+        self.enabled = False
+
+    def register(self, callback: Callable[[Sample], None]) -> None:
+        """
+        It registers a callback called with every observed sample, e.g. to forward it to a tracing system. Callbacks
+        run on the calling thread and should be fast.
+
+        :param callback: The callback.
+        :type callback: Callable[[Sample], None].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._callbacks = self._callbacks + [callback]
+
+    def unregister(self, callback: Callable[[Sample], None]) -> None:
+        """
+        It removes a registered callback.
+
+        :param callback: The callback.
+        :type callback: Callable[[Sample], None].
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._callbacks = [registered for registered in self._callbacks if registered is not callback]
+
+    def observe(self, operation: str, countrycode: str, seconds: float, count: int = 0) -> None:
+        """
+        It records an operation on the given country.
+
+        :param operation: The operation, e.g. the name of the lookup.
+        :type operation: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param seconds: The latency.
+        :type seconds: float.
+
+        :param count: The number of rows returned.
+        :type count: int.
+
+        :return: None.
+        :rtype: None.
+        """
+        countrycode = country(f'{countrycode}')
+        key = (operation, countrycode)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            self._rows[key] += count
+            callbacks = self._callbacks
+        for callback in callbacks:
+            callback(Sample(operation, countrycode, seconds, count))
+
+    def opened(self, kind: str, countrycode: str, seconds: float = 0.0) -> None:
+        """
+        It records the opening of an engine or of a connection, together with the time it took.
+
+        :param kind: What was opened, 'engine' or 'connection'.
+        :type kind: str.
+
+        :param countrycode: The country code, or the database name when the country is unknown.
+        :type countrycode: str.
+
+        :param seconds: The time taken.
+        :type seconds: float.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._opens[(kind, country(f'{countrycode}'))] += 1
+        self.observe(f'open_{kind}', countrycode, seconds)
+
+    def cached(self, countrycode: str, hit: bool) -> None:
+        """
+        It records a lookup of the result cache.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param hit: Whether the result was found.
+        :type hit: bool.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._cache[(country(f'{countrycode}'), 'hit' if hit else 'miss')] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        It returns a copy of the collected metrics: for each operation and country the calls, the returned rows, the
+        total, p50 and p99 latency in seconds, then the opens and the cache hit rate of each country.
+
+        :return: See description.
+        :rtype: Dict[str, Any].
+        """
+        with self._lock:
+            calls = {
+                key: dict(
+                    calls=histogram.count,
+                    rows=self._rows[key],
+                    seconds=histogram.sum,
+                    p50=histogram.quantile(0.5),
+                    p99=histogram.quantile(0.99),
+                )
+                for key, histogram in self._histograms.items()
+            }
+            countries = {countrycode for countrycode, _ in self._cache}
+            cache = {
+                countrycode: self._cache[(countrycode, 'hit')] /
+                (self._cache[(countrycode, 'hit')] + self._cache[(countrycode, 'miss')])
+                for countrycode in countries
+            }
+            return dict(calls=calls, opens=dict(self._opens), cache_hit_rate=cache)
+
+    def prometheus(self, prefix: str = 'zipcodes') -> str:
+        """
+        It exports the collected metrics in the Prometheus text exposition format, escaping the label values.
+
+        :param prefix: The prefix of the metric names.
+        :type prefix: str.
+
+        :return: See description.
+        :rtype: str.
+        """
+        with self._lock:
+            histograms = sorted((key, list(histogram.counts), histogram.sum, histogram.count)
+                                for key, histogram in self._histograms.items())
+            returned = sorted(self._rows.items())
+            opens = sorted(self._opens.items())
+            cache = sorted(self._cache.items())
+
+        lines = [
+            f'# HELP {prefix}_calls_total Operations run, by operation and country.',
+            f'# TYPE {prefix}_calls_total counter',
+        ]
+        for (operation, countrycode), _, _, count in histograms:
+            lines.append(f'{prefix}_calls_total{{operation="{label(operation)}",country="{label(countrycode)}"}} '
+                         f'{count}')
+
+        lines.append(f'# HELP {prefix}_latency_seconds Latency of the operations, by operation and country.')
+        lines.append(f'# TYPE {prefix}_latency_seconds histogram')
+        for (operation, countrycode), counts, total, count in histograms:
+            labels = f'operation="{label(operation)}",country="{label(countrycode)}"'
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f'{prefix}_latency_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{prefix}_latency_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{prefix}_latency_seconds_sum{{{labels}}} {total!r}')
+            lines.append(f'{prefix}_latency_seconds_count{{{labels}}} {count}')
+
+        lines.append(f'# HELP {prefix}_rows_total Rows returned, by operation and country.')
+        lines.append(f'# TYPE {prefix}_rows_total counter')
+        for (operation, countrycode), count in returned:
+            lines.append(f'{prefix}_rows_total{{operation="{label(operation)}",country="{label(countrycode)}"}} '
+                         f'{count}')
+
+        lines.append(f'# HELP {prefix}_opens_total Engines and connections opened, by country.')
+        lines.append(f'# TYPE {prefix}_opens_total counter')
+        for (kind, countrycode), count in opens:
+            lines.append(f'{prefix}_opens_total{{kind="{label(kind)}",country="{label(countrycode)}"}} {count}')
+
+        lines.append(f'# HELP {prefix}_cache_requests_total Result cache requests, by country and result.')
+        lines.append(f'# TYPE {prefix}_cache_requests_total counter')
+        for (countrycode, result), count in cache:
+            lines.append(f'{prefix}_cache_requests_total{{country="{label(countrycode)}",result="{label(result)}"}} '
+                         f'{count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        """
+        It drops the collected metrics, keeping the callbacks.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._histograms = {}
+            self._rows = Counter()
+            self._opens = Counter()
+            self._cache = Counter()
+
+
+# The metrics of the process, shared by all the controllers.
+metrics = Metrics(cfg['metrics'])
+
+
+def instrumented(operation: str, position: int) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    It decorates a lookup method so that, when the metrics are enabled, its latency and returned rows are recorded
+    under the given operation and the country found among its arguments.
+
+    :param operation: The name of the operation.
+    :type operation: str.
+
+    :param position: The position of the countrycode argument, self excluded.
+    :type position: int.
+
+    :return: See description.
+    :rtype: Callable[[Callable[..., Any]], Callable[..., Any]].
+    """
+    def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(function)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            if not metrics.enabled:
+                return function(self, *args, **kwargs)
+            start = perf_counter()
+            result = function(self, *args, **kwargs)
+            countrycode = args[position] if len(args) > position else kwargs.get('countrycode')
+            metrics.observe(operation, countrycode, perf_counter() - start, rows(result))
+            return result
+        return wrapper
+    return decorator
+
@@ -0,0 +1,207 @@
+from logging import getLogger
+from mmap import mmap, ACCESS_READ
+from pathlib import Path
+from struct import Struct
+from typing import Dict, Iterable, List, Optional as Opt, Tuple
+from configuration import configuration as cfg
+from normalize import postalkey
+
+# The layout of the index file, all integers are little endian:
+#   HEADER                      magic, number of countries
+#   COUNTRY * countries         sorted by country code, with the width of its canonical postal codes
+#   ENTRY * ...                 per country, the placename table and the canonical postal code table, both sorted
+#                               by key bytes
+#   REF * ...                   postings, the values of each entry
+#   string pool                 UTF-8 strings referenced by entries and postings
+# The version in the magic changes with the layout, so that the files compiled before are rejected.
+MAGIC = b'ZIPIDX02'
+HEADER = Struct('<8sI4x')
+COUNTRY = Struct('<2sHIIII')
+ENTRY = Struct('<IIII')
+REF = Struct('<II')
+
+
+class MmapIndex:
+    """
+    It serves the Controller lookups by binary search over the memory mapped single-file index of all the countries,
+    so that every process shares the same page cache pages.
+    """
+
+    def __init__(self, path: Opt[Path] = None) -> None:
+        """
+        Constructor.
+
+        :param path: The index file, defaults to the configured one.
+        :type path: Opt[Path].
+        """
+        self.logger = getLogger(__name__)
+        self.path = path or cfg['index_file']
+        with open(self.path, 'rb') as file:
+            self._mm = mmap(file.fileno(), 0, access=ACCESS_READ)
+        # The values are decoded through slices of this view, which share the mapped pages.
+        self._view = memoryview(self._mm)
+        magic, count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._view.release()
+            self._mm.close()
+            raise ValueError(f'Not a zipcodes index: {self.path}')
+        self._countries = {}
+        self._widths = {}
+        for position in range(count):
+            code, width, *tables = COUNTRY.unpack_from(self._mm, HEADER.size + position * COUNTRY.size)
+            self._countries[code.decode('ascii')] = tables
+            self._widths[code.decode('ascii')] = width
+
+    def string(self, offset: int, length: int) -> str:
+        """
+        It decodes the string at the given position of the pool.
+
+        :param offset: The offset of the string.
+        :type offset: int.
+
+        :param length: The length of the string.
+        :type length: int.
+
+        :return: See description.
+        :rtype: str.
+        """
+        return str(self._view[offset:offset + length], 'utf-8')
+
+    def search(self, table: int, count: int, key: str) -> Opt[Tuple[int, int]]:
+        """
+        It looks the given key up in a sorted table of entries. Each probed key is sliced straight out of the map into
+        a small bytes object, one copy compared with a single C level comparison.
+
+        :param table: The offset of the table.
+        :type table: int.
+
+        :param count: The number of entries in the table.
+        :type count: int.
+
+        :param key: The key.
+        :type key: str.
+
+        :return: It returns the offset and the number of the postings of the key, or None if it is missing.
+        :rtype: Opt[Tuple[int, int]].
+        """
+        mm = self._mm
+        target = key.encode('utf-8')
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            offset, length, postings, size = ENTRY.unpack_from(mm, table + middle * ENTRY.size)
+            current = mm[offset:offset + length]
+            if current == target:
+                return postings, size
+            if current < target:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def values(self, postings: int, size: int, limit: Opt[int] = None) -> List[str]:
+        """
+        It decodes the strings referenced by the given postings.
+
+        :param postings: The offset of the postings.
+        :type postings: int.
+
+        :param size: The number of postings.
+        :type size: int.
+
+        :param limit: The maximum number of values to decode.
+        :type limit: Opt[int].
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        size = min(size, limit) if limit is not None else size
+        return [self.string(*REF.unpack_from(self._mm, postings + i * REF.size)) for i in range(size)]
+
+    def zipcode_by_placename(self, placename: str, countrycode: str) -> Opt[str]:
+        """
+        It gets the zipcode of the place in placename or None.
+
+        :param placename: The name of the place to retrieve the zipcode from.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None.
+        :rtype: Opt[str].
+        """
+        tables = self._countries.get(countrycode)
+        if tables is None:
+            return None
+        found = self.search(tables[0], tables[1], f'{placename}')
+        return self.values(*found, limit=1)[0] if found else None
+
+    def placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
+        """
+        It gets the names of the places in the country with the given pair (countrycode, zipcode) or None.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode.
+        :type zipcode: int.
+
+        :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
+        :rtype: Opt[List[str]].
+        """
+        tables = self._countries.get(countrycode)
+        if tables is None:
+            return None
+        found = self.search(tables[2], tables[3], postalkey(zipcode, self._widths[countrycode]))
+        return self.values(*found) if found else None
+
+    def zipcodes_by_placenames(self, countrycode: str, placenames: Iterable[str]) -> Dict[str, Opt[str]]:
+        """
+        It gets the zipcodes of many places of the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param placenames: The names of the places to retrieve the zipcodes from.
+        :type placenames: Iterable[str].
+
+        :return: It returns a mapping from each given placename to its canonical postal code or None.
+        :rtype: Dict[str, Opt[str]].
+        """
+        return {f'{placename}': self.zipcode_by_placename(placename, countrycode) for placename in placenames}
+
+    def placenames_by_zipcodes(self, countrycode: str, zipcodes: Iterable[int]) -> Dict[int, Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes in the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The zipcodes.
+        :type zipcodes: Iterable[int].
+
+        :return: It returns a mapping from each given zipcode to the names of its places or None.
+        :rtype: Dict[int, Opt[List[str]]].
+        """
+        return {zipcode: self.placenames_by_zipcode(countrycode, zipcode) for zipcode in zipcodes}
+
+    def countries(self) -> List[str]:
+        """
+        It returns the codes of the countries held by the index.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        return list(self._countries)
+
+    def close(self) -> None:
+        """
+        It unmaps the index file.
+
+        :return: None.
+        :rtype: None.
+        """
+        if not self._mm.closed:
+            self._view.release()
+            self._mm.close()
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, REAL
+from sqlalchemy.orm import deferred
 from sqlengine import Base, SqlEngine
 from typing import Tuple, Any
 
@@ -24,6 +25,10 @@ class ZipCodes(Base):
     longitude = Column(REAL, nullable=True)
     accuracy = Column(Integer, nullable=True)
     coordinates = Column(String, nullable=True)
+    # The normalized placename built by data/splitter.py, deferred since the source zipcodes.db lacks it.
+    placekey = deferred(Column(String, nullable=True))
+    # The zero padded postalcode built by data/splitter.py, deferred for the same reason.
+    postalkey = deferred(Column(String, nullable=True))
 
     def to_tuple(self) -> Tuple[Any]:
         """
@@ -32,7 +37,7 @@ class ZipCodes(Base):
         :return: See description.
         :rtype: Tuple[Any].
         """
-        return self.postalcode, self.countrycode, self.placename, self.adminname1, self.admincode1,\
+        return self.countrycode, self.postalcode, self.placename, self.adminname1, self.admincode1,\
                 self.adminname2, self.admincode2, self.adminname3, self.admincode3, self.latitude,\
                 self.longitude, self.accuracy, self.coordinates
 
@@ -63,6 +68,10 @@ class ZipCodesIT(Base):
     CodFisco = Column(String, nullable=True)
     Abitanti = Column(Integer, nullable=True)
     Link = Column(String, nullable=True)
+    # The normalized Comune built by data/splitter.py.
+    placekey = deferred(Column(String, nullable=True))
+    # The zero padded CAP built by data/comuni.py.
+    postalkey = deferred(Column(String, nullable=True))
 
     def __repr__(self) -> str:
         """
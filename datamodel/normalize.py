@@ -0,0 +1,81 @@
+from re import compile as regex
+from unicodedata import category, combining, normalize
+from typing import Any, Iterable, Optional as Opt
+
+# The countries whose placenames may transliterate the umlauts instead of dropping them, e.g. München as Muenchen.
+TRANSLITERATIONS = frozenset(('DE', 'AT', 'CH', 'LI', 'LU'))
+
+# The transliterated umlauts, contracted to their vowel so that München, Muenchen and Munchen share their key.
+UMLAUTS = regex('([aou])e')
+
+
+def fold(text: str) -> str:
+    """
+    It folds the given text for comparison: case folded, diacritics stripped and whitespace collapsed.
+
+    :param text: The text to fold.
+    :type text: str.
+
+    :return: See description.
+    :rtype: str.
+    """
+    decomposed = normalize('NFKD', f'{text}'.casefold())
+    return ' '.join(''.join(char for char in decomposed if not combining(char)).split())
+
+
+def placekey(placename: Opt[str], countrycode: Opt[str] = None) -> Opt[str]:
+    """
+    It computes the normalized key of a placename stored in the placekey column: case folded, diacritics stripped,
+    punctuation turned into spaces and whitespace collapsed. In the German speaking countries the transliterated
+    umlauts ae, oe and ue are contracted to a, o and u, so that the folded and the transliterated spellings match.
+
+    :param placename: The placename.
+    :type placename: Opt[str].
+
+    :param countrycode: The country code of the placename.
+    :type countrycode: Opt[str].
+
+    :return: It returns the key, or None if placename is None.
+    :rtype: Opt[str].
+    """
+    if placename is None:
+        return None
+    decomposed = normalize('NFKD', f'{placename}'.casefold())
+    kept = (' ' if category(char)[0] in 'PSZ' else char for char in decomposed if not combining(char))
+    key = ' '.join(''.join(kept).split())
+    return UMLAUTS.sub(r'\1', key) if countrycode in TRANSLITERATIONS else key
+
+
+def postalkey(zipcode: Any, width: int) -> Opt[str]:
+    """
+    It computes the canonical key of a postal code stored in the postalkey column: its text, zero padded to the given
+    width when made of digits only, so that 501 and '00501' are both '00501' in a country of 5 digit postal codes.
+
+    :param zipcode: The postal code.
+    :type zipcode: Any.
+
+    :param width: The width of the numeric postal codes of the country, see keywidth.
+    :type width: int.
+
+    :return: It returns the key, or None if zipcode is None.
+    :rtype: Opt[str].
+    """
+    if zipcode is None:
+        return None
+    key = f'{zipcode}'.strip()
+    return key.zfill(width) if key.isascii() and key.isdigit() else key
+
+
+def keywidth(zipcodes: Iterable[Any]) -> int:
+    """
+    It computes the width the numeric postal codes of a country are padded to in their keys: the length of its longest
+    postal code made of digits only, 0 if it has none.
+
+    :param zipcodes: The postal codes of the country.
+    :type zipcodes: Iterable[Any].
+
+    :return: See description.
+    :rtype: int.
+    """
+    keys = (f'{zipcode}'.strip() for zipcode in zipcodes if zipcode is not None)
+    return max((len(key) for key in keys if key.isascii() and key.isdigit()), default=0)
@@ -0,0 +1,370 @@
+from logging import getLogger
+from pathlib import Path
+from sqlite3 import connect, Connection, Error as SQLiteError
+from threading import Lock, RLock, local
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional as Opt, Tuple
+from weakref import WeakSet, finalize
+from configuration import configuration as cfg
+from normalize import placekey, postalkey
+from metrics import metrics
+from registry import Registry
+
+
+class Schema(NamedTuple):
+    """
+    It names the table and the lookup columns holding the data of a country.
+    """
+
+    table: str
+    placename: str
+    postalcode: str
+
+
+SCHEMA = Schema('"geonames-postal-code"', 'placename', 'postalcode')
+SCHEMA_IT = Schema('listacomuni', 'Comune', 'CAP')
+
+# The column of both tables holding the normalized placenames.
+PLACEKEY = 'placekey'
+
+# The column of both tables holding the canonical postal codes.
+POSTALKEY = 'postalkey'
+
+# The width the numeric postal codes of each existing database are zero padded to in their keys, keyed by the
+# database folder and the country code, see padding().
+_paddings: Dict[Tuple[Path, str], int] = {}
+
+
+def schema(countrycode: str) -> Schema:
+    """
+    It gets the schema of the database of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: See description.
+    :rtype: Schema.
+    """
+    return SCHEMA_IT if countrycode == 'IT' else SCHEMA
+
+
+def open_readonly(countrycode: str) -> Opt[Connection]:
+    """
+    It opens the database of the given country through a read-only and immutable URI.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the connection or None if the database does not exist.
+    :rtype: Opt[Connection].
+    """
+    dbname = cfg['db_folder'] / f'zipcodes_{countrycode}.db'
+    if not dbname.exists():
+        return None
+    start = perf_counter()
+    connection = connect(
+        f'{dbname.absolute().as_uri()}?mode=ro&immutable=1',
+        uri=True,
+        check_same_thread=False,
+        cached_statements=cfg['cached_statements']
+    )
+    if metrics.enabled:
+        metrics.opened('connection', countrycode, perf_counter() - start)
+    return connection
+
+
+def padding(countrycode: str) -> int:
+    """
+    It gets the width the numeric postal codes of the given country are zero padded to in the postalkey column, read
+    once from its database in the configured folder as the length of its longest key made of digits only. Only the
+    widths read from existing databases are cached.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the width, 0 if the country has no numeric postal codes or no database.
+    :rtype: int.
+    """
+    key = (cfg['db_folder'], countrycode)
+    width = _paddings.get(key)
+    if width is not None:
+        return width
+    connection = open_readonly(countrycode)
+    if connection is None:
+        return 0
+    try:
+        row = connection.execute(
+            f'SELECT MAX(LENGTH("{POSTALKEY}")) FROM {schema(countrycode).table} '
+            f'WHERE "{POSTALKEY}" NOT GLOB \'*[^0-9]*\''
+        ).fetchone()
+    except SQLiteError:
+        return 0
+    finally:
+        connection.close()
+    width = _paddings[key] = row[0] or 0
+    return width
+
+
+def canonical(countrycode: str, zipcode: Any) -> Opt[str]:
+    """
+    It gets the key of the given postal code in the postalkey column of the database of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param zipcode: The postal code, either as text or as an integer.
+    :type zipcode: Any.
+
+    :return: See description.
+    :rtype: Opt[str].
+    """
+    return postalkey(zipcode, padding(countrycode))
+
+
+class Lease:
+    """
+    It stands for the connections of a thread in its thread-local storage. The storage is dropped when the thread
+    exits, and the lease with it, which closes the connections.
+    """
+
+    __slots__ = ('__weakref__',)
+
+
+class RawEngine:
+    """
+    It serves the Controller lookups straight from the sqlite3 driver, without building any ORM object.
+
+    By default the connections are shared by all the threads and every statement runs under a lock. In thread-safe
+    mode each thread keeps its own read-only connection per country instead, so that the read path takes no lock
+    shared among threads; the connections opened by a thread are released when it exits, or by close().
+    """
+
+    def __init__(self, max_connections: int, thread_safe: bool = False) -> None:
+        """
+        Constructor.
+
+        :param max_connections: The maximum number of per-country connections kept open, per thread in thread-safe
+            mode.
+        :type max_connections: int.
+
+        :param thread_safe: Whether each thread gets its own connections.
+        :type thread_safe: bool.
+        """
+        self.logger = getLogger(__name__)
+        self._max_connections = max_connections
+        self._thread_safe = thread_safe
+        self._connections = Registry(open_readonly, Connection.close, max_connections)
+        self._lock = RLock()
+        self._local = local()
+        self._registries = WeakSet()
+        self._registries_lock = Lock()
+
+    def connections(self) -> Registry:
+        """
+        It gets the registry of the connections of the calling thread, creating it on its first call together with the
+        lease closing it when the thread exits. The registries of the live threads are tracked weakly, for close().
+
+        :return: See description.
+        :rtype: Registry.
+        """
+        registry = getattr(self._local, 'registry', None)
+        if registry is None:
+            registry = self._local.registry = Registry(open_readonly, Connection.close, self._max_connections)
+            self._local.lease = Lease()
+            finalize(self._local.lease, registry.close)
+            with self._registries_lock:
+                self._registries.add(registry)
+        return registry
+
+    def execute(self, connections: Registry, countrycode: str, sql: str,
+                parameters: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        """
+        It runs the given statement on the connection of the given country taken from the given registry.
+
+        :param connections: The registry of the connections.
+        :type connections: Registry.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param sql: The statement.
+        :type sql: str.
+
+        :param parameters: The statement parameters.
+        :type parameters: Tuple[Any, ...].
+
+        :return: It returns the rows as plain tuples, or an empty list if the database is missing or fails.
+        :rtype: List[Tuple[Any, ...]].
+        """
+        connection = connections.get(countrycode)
+        if connection is None:
+            return []
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        except SQLiteError as e:
+            self.logger.error(f'{e.__str__()}')
+            return []
+
+    def fetch(self, countrycode: str, sql: str, parameters: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        """
+        It runs the given statement against the database of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param sql: The statement, prepared once per connection and then reused from the statement cache.
+        :type sql: str.
+
+        :param parameters: The statement parameters.
+        :type parameters: Tuple[Any, ...].
+
+        :return: It returns the rows as plain tuples, or an empty list if the database is missing or fails.
+        :rtype: List[Tuple[Any, ...]].
+        """
+        if self._thread_safe:
+            return self.execute(self.connections(), countrycode, sql, parameters)
+        with self._lock:
+            return self.execute(self._connections, countrycode, sql, parameters)
+
+    def zipcode_by_placename(self, placename: str, countrycode: str, normalize: bool = False) -> Opt[str]:
+        """
+        It gets the zipcode of the place in placename or None.
+
+        :param placename: The name of the place to retrieve the zipcode from.
+        :type placename: str.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param normalize: Whether to match the normalized placename against the placekey column.
+        :type normalize: bool.
+
+        :return: It returns the canonical postal code for the given placename if it exists or None.
+        :rtype: Opt[str].
+        """
+        table, placename_column, _ = schema(countrycode)
+        column, key = (PLACEKEY, placekey(placename, countrycode)) if normalize else (placename_column, placename)
+        data = self.fetch(
+            countrycode,
+            f'SELECT "{POSTALKEY}" FROM {table} WHERE "{column}" = ? LIMIT 1',
+            (f'{key}',)
+        )
+        return data[0][0] if data else None
+
+    def placenames_by_zipcode(self, countrycode: str, zipcode: int) -> Opt[List[str]]:
+        """
+        It gets the names of the places in the country with the given pair (countrycode, zipcode) or None.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcode: The zipcode.
+        :type zipcode: int.
+
+        :return: It returns the place's name in the country with the given countrycode having the given zipcode or None.
+        :rtype: Opt[List[str]].
+        """
+        table, placename_column, _ = schema(countrycode)
+        data = self.fetch(
+            countrycode,
+            f'SELECT "{placename_column}" FROM {table} WHERE "{POSTALKEY}" = ?',
+            (canonical(countrycode, zipcode),)
+        )
+        return [row[0] for row in data] if data else None
+
+    def fetch_in(self, countrycode: str, select: str, column: str, keys: List[str]) -> List[Tuple[Any, ...]]:
+        """
+        It runs chunked "column IN (...)" queries for the given keys against the database of the given country.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param select: The comma separated list of the selected columns.
+        :type select: str.
+
+        :param column: The filtered column.
+        :type column: str.
+
+        :param keys: The values of the filtered column.
+        :type keys: List[str].
+
+        :return: It returns the rows of all the chunks as plain tuples.
+        :rtype: List[Tuple[Any, ...]].
+        """
+        table = schema(countrycode).table
+        size = cfg['batch_chunk_size']
+        rows = []
+        for start in range(0, len(keys), size):
+            chunk = tuple(keys[start:start + size])
+            marks = ', '.join('?' * len(chunk))
+            rows.extend(self.fetch(countrycode, f'SELECT {select} FROM {table} WHERE "{column}" IN ({marks})', chunk))
+        return rows
+
+    def zipcodes_by_placenames(self, countrycode: str, placenames: Iterable[str],
+                               normalize: bool = False) -> Dict[str, Opt[str]]:
+        """
+        It gets the zipcodes of many places of the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param placenames: The names of the places to retrieve the zipcodes from.
+        :type placenames: Iterable[str].
+
+        :param normalize: Whether to match the normalized placenames against the placekey column.
+        :type normalize: bool.
+
+        :return: It returns a mapping from each given placename to its canonical postal code or None.
+        :rtype: Dict[str, Opt[str]].
+        """
+        result = {f'{placename}': None for placename in placenames}
+        placename_column = schema(countrycode).placename
+        if not normalize:
+            select = f'"{placename_column}", "{POSTALKEY}"'
+            for placename, zipcode in self.fetch_in(countrycode, select, placename_column, list(result)):
+                if result[placename] is None:
+                    result[placename] = zipcode
+            return result
+
+        keys = {placename: placekey(placename, countrycode) for placename in result}
+        found = {}
+        for key, zipcode in self.fetch_in(countrycode, f'"{PLACEKEY}", "{POSTALKEY}"', PLACEKEY,
+                                          list(set(keys.values()))):
+            found.setdefault(key, zipcode)
+        return {placename: found.get(key) for placename, key in keys.items()}
+
+    def placenames_by_zipcodes(self, countrycode: str, zipcodes: Iterable[int]) -> Dict[int, Opt[List[str]]]:
+        """
+        It gets the names of the places having any of the given zipcodes in the same country at once.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :param zipcodes: The zipcodes.
+        :type zipcodes: Iterable[int].
+
+        :return: It returns a mapping from each given zipcode to the names of its places or None.
+        :rtype: Dict[int, Opt[List[str]]].
+        """
+        keys = {zipcode: canonical(countrycode, zipcode) for zipcode in zipcodes}
+        placename_column = schema(countrycode).placename
+        found: Dict[str, List[str]] = {}
+        for key, placename in self.fetch_in(countrycode, f'"{POSTALKEY}", "{placename_column}"', POSTALKEY,
+                                            list(set(keys.values()))):
+            found.setdefault(key, []).append(placename)
+        return {zipcode: list(found[key]) if key in found else None for zipcode, key in keys.items()}
+
+    def close(self) -> None:
+        """
+        It closes all the connections held by the current instance.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            self._connections.close()
+        with self._registries_lock:
+            for registry in list(self._registries):
+                registry.close()
+            self._registries = WeakSet()
+        self._local = local()
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from logging import getLogger
+from threading import RLock
+from typing import Any, Callable, List, Optional as Opt
+
+
+class Registry:
+    """
+    It keeps a bounded, thread-safe and LRU ordered mapping of country codes to lazily opened resources.
+    """
+
+    def __init__(self, opener: Callable[[str], Any], closer: Callable[[Any], None], capacity: int) -> None:
+        """
+        Constructor.
+
+        :param opener: The callable opening the resource of the given country code, it may return None on failure.
+        :type opener: Callable[[str], Any].
+
+        :param closer: The callable releasing a resource previously returned by opener.
+        :type closer: Callable[[Any], None].
+
+        :param capacity: The maximum number of resources kept open at the same time.
+        :type capacity: int.
+        """
+        if capacity < 1:
+            raise ValueError(f'Invalid registry capacity: {capacity}')
+        self.logger = getLogger(__name__)
+        self._opener = opener
+        self._closer = closer
+        self._capacity = capacity
+        self._items = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, countrycode: str) -> Opt[Any]:
+        """
+        It gets the resource of the given country code, opening it on first use and evicting the least recently
+        used one when the capacity is exceeded.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: It returns the resource for the given country code or None if it cannot be opened.
+        :rtype: Opt[Any].
+        """
+        with self._lock:
+            item = self._items.get(countrycode)
+            if item is not None:
+                self._items.move_to_end(countrycode)
+                return item
+
+            item = self._opener(countrycode)
+            if item is None:
+                return None
+
+            self._items[countrycode] = item
+            if len(self._items) > self._capacity:
+                code, evicted = self._items.popitem(last=False)
+                self.logger.debug(f'Evicting resource of: {code}')
+                self._closer(evicted)
+            return item
+
+    def evict(self, countrycode: str) -> None:
+        """
+        It closes and forgets the resource of the given country code, if any.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            item = self._items.pop(countrycode, None)
+            if item is not None:
+                self._closer(item)
+
+    def close(self) -> None:
+        """
+        It closes all the resources currently held.
+
+        :return: None.
+        :rtype: None.
+        """
+        with self._lock:
+            while self._items:
+                _, item = self._items.popitem(last=False)
+                self._closer(item)
+
+    def keys(self) -> List[str]:
+        """
+        It returns the country codes currently held, from the least to the most recently used.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        with self._lock:
+            return list(self._items.keys())
+
+    def __contains__(self, countrycode: str) -> bool:
+        """
+        It returns True if the resource of the given country code is currently held, False otherwise.
+
+        :param countrycode: The country code.
+        :type countrycode: str.
+
+        :return: See description.
+        :rtype: bool.
+        """
+        with self._lock:
+            return countrycode in self._items
+
+    def __len__(self) -> int:
+        """
+        It returns the number of resources currently held.
+
+        :return: See description.
+        :rtype: int.
+        """
+        with self._lock:
+            return len(self._items)
@@ -0,0 +1,414 @@
+from logging import getLogger
+from typing import Any, Dict, List, NamedTuple, Optional as Opt, Tuple
+from numpy import arange, arcsin, argpartition, argsort, array, asarray, ceil, clip, concatenate, cos, degrees, \
+    float64, floor, inf, int64, minimum, ndarray, pi, radians, searchsorted, sin, sqrt
+from configuration import configuration as cfg
+from normalize import keywidth, postalkey
+from rawengine import open_readonly, POSTALKEY, SCHEMA
+from registry import Registry
+
+# The mean Earth radius in km, and the length of one degree of latitude.
+EARTH_RADIUS = 6371.0088
+DEGREE = EARTH_RADIUS * 3.141592653589793 / 180
+
+
+class Nearby(NamedTuple):
+    """
+    It represents a postal code found near a point, with its distance in km.
+    """
+
+    countrycode: str
+    zipcode: str
+    placename: str
+    distance: float
+
+
+def haversine(lat: float, lon: float, lats: ndarray, lons: ndarray) -> ndarray:
+    """
+    It computes the great circle distances in km between a point and many points, all in radians.
+
+    :param lat: The latitude of the point.
+    :type lat: float.
+
+    :param lon: The longitude of the point.
+    :type lon: float.
+
+    :param lats: The latitudes of the points.
+    :type lats: ndarray.
+
+    :param lons: The longitudes of the points.
+    :type lons: ndarray.
+
+    :return: See description.
+    :rtype: ndarray.
+    """
+    a = sin((lats - lat) / 2) ** 2 + cos(lat) * cos(lats) * sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS * arcsin(sqrt(minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """
+    It indexes postal code coordinates in grid buckets: the points are sorted by the cell of a regular latitude and
+    longitude grid, so that the points of a block of cells are found by binary search and measured in bulk.
+    """
+
+    def __init__(self, countrycodes: List[str], zipcodes: List[str], placenames: List[str], latitudes: ndarray,
+                 longitudes: ndarray) -> None:
+        """
+        Constructor.
+
+        :param countrycodes: The country codes of the points.
+        :type countrycodes: List[str].
+
+        :param zipcodes: The canonical postal codes of the points, the zipcodes are located by.
+        :type zipcodes: List[str].
+
+        :param placenames: The placenames of the points.
+        :type placenames: List[str].
+
+        :param latitudes: The latitudes of the points in degrees.
+        :type latitudes: ndarray.
+
+        :param longitudes: The longitudes of the points in degrees.
+        :type longitudes: ndarray.
+        """
+        self.cell = cfg['spatial_cell_degrees']
+        self.rows = int(ceil(180 / self.cell)) + 1
+        self.columns = int(ceil(360 / self.cell))
+        keys = self.row(latitudes) * self.columns + self.column(longitudes)
+        order = argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.countrycodes = array(countrycodes, dtype=object)[order]
+        self.zipcodes = array(zipcodes, dtype=object)[order]
+        self.placenames = array(placenames, dtype=object)[order]
+        self.latitudes = radians(latitudes[order])
+        self.longitudes = radians(longitudes[order])
+        self.positions = {}
+        for position, key in enumerate(self.zipcodes.tolist()):
+            self.positions.setdefault(key, position)
+        self.width = keywidth(self.positions)
+
+    def __len__(self) -> int:
+        """
+        It returns the number of indexed points.
+
+        :return: See description.
+        :rtype: int.
+        """
+        return len(self.zipcodes)
+
+    def row(self, latitudes: Any) -> Any:
+        """
+        It gets the grid rows of the given latitudes in degrees.
+
+        :param latitudes: The latitudes.
+        :type latitudes: Any.
+
+        :return: See description.
+        :rtype: Any.
+        """
+        return floor((clip(latitudes, -90, 90) + 90) / self.cell).astype(int64)
+
+    def column(self, longitudes: Any) -> Any:
+        """
+        It gets the grid columns of the given longitudes in degrees.
+
+        :param longitudes: The longitudes.
+        :type longitudes: Any.
+
+        :return: See description.
+        :rtype: Any.
+        """
+        return floor(((asarray(longitudes) + 180) % 360) / self.cell).astype(int64) % self.columns
+
+    def block(self, row: int, column: int, rows: int, columns: int) -> ndarray:
+        """
+        It gets the positions of the points in the block of cells centered on the given cell.
+
+        :param row: The row of the central cell.
+        :type row: int.
+
+        :param column: The column of the central cell.
+        :type column: int.
+
+        :param rows: The number of rows on each side of the central cell.
+        :type rows: int.
+
+        :param columns: The number of columns on each side of the central cell, wrapping around the antimeridian.
+        :type columns: int.
+
+        :return: See description.
+        :rtype: ndarray.
+        """
+        lows, highs = [], []
+        if 2 * columns + 1 >= self.columns:
+            spans = [(0, self.columns - 1)]
+        elif column - columns < 0:
+            spans = [(column - columns + self.columns, self.columns - 1), (0, column + columns)]
+        elif column + columns >= self.columns:
+            spans = [(column - columns, self.columns - 1), (0, column + columns - self.columns)]
+        else:
+            spans = [(column - columns, column + columns)]
+        for current in range(max(0, row - rows), min(self.rows - 1, row + rows) + 1):
+            for low, high in spans:
+                lows.append(current * self.columns + low)
+                highs.append(current * self.columns + high)
+        starts = searchsorted(self.keys, lows, side='left')
+        stops = searchsorted(self.keys, highs, side='right')
+        ranges = [arange(start, stop) for start, stop in zip(starts.tolist(), stops.tolist()) if stop > start]
+        return concatenate(ranges) if ranges else arange(0)
+
+    def bound(self, lat: float, lon: float, row: int, column: int, size: int) -> float:
+        """
+        It computes a lower bound of the distance in km between the given point and any point outside of the block
+        of cells having the given size around the given cell.
+
+        :param lat: The latitude in degrees.
+        :type lat: float.
+
+        :param lon: The longitude in degrees.
+        :type lon: float.
+
+        :param row: The row of the central cell.
+        :type row: int.
+
+        :param column: The column of the central cell.
+        :type column: int.
+
+        :param size: The number of cells on each side of the central cell.
+        :type size: int.
+
+        :return: See description.
+        :rtype: float.
+        """
+        bounds = []
+        if row - size > 0 or row + size < self.rows - 1:
+            south = lat + 90 - (row - size) * self.cell if row - size > 0 else 180.0
+            north = (row + size + 1) * self.cell - lat - 90 if row + size < self.rows - 1 else 180.0
+            bounds.append(min(south, north) * DEGREE)
+        if 2 * size + 1 < self.columns:
+            offset = (lon + 180) % 360 - column * self.cell
+            gap = radians(min(offset + size * self.cell, (size + 1) * self.cell - offset, 90.0))
+            bounds.append(EARTH_RADIUS * float(arcsin(cos(radians(lat)) * sin(gap))))
+        return min(bounds) if bounds else inf
+
+    def results(self, positions: ndarray, distances: ndarray) -> List[Nearby]:
+        """
+        It builds the results for the given positions, sorted by distance.
+
+        :param positions: The positions of the points.
+        :type positions: ndarray.
+
+        :param distances: The distances of the points.
+        :type distances: ndarray.
+
+        :return: See description.
+        :rtype: List[Nearby].
+        """
+        order = argsort(distances, kind='stable')
+        positions = positions[order]
+        return list(map(
+            Nearby._make,
+            zip(self.countrycodes[positions].tolist(), self.zipcodes[positions].tolist(),
+                self.placenames[positions].tolist(), distances[order].tolist())
+        ))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Nearby]:
+        """
+        It gets the k points nearest to the given one, doubling the block of cells around it until the k-th nearest
+        candidate is closer than any point outside of the block.
+
+        :param lat: The latitude in degrees.
+        :type lat: float.
+
+        :param lon: The longitude in degrees.
+        :type lon: float.
+
+        :param k: The number of points.
+        :type k: int.
+
+        :return: It returns up to k points sorted by distance.
+        :rtype: List[Nearby].
+        """
+        if k < 1 or not len(self):
+            return []
+        row, column = int(self.row(lat)), int(self.column(lon))
+        size = 1
+        while True:
+            positions = self.block(row, column, size, size)
+            bound = self.bound(lat, lon, row, column, size)
+            if len(positions) >= k or bound == inf:
+                distances = haversine(radians(lat), radians(lon), self.latitudes[positions],
+                                      self.longitudes[positions])
+                count = min(k, len(distances))
+                best = argpartition(distances, count - 1)[:count] if count else arange(0)
+                if bound == inf or distances[best].max() <= bound:
+                    return self.results(positions[best], distances[best])
+            size *= 2
+
+    def locate(self, zipcode: Any) -> Opt[Tuple[float, float]]:
+        """
+        It gets the coordinates of the given zipcode, those of its first place when it has many.
+
+        :param zipcode: The zipcode.
+        :type zipcode: Any.
+
+        :return: It returns the latitude and the longitude in degrees, or None if the zipcode is missing.
+        :rtype: Opt[Tuple[float, float]].
+        """
+        position = self.positions.get(postalkey(zipcode, self.width))
+        if position is None:
+            return None
+        return float(degrees(self.latitudes[position])), float(degrees(self.longitudes[position]))
+
+    def within(self, lat: float, lon: float, km: float) -> List[Nearby]:
+        """
+        It gets the points within the given distance from the given one. The candidates are taken from the grid
+        cells overlapping the bounding box of the circle, pruned by the bounding box itself, and only then measured.
+
+        :param lat: The latitude in degrees.
+        :type lat: float.
+
+        :param lon: The longitude in degrees.
+        :type lon: float.
+
+        :param km: The distance in km.
+        :type km: float.
+
+        :return: It returns the points sorted by distance.
+        :rtype: List[Nearby].
+        """
+        if km < 0 or not len(self):
+            return []
+        delta_lat = km / DEGREE
+        top = min(90.0, abs(lat) + delta_lat)
+        delta_lon = 360.0 if top >= 90.0 else min(360.0, delta_lat / float(cos(radians(top))))
+        row, column = int(self.row(lat)), int(self.column(lon))
+        positions = self.block(row, column, int(ceil(delta_lat / self.cell)) + 1,
+                               int(ceil(delta_lon / self.cell)) + 1)
+
+        lats = self.latitudes[positions]
+        lons = self.longitudes[positions]
+        inside = abs(lats - radians(lat)) <= radians(delta_lat)
+        if delta_lon < 180.0:
+            inside &= abs((lons - radians(lon) + pi) % (2 * pi) - pi) <= radians(delta_lon)
+        positions, lats, lons = positions[inside], lats[inside], lons[inside]
+
+        distances = haversine(radians(lat), radians(lon), lats, lons)
+        inside = distances <= km
+        return self.results(positions[inside], distances[inside])
+
+
+def load_points(countrycode: str) -> Opt[Dict[str, Any]]:
+    """
+    It reads the coordinates of the postal codes of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the columns of the points, or None if the country has no coordinates.
+    :rtype: Opt[Dict[str, Any]].
+    """
+    if countrycode == 'IT':
+        return None
+    connection = open_readonly(countrycode)
+    if connection is None:
+        return None
+    try:
+        rows = connection.execute(
+            f'SELECT "{POSTALKEY}", "{SCHEMA.placename}", "latitude", "longitude" '
+            f'FROM {SCHEMA.table} '
+            f'WHERE "latitude" IS NOT NULL AND "longitude" IS NOT NULL'
+        ).fetchall()
+    finally:
+        connection.close()
+    return dict(
+        countrycodes=[countrycode] * len(rows),
+        zipcodes=[row[0] for row in rows],
+        placenames=[row[1] for row in rows],
+        latitudes=array([row[2] for row in rows], dtype=float64),
+        longitudes=array([row[3] for row in rows], dtype=float64),
+    )
+
+
+class SpatialIndexes:
+    """
+    It builds the spatial index of each country on first use and keeps the most recently used ones in a bounded
+    registry, together with the one of all the countries. Only the geonames-postal-code tables have coordinates, so
+    Italy is not indexed, and neither are the countries without a database: they get an empty index, not cached.
+    """
+
+    # The key of the index of all the countries.
+    ALL = '*'
+
+    def __init__(self) -> None:
+        """
+        Constructor.
+        """
+        self.logger = getLogger(__name__)
+        self._indexes = Registry(self.build, lambda index: None, cfg['index_cache_size'])
+
+    def countrycodes(self) -> List[str]:
+        """
+        It returns the codes of the countries having a database.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        return sorted(path.stem[len('zipcodes_'):] for path in cfg['db_folder'].glob('zipcodes_*.db'))
+
+    def build(self, countrycode: str) -> Opt[SpatialIndex]:
+        """
+        It builds the index of the given country, or of all the countries.
+
+        :param countrycode: The country code or ALL.
+        :type countrycode: str.
+
+        :return: It returns the index, or None if the country has no coordinates.
+        :rtype: Opt[SpatialIndex].
+        """
+        codes = self.countrycodes() if countrycode == SpatialIndexes.ALL else [countrycode]
+        points = [item for item in (load_points(code) for code in codes) if item is not None]
+        if not points and countrycode != SpatialIndexes.ALL:
+            return None
+        index = SpatialIndex(
+            [code for item in points for code in item['countrycodes']],
+            [zipcode for item in points for zipcode in item['zipcodes']],
+            [placename for item in points for placename in item['placenames']],
+            concatenate([item['latitudes'] for item in points] or [array([], dtype=float64)]),
+            concatenate([item['longitudes'] for item in points] or [array([], dtype=float64)]),
+        )
+        self.logger.debug(f'Spatial index of {countrycode}: {len(index)} points')
+        return index
+
+    def get(self, countrycode: Opt[str] = None) -> SpatialIndex:
+        """
+        It gets the index of the given country, or of all the countries if countrycode is None.
+
+        :param countrycode: The country code.
+        :type countrycode: Opt[str].
+
+        :return: See description.
+        :rtype: SpatialIndex.
+        """
+        index = self._indexes.get(countrycode or SpatialIndexes.ALL)
+        return index if index is not None else SpatialIndex([], [], [], array([], dtype=float64),
+                                                            array([], dtype=float64))
+
+    def keys(self) -> List[str]:
+        """
+        It returns the keys of the indexes currently cached, from the least to the most recently used.
+
+        :return: See description.
+        :rtype: List[str].
+        """
+        return self._indexes.keys()
+
+    def close(self) -> None:
+        """
+        It drops all the cached indexes.
+
+        :return: None.
+        :rtype: None.
+        """
+        self._indexes.close()
@@ -1,9 +1,12 @@
 from logging import getLogger, DEBUG
+from pathlib import Path
 from typing import Optional as Opt, Any
 from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import QueuePool
 from sqlite3 import Connection as SQLite3Connection
+from metrics import metrics
 
 Base = declarative_base()
 
@@ -67,21 +70,51 @@ class SqlEngine:
             return None
 
     @staticmethod
-    def get_sqlite_engine(dbname: str) -> Opt[Engine]:
+    def count_connections(engine: Engine, label: str) -> None:
+        """
+        It makes the given engine record each DBAPI connection it opens in the metrics, when they are enabled.
+
+        :param engine: The engine.
+        :type engine: Engine.
+
+        :param label: The label of the connections, i.e. the country code of the database.
+        :type label: str.
+
+        :return: None.
+        :rtype: None.
+        """
+        @event.listens_for(engine, 'connect')
+        def connected(dbapi_connection: Any, connection_record: Any) -> None:
+            _, _ = dbapi_connection, connection_record
+            if metrics.enabled:
+                metrics.opened('connection', label)
+
+    @staticmethod
+    def get_sqlite_engine(dbname: str, echo: bool = True, pooled: bool = False) -> Opt[Engine]:
         """
         It returns the sqlite engine for the given dbname_all.
 
         :param dbname: The name of the database.
         :type dbname: str.
 
+        :param echo: Whether the engine logs the emitted statements.
+        :type echo: bool.
+
+        :param pooled: Whether the engine keeps its connections open across sessions instead of opening the file
+            every time one is needed.
+        :type pooled: bool.
+
         :return: Upon success, it returns the just created Engine instance object, None otherwise.
         """
         try:
+            options = dict(poolclass=QueuePool, connect_args={'check_same_thread': False}) if pooled else {}
             engine = create_engine(
                 'sqlite+pysqlite:///{0}'.format(dbname),
-                echo=True,
-                future=True
+                echo=echo,
+                future=True,
+                **options
             )
+            SqlEngine.count_connections(engine, Path(dbname).stem.replace('zipcodes_', '', 1))
             return engine
         except Exception as e:
             SqlEngine.logger.error(f'{str(e)}')
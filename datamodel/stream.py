@@ -0,0 +1,207 @@
+"""
+It resolves streams of lookups lazily and in micro-batches, keeping the memory bounded regardless of the input size.
+Used as a program, e.g. python -m stream from the datamodel folder, it reads JSONL records having a countrycode and
+either a placename or a zipcode from stdin, and writes them to stdout with the zipcode or the placenames added.
+"""
+
+from argparse import ArgumentParser, Namespace
+from itertools import islice
+from json import loads, dumps, JSONDecodeError
+from logging import getLogger
+from sys import argv, exit, stdin, stdout
+from typing import Any, Dict, Iterable, Iterator, List, Optional as Opt, Tuple
+from configuration import configuration as cfg
+from controller import Controller
+
+# The kinds of lookup: the zipcode of a placename, the placenames of a zipcode.
+ZIPCODE = 'zipcode'
+PLACENAMES = 'placenames'
+
+
+def resolve(controller: Controller, batch: List[Tuple[str, str, Any]]) -> List[Any]:
+    """
+    It resolves a micro-batch of lookups with one batch call per country and kind.
+
+    :param controller: The controller.
+    :type controller: Controller.
+
+    :param batch: The (countrycode, kind, key) lookups.
+    :type batch: List[Tuple[str, str, Any]].
+
+    :return: It returns the results in the order of the batch.
+    :rtype: List[Any].
+    """
+    groups = {}
+    for countrycode, kind, key in batch:
+        groups.setdefault((countrycode, kind), []).append(key)
+
+    results = {}
+    for (countrycode, kind), keys in groups.items():
+        if kind == ZIPCODE:
+            found = controller.zipcodes_by_placenames(countrycode, keys)
+        else:
+            found = controller.placenames_by_zipcodes(countrycode, keys)
+        results[(countrycode, kind)] = {f'{key}': value for key, value in found.items()}
+    return [results[(countrycode, kind)][f'{key}'] for countrycode, kind, key in batch]
+
+
+def stream(controller: Controller, lookups: Iterable[Tuple[str, str, Any]],
+           batch_size: Opt[int] = None) -> Iterator[Tuple[Tuple[str, str, Any], Any]]:
+    """
+    It lazily resolves the given lookups, reading at most batch_size of them ahead.
+
+    :param controller: The controller.
+    :type controller: Controller.
+
+    :param lookups: The (countrycode, kind, key) lookups, kind being ZIPCODE or PLACENAMES.
+    :type lookups: Iterable[Tuple[str, str, Any]].
+
+    :param batch_size: The size of the micro-batches, defaults to the configured one.
+    :type batch_size: Opt[int].
+
+    :return: It yields each lookup with its result, in input order.
+    :rtype: Iterator[Tuple[Tuple[str, str, Any], Any]].
+    """
+    iterator = iter(lookups)
+    size = batch_size or cfg['stream_batch_size']
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield from zip(batch, resolve(controller, batch))
+
+
+def stream_zipcodes(controller: Controller, queries: Iterable[Tuple[str, str]],
+                    batch_size: Opt[int] = None) -> Iterator[Tuple[str, str, Opt[str]]]:
+    """
+    It lazily resolves the zipcodes of the given (countrycode, placename) queries.
+
+    :param controller: The controller.
+    :type controller: Controller.
+
+    :param queries: The (countrycode, placename) queries.
+    :type queries: Iterable[Tuple[str, str]].
+
+    :param batch_size: The size of the micro-batches, defaults to the configured one.
+    :type batch_size: Opt[int].
+
+    :return: It yields (countrycode, placename, zipcode) in input order, zipcode being None when missing.
+    :rtype: Iterator[Tuple[str, str, Opt[str]]].
+    """
+    lookups = ((countrycode, ZIPCODE, placename) for countrycode, placename in queries)
+    for (countrycode, _, placename), zipcode in stream(controller, lookups, batch_size):
+        yield countrycode, placename, zipcode
+
+
+def stream_placenames(controller: Controller, queries: Iterable[Tuple[str, Any]],
+                      batch_size: Opt[int] = None) -> Iterator[Tuple[str, Any, Opt[List[str]]]]:
+    """
+    It lazily resolves the placenames of the given (countrycode, zipcode) queries.
+
+    :param controller: The controller.
+    :type controller: Controller.
+
+    :param queries: The (countrycode, zipcode) queries.
+    :type queries: Iterable[Tuple[str, Any]].
+
+    :param batch_size: The size of the micro-batches, defaults to the configured one.
+    :type batch_size: Opt[int].
+
+    :return: It yields (countrycode, zipcode, placenames) in input order, placenames being None when missing.
+    :rtype: Iterator[Tuple[str, Any, Opt[List[str]]]].
+    """
+    lookups = ((countrycode, PLACENAMES, zipcode) for countrycode, zipcode in queries)
+    for (countrycode, _, zipcode), placenames in stream(controller, lookups, batch_size):
+        yield countrycode, zipcode, placenames
+
+
+def records(lines: Iterable[str]) -> Iterator[Tuple[Dict[str, Any], Tuple[str, str, Any]]]:
+    """
+    It parses JSONL lines into records and their lookups, logging and skipping the invalid ones: those that are not
+    objects, lack a countrycode string, or hold a placename that is not a string or a zipcode that is neither a string
+    nor an integer.
+
+    :param lines: The lines.
+    :type lines: Iterable[str].
+
+    :return: It yields each record with its (countrycode, kind, key) lookup.
+    :rtype: Iterator[Tuple[Dict[str, Any], Tuple[str, str, Any]]].
+    """
+    logger = getLogger(__name__)
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+            if not isinstance(record, dict):
+                raise TypeError('the record is not an object')
+            if not isinstance(record['countrycode'], str):
+                raise TypeError('the countrycode is not a string')
+            if 'placename' in record:
+                if not isinstance(record['placename'], str):
+                    raise TypeError('the placename is not a string')
+                yield record, (record['countrycode'], ZIPCODE, record['placename'])
+            else:
+                if isinstance(record['zipcode'], bool) or not isinstance(record['zipcode'], (str, int)):
+                    raise TypeError('the zipcode is neither a string nor an integer')
+                yield record, (record['countrycode'], PLACENAMES, record['zipcode'])
+        except (JSONDecodeError, KeyError, TypeError) as e:
+            logger.error(f'Line {number}: {e.__str__()}')
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application.
+
+    :param args: The command line arguments to be parsed.
+    :type args: List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=Controller.BACKENDS, help='lookup backend')
+    parser.add_argument('--batch-size', type=int, default=cfg['stream_batch_size'], help='micro-batch size')
+    return parser.parse_args(args)
+
+
+def write(controller: Controller, batch: List[Tuple[Dict[str, Any], Tuple[str, str, Any]]]) -> None:
+    """
+    It resolves a micro-batch of records and writes them to stdout.
+
+    :param controller: The controller.
+    :type controller: Controller.
+
+    :param batch: The records with their lookups.
+    :type batch: List[Tuple[Dict[str, Any], Tuple[str, str, Any]]].
+
+    :return: None.
+    :rtype: None.
+    """
+    for (record, (_, kind, _)), result in zip(batch, resolve(controller, [lookup for _, lookup in batch])):
+        record[kind] = result
+        stdout.write(dumps(record, ensure_ascii=False) + '\n')
+    stdout.flush()
+
+
+def main(args: Namespace) -> int:
+    """
+    It copies the JSONL records from stdin to stdout, adding the result of their lookup.
+
+    :param args: The parsed command line arguments.
+    :type args: Namespace.
+
+    :return: The value returned to the OS.
+    :rtype: int.
+    """
+    parsed = records(stdin)
+    with Controller(backend=args.backend) as controller:
+        while True:
+            batch = list(islice(parsed, args.batch_size))
+            if not batch:
+                return 0
+            write(controller, batch)
+
+
+if __name__ == '__main__':
+    exit(main(usage(argv[1:])))
@@ -0,0 +1,381 @@
+from re import compile as compile_regex, escape
+from typing import Any, Iterable, List, Optional as Opt, Tuple
+from numpy import arange, asarray, ascontiguousarray, char, count_nonzero, flatnonzero, generic, int64, ndarray, \
+    ones, take_along_axis, uint8, uint32, uint64, unique, where, zeros
+from normalize import keywidth, postalkey
+from rawengine import POSTALKEY, open_readonly, schema
+
+# The character standing for any digit and any letter in the shapes of the postal codes.
+DIGIT = '9'
+LETTER = 'A'
+
+# The longest postal codes packed in a 64-bit integer key, 7 bits per ASCII character: longer ones are compared as
+# fixed width byte strings.
+PACKED = 9
+
+# The powers of ten fitting a 64-bit integer, bounding the numbers of digits.
+POWERS = 10 ** arange(19, dtype=int64)
+
+# The text of the missing values of NumPy and pandas object arrays.
+MISSING = ('None', 'nan', '<NA>')
+
+# It maps each ASCII character to the one standing for it in the shapes.
+SHAPES = arange(128, dtype=uint8)
+SHAPES[ord('0'):ord('9') + 1] = ord(DIGIT)
+SHAPES[ord('A'):ord('Z') + 1] = ord(LETTER)
+SHAPES[ord('a'):ord('z') + 1] = ord(LETTER)
+
+
+def batch(values: Any) -> ndarray:
+    """
+    It converts one postal code or a batch of them, e.g. a list, a NumPy array or a pandas column, to an array.
+
+    :param values: The postal codes.
+    :type values: Any.
+
+    :return: See description.
+    :rtype: ndarray.
+    """
+    codes = asarray(values)
+    return codes.reshape(1) if codes.ndim == 0 else codes
+
+
+def numbers(codes: ndarray) -> Opt[Tuple[ndarray, ndarray]]:
+    """
+    It reads a batch of numeric postal codes as integers, flagging the negative, the fractional and the missing ones
+    as invalid.
+
+    :param codes: The postal codes.
+    :type codes: ndarray.
+
+    :return: It returns the integers and the array flagging the invalid codes, None if the codes are not numeric.
+    :rtype: Opt[Tuple[ndarray, ndarray]].
+    """
+    if codes.dtype.kind in 'iub':
+        codes = codes.astype(int64)
+        return codes, codes < 0
+    if codes.dtype.kind == 'f':
+        invalid = ~((codes >= 0) & (codes < 2 ** 63)) | (codes % 1 != 0)
+        return where(invalid, 0, codes).astype(int64), invalid
+    return None
+
+
+def blank(points: ndarray) -> ndarray:
+    """
+    It checks which of the given code points may be whitespace: the ASCII blanks and every non ASCII character.
+
+    :param points: The code points.
+    :type points: ndarray.
+
+    :return: See description.
+    :rtype: ndarray.
+    """
+    return (points == ord(' ')) | ((points >= ord('\t')) & (points <= ord('\r'))) | (points > 127)
+
+
+def encode(codes: ndarray, width: int) -> Tuple[ndarray, ndarray]:
+    """
+    It encodes a batch of postal codes as a matrix with one row of ASCII characters for each code, padded with zeros up
+    to the given width, reading the code points of the whole batch at once. The codes are stripped of whitespace, as
+    postalkey does, only those starting or ending with a blank or a non ASCII character being stripped one by one. The
+    codes longer than the width, the non ASCII ones and the empty ones are flagged as invalid, and so are the missing
+    values of object arrays.
+
+    :param codes: The postal codes.
+    :type codes: ndarray.
+
+    :param width: The width of the rows.
+    :type width: int.
+
+    :return: It returns the matrix of the characters and the boolean array flagging the invalid codes.
+    :rtype: Tuple[ndarray, ndarray].
+    """
+    missing = codes.dtype.kind == 'O'
+    codes = ascontiguousarray(codes if codes.dtype.kind == 'U' else codes.astype(str))
+    length = codes.dtype.itemsize // 4
+    if length == 0:
+        return zeros((len(codes), width), dtype=uint8), ones(len(codes), dtype=bool)
+    points = codes.view(uint32).reshape(len(codes), length)
+    # The codes are padded with zeros on the right, so the last character is looked for only in the shorter ones.
+    last = points[:, -1].copy()
+    short = flatnonzero(last == 0)
+    last[short] = points[short, (count_nonzero(points[short], axis=1) - 1).clip(0)]
+    spaced = flatnonzero(blank(points[:, 0]) | blank(last))
+    if len(spaced):
+        codes = codes.copy()
+        codes[spaced] = char.strip(codes[spaced])
+        points = codes.view(uint32).reshape(len(codes), length)
+    invalid = (points > 127).any(axis=1) | (points[:, 0] == 0)
+    if missing:
+        for text in MISSING:
+            invalid |= codes == text
+    if length > width:
+        invalid |= points[:, width:].any(axis=1)
+        points = points[:, :width]
+    matrix = zeros((len(codes), width), dtype=uint8)
+    matrix[:, :points.shape[1]] = points & 127
+    return matrix, invalid
+
+
+def align(matrix: ndarray, padding: int) -> ndarray:
+    """
+    It zero pads on the left the rows of a matrix of ASCII characters made of digits only and shorter than the given
+    padding, as the canonical postal codes are, so that '501' reads as '00501' when the padding is 5.
+
+    :param matrix: The matrix of the characters.
+    :type matrix: ndarray.
+
+    :param padding: The width of the numeric postal codes, see keywidth.
+    :type padding: int.
+
+    :return: See description.
+    :rtype: ndarray.
+    """
+    if not padding:
+        return matrix
+    # The rows are padded with zeros on the right, so only those ending before the padding are looked at.
+    short = flatnonzero((matrix[:, padding - 1] == 0) & (matrix[:, 0] != 0))
+    rows = matrix[short]
+    digits = (((rows >= ord('0')) & (rows <= ord('9'))) | (rows == 0)).all(axis=1)
+    short, rows = short[digits], rows[digits]
+    if not len(short):
+        return matrix
+    columns = arange(matrix.shape[1]) - (padding - count_nonzero(rows, axis=1))[:, None]
+    matrix = matrix.copy()
+    matrix[short] = where(columns < 0, ord('0'), take_along_axis(rows, columns.clip(0), axis=1))
+    return matrix
+
+
+def pack(matrix: ndarray) -> ndarray:
+    """
+    It packs each row of a matrix of ASCII characters in a key, preserving their order: a 64-bit integer for rows of
+    at most PACKED characters, a fixed width byte string otherwise.
+
+    :param matrix: The matrix of the characters.
+    :type matrix: ndarray.
+
+    :return: See description.
+    :rtype: ndarray.
+    """
+    rows, width = matrix.shape
+    if width > PACKED:
+        return matrix.copy().view(f'S{width}').reshape(rows)
+    keys = zeros(rows, dtype=uint64)
+    for column in range(width):
+        keys <<= uint64(7)
+        keys |= matrix[:, column]
+    return keys
+
+
+class KeySet:
+    """
+    It holds a set of keys for the membership test of whole arrays at once: 64-bit keys in an open addressing hash table
+    with linear probing, a quarter full, probed in rounds on all the keys still unresolved, the other keys in a sorted
+    array, binary searched. The zero key stands for the empty slots and never belongs to the set.
+    """
+
+    # The multiplier of the Fibonacci hashing of the 64-bit keys.
+    MULTIPLIER = uint64(0x9E3779B97F4A7C15)
+
+    def __init__(self, keys: ndarray) -> None:
+        """
+        Constructor.
+
+        :param keys: The keys.
+        :type keys: ndarray.
+        """
+        self._sorted = None
+        self._table = None
+        if keys.dtype != uint64:
+            self._sorted = unique(keys)
+            return
+        keys = unique(keys[keys != 0])
+        self._bits = max((4 * len(keys)).bit_length(), 4)
+        self._table = zeros(1 << self._bits, dtype=uint64)
+        slots = self.slots(keys)
+        while len(keys):
+            free = flatnonzero(self._table[slots] == 0)
+            _, first = unique(slots[free], return_index=True)
+            placed = free[first]
+            self._table[slots[placed]] = keys[placed]
+            pending = ones(len(keys), dtype=bool)
+            pending[placed] = False
+            keys, slots = keys[pending], (slots[pending] + 1) & (len(self._table) - 1)
+
+    def slots(self, keys: ndarray) -> ndarray:
+        """
+        It gets the home slots of the given 64-bit keys in the hash table.
+
+        :param keys: The keys.
+        :type keys: ndarray.
+
+        :return: See description.
+        :rtype: ndarray.
+        """
+        return (keys * KeySet.MULTIPLIER) >> uint64(64 - self._bits)
+
+    def contains(self, keys: ndarray) -> ndarray:
+        """
+        It checks which of the given keys belong to the set.
+
+        :param keys: The keys.
+        :type keys: ndarray.
+
+        :return: It returns a boolean array, True for the keys in the set.
+        :rtype: ndarray.
+        """
+        found = zeros(len(keys), dtype=bool)
+        if self._sorted is not None:
+            if len(self._sorted):
+                positions = self._sorted.searchsorted(keys)
+                positions[positions == len(self._sorted)] = 0
+                found = self._sorted[positions] == keys
+            return found
+        keys = keys.astype(uint64)
+        pending = flatnonzero(keys)
+        keys = keys[pending]
+        slots = self.slots(keys)
+        while len(pending):
+            candidates = self._table[slots]
+            found[pending[candidates == keys]] = True
+            probing = (candidates != keys) & (candidates != 0)
+            pending, keys, slots = pending[probing], keys[probing], (slots[probing] + 1) & (len(self._table) - 1)
+        return found
+
+
+def regex(shape: str) -> str:
+    """
+    It gets the regular expression matching the postal codes having the given shape.
+
+    :param shape: The shape.
+    :type shape: str.
+
+    :return: See description.
+    :rtype: str.
+    """
+    parts: List[str] = []
+    for index, character in enumerate(shape):
+        if index and character == shape[index - 1]:
+            continue
+        run = len(shape[index:]) - len(shape[index:].lstrip(character))
+        part = '[0-9]' if character == DIGIT else '[A-Za-z]' if character == LETTER else escape(character)
+        parts.append(part if run == 1 else f'{part}{{{run}}}')
+    return ''.join(parts)
+
+
+class PostalCodeRules:
+    """
+    It validates the postal codes of a country against the rules derived from the existing ones: their formats, as the
+    shapes where every digit is replaced by DIGIT and every letter by LETTER ('83-440' has shape '99-999'), and their
+    exact values. Both are kept as key sets of the packed codes, so that batches are encoded, packed and looked up on
+    whole arrays at once. Integer batches are looked up by value, and checked by number of digits, without encoding.
+    The codes are compared as canonical postal codes, those made of digits only zero padded to the same width.
+    """
+
+    def __init__(self, codes: Iterable[str]) -> None:
+        """
+        Constructor.
+
+        :param codes: The existing postal codes of the country, in ASCII.
+        :type codes: Iterable[str].
+        """
+        codes = [f'{code}'.strip() for code in codes if code is not None and f'{code}'.isascii()]
+        self.padding = keywidth(codes)
+        self.codes = unique(asarray([postalkey(code, self.padding) for code in codes], dtype=str))
+        self.width = max(self.codes.dtype.itemsize // 4, 1)
+        matrix, _ = encode(self.codes, self.width)
+        shapes, first = unique(pack(SHAPES[matrix]), return_index=True)
+        self.shapes = [bytes(SHAPES[row]).rstrip(b'\0').decode() for row in matrix[first]]
+        self.pattern = '|'.join(f'(?:{regex(shape)})' for shape in self.shapes) or '(?!)'
+        self._regex = compile_regex(self.pattern)
+        self._keys = KeySet(pack(matrix))
+        self._shapes = KeySet(shapes)
+        # The integers of the codes made of digits only, shifted by one since the zero key never belongs to a set, and
+        # the bound of the integers read as such codes once zero padded.
+        self._numbers = KeySet(asarray([int(code) + 1 for code in self.codes.tolist()
+                                        if code.isdigit() and len(code) < len(POWERS)], dtype=uint64))
+        numeric = DIGIT * self.padding in self.shapes and self.padding < len(POWERS)
+        self._bound = int(POWERS[self.padding]) if numeric else 0
+
+    def wellformed(self, values: Any) -> ndarray:
+        """
+        It checks which of the given postal codes have the format of an existing one.
+
+        :param values: The postal codes.
+        :type values: Any.
+
+        :return: It returns a boolean array, True for the well formed postal codes.
+        :rtype: ndarray.
+        """
+        codes = batch(values)
+        numeric = numbers(codes)
+        if numeric is not None:
+            integers, invalid = numeric
+            return (integers < self._bound) & ~invalid
+        matrix, invalid = encode(codes, self.width)
+        return self._shapes.contains(pack(SHAPES[align(matrix, self.padding)])) & ~invalid
+
+    def known(self, values: Any) -> ndarray:
+        """
+        It checks which of the given postal codes exist.
+
+        :param values: The postal codes.
+        :type values: Any.
+
+        :return: It returns a boolean array, True for the existing postal codes.
+        :rtype: ndarray.
+        """
+        codes = batch(values)
+        numeric = numbers(codes)
+        if numeric is not None:
+            integers, invalid = numeric
+            return self._numbers.contains(integers.astype(uint64) + uint64(1)) & ~invalid
+        matrix, invalid = encode(codes, self.width)
+        return self._keys.contains(pack(align(matrix, self.padding))) & ~invalid
+
+    def validate(self, values: Any, exact: bool = True) -> Any:
+        """
+        It validates one postal code or a batch of them, checking their format and, when exact, their existence. Single
+        codes are checked against the precompiled regular expression of the formats and the sorted codes instead.
+
+        :param values: The postal code, or a batch of them, e.g. a list, a NumPy array or a pandas column.
+        :type values: Any.
+
+        :param exact: Whether the postal codes must exist, rather than just be well formed.
+        :type exact: bool.
+
+        :return: It returns a bool for a single postal code, a string or any scalar, a boolean array for a batch.
+        :rtype: Any.
+        """
+        if isinstance(values, (str, int)):
+            code = postalkey(values, self.padding)
+            if not exact:
+                return self._regex.fullmatch(code) is not None
+            position = self.codes.searchsorted(code)
+            return bool(position < len(self.codes) and self.codes[position] == code)
+        if isinstance(values, generic) or not isinstance(values, Iterable):
+            return bool(self.validate(batch([values]), exact)[0])
+        return self.known(values) if exact else self.wellformed(values)
+
+
+def load_rules(countrycode: str) -> Opt[PostalCodeRules]:
+    """
+    It derives the validation rules of the given country from the postal codes in its database.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :return: It returns the rules or None if the country has no database.
+    :rtype: Opt[PostalCodeRules].
+    """
+    connection = open_readonly(countrycode)
+    if connection is None:
+        return None
+    table = schema(countrycode).table
+    try:
+        rows = connection.execute(
+            f'SELECT DISTINCT "{POSTALKEY}" FROM {table} WHERE "{POSTALKEY}" IS NOT NULL'
+        ).fetchall()
+    finally:
+        connection.close()
+    return PostalCodeRules(code for code, in rows)
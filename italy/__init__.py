@@ -1,9 +1,36 @@
 from pathlib import Path
-from .italy import Italy
+from typing import Any, List
 
 readme = Path(__file__).parent / "ReadMe.md"
 
 __all__ = [
-    Italy,
-    readme,
+    'Italy',
+    'readme',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    """
+    It imports the Italy class, and with it pandas, on its first access.
+
+    :param name: The name of the attribute.
+    :type name: str.
+
+    :return: See description.
+    :rtype: Any.
+    """
+    if name != 'Italy':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    from .italy import Italy
+    globals()[name] = Italy
+    return Italy
+
+
+def __dir__() -> List[str]:
+    """
+    It lists the attributes of the package, the ones not imported yet included.
+
+    :return: See description.
+    :rtype: List[str].
+    """
+    return sorted(set(globals()) | {'Italy'})
@@ -2,16 +2,30 @@
 It allows loading and checking of Italian zip codes, cities and regions.
 """
 
-from io import BytesIO
 from logging import getLogger
-from pandas import read_csv, DataFrame
+from numpy import array, load as load_npz, ndarray, savez
+from pandas import Categorical, read_csv, DataFrame
+from pandas.arrays import IntegerArray
 from pathlib import Path
-from typing import Optional as Opt
+from shutil import copyfileobj
+from typing import Dict, Optional as Opt
 from urllib.request import Request
 from urllib.request import urlopen
-from zipfile import ZipFile
+from zipfile import ZipFile, BadZipFile
 
-from data import zipcodes
+# The columns of listacomuni.txt with their types: codes are kept as text, since they may have leading zeros, and the
+# population is a nullable integer, since it may be missing.
+DTYPES = {
+    'Istat': 'str',
+    'Comune': 'str',
+    'Provincia': 'category',
+    'Regione': 'category',
+    'Prefisso': 'str',
+    'CAP': 'str',
+    'CodFisco': 'str',
+    'Abitanti': 'Int64',
+    'Link': 'str',
+}
 
 
 class Italy:
@@ -19,16 +33,20 @@ class Italy:
     It allows italian zip code, city and province retrieval.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, data_path: Opt[Path] = None) -> None:
         """
         Constructor.
+
+        :param data_path: The folder of the archive, of the text file and of its cache, the data folder by default.
+        :type data_path: Opt[Path].
         """
         self._logger = getLogger(__name__)
-        self._data_path = Path('../data')
-        self._archive_name = Path(__file__).parent.parent / 'data' / 'listacomuni.zip'
-        self._filename = 'listacomuni.txt'
+        self._data_path = data_path or Path(__file__).parent.parent / 'data'
         self._uri = 'http://lab.comuni-italiani.it/files/listacomuni.zip'
         self._file = 'listacomuni.txt'
+        self._archive_name = self._data_path / self.uri_filename()
+        self._text_name = self._data_path / self._file
+        self._cache_name = self._data_path / 'listacomuni.npz'
         self._data_frame = None
 
     def uri_filename(self) -> Opt[str]:
@@ -47,7 +65,7 @@ class Italy:
         :return: It returns True if one of the two files is present, False otherwise.
         :rtype: bool.
         """
-        return zipcodes.absolute().exists() or (self._data_path / self.uri_filename()).exists()
+        return self._text_name.exists() or self._archive_name.exists()
 
     def remote_check(self) -> bool:
         """
@@ -60,47 +78,141 @@ class Italy:
 
     def download(self) -> bool:
         """
-        It downloads the compressed archive on the data folder and uncompress it.
+        It downloads the compressed archive on the data folder, streaming it to disk.
 
         :return: It returns True upon success, False otherwise.
         :rtype: bool.
         """
         try:
-            data = BytesIO(urlopen(Request(self._uri)).read())
-            with open(self._archive_name, 'wb') as target:
-                target.write(data.read())
+            partial = self._archive_name.with_suffix('.part')
+            with urlopen(Request(self._uri)) as response, open(partial, 'wb') as target:
+                copyfileobj(response, target)
+            partial.replace(self._archive_name)
+            return True
+        except IOError as e:
+            self._logger.error(f'{str(e)}')
+            return False
 
-            with ZipFile(self._archive_name, 'r') as archive:
-                with archive.open(self._file, 'r') as target:
-                    target_file = zipcodes.absolute().open('wb')
-                    target_file.write(target.read())
-                    target_file.close()
+    def extract(self) -> bool:
+        """
+        It extracts the text file from the compressed archive, streaming it to disk.
 
+        :return: It returns True upon success, False otherwise.
+        :rtype: bool.
+        """
+        try:
+            with ZipFile(self._archive_name, 'r') as archive:
+                with archive.open(self._file, 'r') as source, open(self._text_name, 'wb') as target:
+                    copyfileobj(source, target)
             return True
-        except IOError as e:
+        except (BadZipFile, KeyError, IOError) as e:
             self._logger.error(f'{str(e)}')
             return False
 
+    def encoding(self) -> str:
+        """
+        It detects the encoding of the text file: UTF-8 if it decodes as such, Windows-1252 otherwise, the encoding
+        the Italian accented letters of older releases are written with.
+
+        :return: See description.
+        :rtype: str.
+        """
+        try:
+            self._text_name.read_bytes().decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'cp1252'
+
+    def signature(self) -> ndarray:
+        """
+        It identifies the current version of the text file by its modification time and size.
+
+        :return: See description.
+        :rtype: ndarray.
+        """
+        stat = self._text_name.stat()
+        return array([stat.st_mtime_ns, stat.st_size], dtype='int64')
+
     def load(self) -> bool:
         """
-        It loads zip code's data into the current instance object.
+        It loads zip code's data into the current instance object, parsing the text file with explicit types.
 
         :return: It returns True upon success, False otherwise.
         :rtype: bool.
         """
         try:
             self._data_frame = read_csv(
-                zipcodes.absolute().__str__(),
+                self._text_name,
                 sep=';',
-                encoding='utf-8',
-                encoding_errors='ignore',
-                keep_default_na=False
+                dtype=DTYPES,
+                encoding=self.encoding(),
+                keep_default_na=False,
+                na_values={name: [''] for name, dtype in DTYPES.items() if dtype == 'Int64'}
             )
             return True
         except (Exception, IOError) as e:
             self._logger.error(f'{str(e)}')
             return False
 
+    def save_cache(self) -> bool:
+        """
+        It saves the loaded data in the columnar cache: one array per column, categoricals as codes and categories,
+        nullable integers as values and missing mask, together with the signature of the text file it comes from.
+
+        :return: It returns True upon success, False otherwise.
+        :rtype: bool.
+        """
+        columns: Dict[str, ndarray] = {'signature': self.signature()}
+        for name, dtype in DTYPES.items():
+            column = self._data_frame[name]
+            if dtype == 'category':
+                columns[f'{name}.codes'] = column.cat.codes.to_numpy()
+                columns[f'{name}.categories'] = column.cat.categories.to_numpy(dtype='str')
+            elif dtype == 'Int64':
+                columns[name] = column.to_numpy(dtype='int64', na_value=0)
+                columns[f'{name}.mask'] = column.isna().to_numpy()
+            elif dtype == 'str':
+                columns[name] = column.to_numpy(dtype='str')
+            else:
+                columns[name] = column.to_numpy(dtype=dtype)
+        try:
+            partial = self._cache_name.with_suffix('.part.npz')
+            savez(partial, **columns)
+            partial.replace(self._cache_name)
+            return True
+        except IOError as e:
+            self._logger.error(f'{str(e)}')
+            return False
+
+    def load_cache(self) -> bool:
+        """
+        It loads the data from the columnar cache, if the cache exists and the text file has not changed since.
+
+        :return: It returns True upon success, False otherwise.
+        :rtype: bool.
+        """
+        if not self._cache_name.exists():
+            return False
+        try:
+            with load_npz(self._cache_name) as cache:
+                if self._text_name.exists() and (cache['signature'] != self.signature()).any():
+                    return False
+                columns = {}
+                for name, dtype in DTYPES.items():
+                    if dtype == 'category':
+                        columns[name] = Categorical.from_codes(cache[f'{name}.codes'], cache[f'{name}.categories'])
+                    elif dtype == 'Int64':
+                        columns[name] = IntegerArray(cache[name], cache[f'{name}.mask'])
+                    elif dtype == 'str':
+                        columns[name] = cache[name].astype(object)
+                    else:
+                        columns[name] = cache[name]
+            self._data_frame = DataFrame(columns).astype(DTYPES)
+            return True
+        except (Exception, IOError) as e:
+            self._logger.error(f'{str(e)}')
+            return False
+
     def parse(self) -> bool:
         """
         It parses the raw data and organize it in an easy-to-access format.
@@ -112,7 +224,9 @@ class Italy:
 
     def ready(self) -> bool:
         """
-        It returns True if the current instance is ready to serve data, False otherwise.
+        It returns True if the current instance is ready to serve data, False otherwise. The data comes from the
+        columnar cache when valid, from the text file, extracted from the archive and downloaded if missing, otherwise.
+        A text file that is there but cannot be parsed is reported, not overwritten by a new download.
 
         :return: See description.
         :rtype: bool.
@@ -120,12 +234,24 @@ class Italy:
         if None is not self._data_frame:
             return True
 
-        if self.local_check():
+        if self.load_cache():
+            return True
+
+        if self._text_name.exists():
             if self.load() and self.parse():
+                self.save_cache()
+                return True
+            self._logger.error(f'{self._text_name} cannot be parsed, remove it to download it again')
+            return False
+
+        if self.local_check():
+            if self.extract() and self.load() and self.parse():
+                self.save_cache()
                 return True
 
         if self.remote_check():
-            if self.download() and self.load() and self.parse():
+            if self.download() and self.extract() and self.load() and self.parse():
+                self.save_cache()
                 return True
 
         return False
@@ -0,0 +1,32 @@
+"""
+It puts the folders of the repository on the path the way the modules expect them: the datamodel modules import each
+other by their top level names, the data scripts import the datamodel package. It also compiles the memory mapped index
+of the countries the tests look up, so that the mmap backend does not depend on a local build of data/zipcodes.idx.
+"""
+
+from pathlib import Path
+from sys import path
+
+from pytest import fixture
+
+ROOT = Path(__file__).parent.parent
+
+for folder in (ROOT, ROOT / 'datamodel', ROOT / 'data'):
+    if f'{folder}' not in path:
+        path.insert(0, f'{folder}')
+
+# The countries compiled in the index of the tests.
+COUNTRIES = ('AD', 'DE', 'IT', 'US')
+
+
+@fixture(scope='session', autouse=True)
+def index_file(tmp_path_factory) -> Path:
+    from compiler import compile_index
+    from configuration import configuration as cfg
+    from memoryindex import load_country
+
+    index = tmp_path_factory.mktemp('index') / 'zipcodes.idx'
+    compile_index({countrycode: load_country(countrycode) for countrycode in COUNTRIES}, index)
+    original, cfg['index_file'] = cfg['index_file'], index
+    yield index
+    cfg['index_file'] = original
@@ -0,0 +1,21 @@
+from asyncio import gather, run
+
+from pytest import raises
+
+from asynccontroller import AsyncController
+from controller import Controller
+
+
+def test_the_default_controller_is_thread_safe() -> None:
+    async def lookups() -> list:
+        async with AsyncController(workers=2) as controller:
+            assert controller.controller.backend == 'sqlite' and controller.controller.thread_safe
+            return await gather(*(controller.placenames_by_zipcode(countrycode, zipcode)
+                                  for countrycode, zipcode in [('IT', 21038), ('US', '00501'), ('DE', 80331)]))
+
+    assert run(lookups())[:2] == [['Leggiuno', 'Sangiano'], ['Holtsville']]
+
+
+def test_a_shared_sqlite_controller_must_be_thread_safe() -> None:
+    with Controller(backend='sqlite') as controller, raises(ValueError):
+        AsyncController(controller)
@@ -0,0 +1,8 @@
+from controller import Controller
+
+
+def test_zipcode_prefixes_match_the_canonical_postal_codes() -> None:
+    with Controller(backend='sqlite') as controller:
+        assert [completion.zipcode for completion in controller.autocomplete('US', '005')] == ['00501', '00544']
+        assert '00501' not in [completion.zipcode for completion in controller.autocomplete('US', '501')]
+        assert controller.autocomplete('IT', '00010', limit=1)[0].placename == 'Casape'
@@ -0,0 +1,21 @@
+from controller import Controller
+
+
+def test_pairs_are_grouped_by_country() -> None:
+    with Controller(backend='sqlite') as controller:
+        found = controller.zipcodes_by_pairs([('IT', 'Leggiuno'), ('DE', 'München'), ('IT', 'Nowhere')])
+        assert found == {('IT', 'Leggiuno'): '21038', ('DE', 'München'): '80331', ('IT', 'Nowhere'): None}
+
+        found = controller.placenames_by_pairs([('IT', 21038), ('US', '00501'), ('XX', 1)])
+        assert found[('IT', 21038)] == ['Leggiuno', 'Sangiano']
+        assert found[('US', '00501')] == ['Holtsville']
+        assert found[('XX', 1)] is None
+
+
+def test_leading_zeros_match_on_every_backend() -> None:
+    for backend in ('orm', 'sqlite', 'memory'):
+        with Controller(backend=backend) as controller:
+            found = controller.placenames_by_zipcodes('US', ['00501', 501])
+            assert found['00501'] == found[501] == ['Holtsville'], backend
+            assert controller.zipcode_by_placename('Holtsville', 'US') == '00501', backend
+            assert controller.zipcodes_by_placenames('IT', ['Casape']) == {'Casape': '00010'}, backend
@@ -0,0 +1,14 @@
+from controller import Controller
+
+
+def test_ttl_alone_enables_a_bounded_cache() -> None:
+    with Controller(backend='sqlite', cache_ttl=60) as controller:
+        assert controller.cache_info().maxsize is not None
+        controller.placenames_by_zipcode('IT', 21038)
+        controller.placenames_by_zipcode('IT', 21038)
+        assert controller.cache_info().hits == 1
+
+
+def test_no_cache_by_default() -> None:
+    with Controller(backend='sqlite') as controller:
+        assert controller.cache_info() is None
@@ -0,0 +1,38 @@
+from sqlite3 import Error as SQLiteError, connect
+
+from pandas import DataFrame
+from pytest import raises
+
+from comuni import COLUMNS, build
+
+
+def comuni(comune: str, link: object) -> DataFrame:
+    return DataFrame([[12133, comune, 'VA', 'LOM', 332, 21100, 'L682', 79793, link]], columns=list(COLUMNS))
+
+
+def test_build_writes_the_database(tmp_path) -> None:
+    assert build(comuni('Varese', 'http://www.comuni-italiani.it/012/133/'), tmp_path / 'zipcodes_IT.db') == 1
+    assert [path.name for path in tmp_path.iterdir()] == ['zipcodes_IT.db']
+
+
+def test_build_writes_a_missing_population_as_null(tmp_path) -> None:
+    frame = comuni('Varese', 'http://www.comuni-italiani.it/012/133/').astype({'Abitanti': 'Int64'})
+    frame.loc[0, 'Abitanti'] = None
+    build(frame, tmp_path / 'zipcodes_IT.db')
+    connection = connect(tmp_path / 'zipcodes_IT.db')
+    try:
+        assert connection.execute('SELECT "Abitanti" FROM "listacomuni"').fetchall() == [(None,)]
+    finally:
+        connection.close()
+
+
+def test_build_removes_the_temporary_database_on_failure(tmp_path) -> None:
+    with raises(SQLiteError):
+        build(comuni('Varese', ['not', 'a', 'link']), tmp_path / 'zipcodes_IT.db')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_build_rejects_garbled_names(tmp_path) -> None:
+    with raises(ValueError):
+        build(comuni('Cant�', 'http://www.comuni-italiani.it/013/041/'), tmp_path / 'zipcodes_IT.db')
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,35 @@
+from argparse import Namespace
+
+from pytest import raises
+
+from utils.enrich import enrich, usage
+
+
+def arguments(source, target) -> Namespace:
+    return usage([f'{source}', f'{target}', '--column', 'zip', '--country-column', 'country', '--mode', 'placename',
+                  '--workers', '1'])
+
+
+def test_enrich_passes_short_rows_through(tmp_path) -> None:
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    source.write_text('country,zip\nUS,501\n\nUS\nIT,21038\n')
+    count, _ = enrich(arguments(source, target))
+    assert count == 4
+    assert target.read_text().splitlines() == [
+        'country,zip,placename', 'US,501,Holtsville', ',,', 'US,,', 'IT,21038,Leggiuno|Sangiano',
+    ]
+
+
+def test_enrich_rejects_an_empty_file(tmp_path) -> None:
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    source.write_text('')
+    with raises(ValueError):
+        enrich(arguments(source, target))
+
+
+def test_enrich_writes_canonical_postal_codes(tmp_path) -> None:
+    source, target = tmp_path / 'input.csv', tmp_path / 'output.csv'
+    source.write_text('country,city\nUS,Holtsville\n')
+    args = usage([f'{source}', f'{target}', '--column', 'city', '--country-column', 'country', '--workers', '1'])
+    enrich(args)
+    assert target.read_text().splitlines() == ['country,city,zipcode', 'US,Holtsville,00501']
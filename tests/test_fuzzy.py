@@ -0,0 +1,34 @@
+from controller import Controller
+from fuzzy import TrigramIndex, trigrams
+
+# The placenames of the synthetic index with their zipcodes.
+PLACES = {'Leggiuno': '21038', 'Legnano': '20025', 'Leno': '25024', 'Sangiano': '21038'}
+
+
+def jaccard(text: str, other: str) -> float:
+    grams, others = trigrams(text), trigrams(other)
+    return len(grams & others) / len(grams | others)
+
+
+def test_scores_are_the_jaccard_similarity_of_the_trigrams() -> None:
+    index = TrigramIndex(list(PLACES), list(PLACES.values()))
+    matches = index.search('Legiuno', k=len(PLACES))
+    expected = sorted((placename for placename in PLACES if jaccard('Legiuno', placename)),
+                      key=lambda placename: -jaccard('Legiuno', placename))
+    assert [match.placename for match in matches] == expected
+    assert [match.score for match in matches] == [jaccard('Legiuno', placename) for placename in expected]
+    assert matches[0].zipcode == '21038'
+    assert [match.placename for match in index.search('Legiuno', k=1)] == ['Leggiuno']
+    assert all(match.score >= 0.5 for match in index.search('Legiuno', threshold=0.5))
+    assert index.search('Legiuno', k=0) == [] and index.search('xyz') == []
+
+
+def test_accents_and_case_are_ignored() -> None:
+    assert trigrams('MÜNCHEN') == trigrams('munchen')
+
+
+def test_fuzzy_placenames_of_a_country() -> None:
+    with Controller(backend='sqlite') as controller:
+        assert controller.fuzzy_placenames('Legiuno', 'IT', k=1)[0][:2] == ('Leggiuno', '21038')
+        assert controller.fuzzy_placenames('munchen', 'DE', k=1)[0][:2] == ('München', '80331')
+        assert controller.fuzzy_placenames('Leggiuno', 'XX') == []
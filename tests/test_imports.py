@@ -0,0 +1,7 @@
+from utils.benchmark import HEAVY, import_package
+
+
+def test_import_loads_no_heavy_module() -> None:
+    _, loaded = import_package(1, HEAVY)
+    assert 'pandas' not in loaded and 'sqlalchemy' not in loaded
+    assert not loaded
@@ -0,0 +1,56 @@
+from sqlite3 import connect
+from zipfile import ZipFile
+
+from ingest import Changes, ingest
+
+# The rows of the first dump, in the GeoNames tab separated format.
+DUMP = [
+    ['US', '00501', 'Holtsville', 'New York', 'NY', 'Suffolk', '103', '', '', '40.8154', '-73.0451', '4'],
+    ['US', '00544', 'Holtsville', 'New York', 'NY', 'Suffolk', '103', '', '', '40.8154', '-73.0451', '4'],
+    ['US', '90210', 'Beverly Hills', 'California', 'CA', 'Los Angeles', '037', '', '', '34.0901', '-118.4065', '4'],
+    ['IT', '21038', 'Leggiuno', 'Lombardia', 'LOM', 'Varese', 'VA', '', '', '45.8753', '8.6208', '4'],
+]
+
+
+def write(path, rows) -> None:
+    path.write_text(''.join('\t'.join(row) + '\n' for row in rows), encoding='utf-8')
+
+
+def table(folder) -> list:
+    connection = connect(folder / 'zipcodes_US.db')
+    try:
+        return connection.execute('SELECT "postalkey", "placename", "placekey", "latitude" '
+                                  'FROM "geonames-postal-code" ORDER BY "postalkey"').fetchall()
+    finally:
+        connection.close()
+
+
+def test_ingest_creates_updates_and_skips(tmp_path) -> None:
+    dump = tmp_path / 'US.txt'
+    write(dump, DUMP)
+    assert ingest(dump, tmp_path) == [Changes('US', 3, 0, 0, 0, True)]
+    assert sorted(path.name for path in tmp_path.glob('*.db')) == ['zipcodes_US.db']
+    before = table(tmp_path)
+    assert before[0] == ('00501', 'Holtsville', 'holtsville', 40.8154)
+
+    modified = (tmp_path / 'zipcodes_US.db').stat().st_mtime_ns
+    assert ingest(dump, tmp_path) == [Changes('US', 0, 0, 0, 3, False)]
+    assert (tmp_path / 'zipcodes_US.db').stat().st_mtime_ns == modified
+
+    write(dump, [DUMP[0][:9] + ['40.9', '-73.0', '4'], DUMP[2],
+                 ['US', '10001', 'New York', 'New York', 'NY', 'New York', '061', '', '', '40.7484', '-73.9967', '4']])
+    assert ingest(dump, tmp_path, dry_run=True) == [Changes('US', 1, 1, 1, 1, False)]
+    assert table(tmp_path) == before
+    assert ingest(dump, tmp_path) == [Changes('US', 1, 1, 1, 1, False)]
+    assert table(tmp_path) == [('00501', 'Holtsville', 'holtsville', 40.9), ('10001', 'New York', 'new york', 40.7484),
+                               ('90210', 'Beverly Hills', 'beverly hills', 34.0901)]
+    assert ingest(dump, tmp_path) == [Changes('US', 0, 0, 0, 3, False)]
+
+
+def test_ingest_reads_zip_archives(tmp_path) -> None:
+    write(tmp_path / 'US.txt', DUMP[:1])
+    with ZipFile(tmp_path / 'US.zip', 'w') as archive:
+        archive.write(tmp_path / 'US.txt', 'US.txt')
+        archive.writestr('readme.txt', 'not a dump')
+    assert ingest(tmp_path / 'US.zip', tmp_path) == [Changes('US', 1, 0, 0, 0, True)]
+    assert table(tmp_path) == [('00501', 'Holtsville', 'holtsville', 40.8154)]
@@ -0,0 +1,60 @@
+from os import utime
+
+from pytest import fixture
+
+from italy.italy import Italy
+
+HEADER = 'Istat;Comune;Provincia;Regione;Prefisso;CAP;CodFisco;Abitanti;Link\n'
+ROWS = ('001001;Agliè;TO;PIE;0124;10011;A074;2621;http://www.comuni-italiani.it/001/001/\n'
+        '001002;Airasca;TO;PIE;011;10060;A109;;http://www.comuni-italiani.it/001/002/\n')
+
+
+@fixture
+def text(tmp_path):
+    path = tmp_path / 'listacomuni.txt'
+    path.write_text(HEADER + ROWS, encoding='utf-8')
+    return path
+
+
+def offline(monkeypatch) -> None:
+    def download(self) -> bool:
+        raise AssertionError('unexpected download')
+    monkeypatch.setattr(Italy, 'download', download)
+
+
+def test_ready_parses_the_text_and_caches_it(tmp_path, text, monkeypatch) -> None:
+    offline(monkeypatch)
+    italy = Italy(tmp_path)
+    assert italy.ready()
+    assert (tmp_path / 'listacomuni.npz').exists()
+    frame = italy.dataframe
+    assert frame['Istat'].tolist() == ['001001', '001002']
+    assert frame['Comune'].tolist() == ['Agliè', 'Airasca']
+    assert frame['Abitanti'].dtype == 'Int64'
+    assert frame['Abitanti'].tolist()[0] == 2621 and frame['Abitanti'].isna().tolist() == [False, True]
+
+    def load(self) -> bool:
+        raise AssertionError('unexpected parse')
+    monkeypatch.setattr(Italy, 'load', load)
+    cached = Italy(tmp_path)
+    assert cached.ready()
+    assert cached.dataframe.equals(frame)
+
+
+def test_cache_is_invalidated_when_the_text_changes(tmp_path, text, monkeypatch) -> None:
+    offline(monkeypatch)
+    assert Italy(tmp_path).ready()
+    text.write_text(HEADER + ROWS + '001003;Ala di Stura;TO;PIE;0123;10070;A117;462;\n', encoding='utf-8')
+    utime(text, ns=(text.stat().st_atime_ns, text.stat().st_mtime_ns + 10**9))
+    italy = Italy(tmp_path)
+    assert not italy.load_cache()
+    assert italy.ready()
+    assert italy.dataframe['Comune'].tolist() == ['Agliè', 'Airasca', 'Ala di Stura']
+
+
+def test_unparsable_text_is_not_downloaded_again(tmp_path, monkeypatch) -> None:
+    offline(monkeypatch)
+    text = tmp_path / 'listacomuni.txt'
+    text.write_text(HEADER + '001001;Agliè;TO;PIE;0124;10011;A074;many;\n', encoding='utf-8')
+    assert not Italy(tmp_path).ready()
+    assert text.exists() and not (tmp_path / 'listacomuni.npz').exists()
@@ -0,0 +1,44 @@
+from controller import Controller
+from memoryindex import load_country
+from rawengine import POSTALKEY, open_readonly, schema
+
+# The countries compared with the sqlite backend.
+COUNTRIES = ('AD', 'DE', 'IT', 'US')
+
+
+def sample(countrycode: str, step: int = 7) -> list:
+    table, placename, _ = schema(countrycode)
+    connection = open_readonly(countrycode)
+    try:
+        return connection.execute(f'SELECT "{placename}", "{POSTALKEY}" FROM {table} WHERE rowid % {step} = 0 '
+                                  f'AND "{placename}" IS NOT NULL AND "{POSTALKEY}" IS NOT NULL').fetchall()
+    finally:
+        connection.close()
+
+
+def test_memory_matches_sqlite() -> None:
+    with Controller(backend='sqlite') as sqlite, Controller(backend='memory') as memory:
+        for countrycode in COUNTRIES:
+            rows = sample(countrycode)
+            zipcodes = sorted({zipcode for _, zipcode in rows})
+            expected = sqlite.placenames_by_zipcodes(countrycode, zipcodes)
+            found = memory.placenames_by_zipcodes(countrycode, zipcodes)
+            assert {key: sorted(value) for key, value in found.items()} == \
+                   {key: sorted(value) for key, value in expected.items()}, countrycode
+            placenames = sorted({placename for placename, _ in rows})
+            for placename, zipcode in memory.zipcodes_by_placenames(countrycode, placenames).items():
+                assert placename in sqlite.placenames_by_zipcode(countrycode, zipcode), countrycode
+        assert memory.zipcode_by_placename('Nowhere', 'IT') is None
+        assert memory.placenames_by_zipcode('XX', '00501') is None
+        assert set(memory.memory_usage()) == set(COUNTRIES)
+
+
+def test_hot_countries_are_the_only_ones_in_memory() -> None:
+    with Controller(backend='sqlite', hot_countries=['IT']) as controller:
+        assert controller.zipcode_by_placename('Leggiuno', 'IT') == '21038'
+        assert controller.placenames_by_zipcode('US', 501) == ['Holtsville']
+        assert list(controller.memory_usage()) == ['IT']
+
+
+def test_countries_without_a_database_are_not_loaded() -> None:
+    assert load_country('XX') is None
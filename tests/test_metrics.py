@@ -0,0 +1,28 @@
+from metrics import OTHER, Metrics
+
+
+def test_prometheus_escapes_labels_and_folds_unknown_countries() -> None:
+    collected = Metrics(enabled=True)
+    collected.observe('lookup', 'IT', 0.001, 2)
+    collected.observe('lookup', 'X"Y', 0.001, 1)
+    collected.observe('lookup', 'zipcodes_XX.db', 0.002, 1)
+    collected.observe('say "a\\b"\n', 'US', 0.001)
+    exported = collected.prometheus()
+    assert 'zipcodes_calls_total{operation="lookup",country="IT"} 1' in exported
+    assert f'zipcodes_calls_total{{operation="lookup",country="{OTHER}"}} 2' in exported
+    assert f'zipcodes_rows_total{{operation="lookup",country="{OTHER}"}} 2' in exported
+    assert 'zipcodes_calls_total{operation="say \\"a\\\\b\\"\\n",country="US"} 1' in exported
+    assert 'X"Y' not in exported and 'zipcodes_XX' not in exported
+
+
+def test_unknown_countries_are_folded_when_observed() -> None:
+    collected = Metrics(enabled=True)
+    for countrycode in ('X1', 'X2', 'X3', 'IT'):
+        collected.observe('lookup', countrycode, 0.001, 1)
+        collected.cached(countrycode, True)
+    collected.opened('connection', 'zipcodes_XX.db')
+    snapshot = collected.snapshot()
+    assert sorted(snapshot['calls']) == [('lookup', 'IT'), ('lookup', OTHER), ('open_connection', OTHER)]
+    assert snapshot['calls'][('lookup', OTHER)]['calls'] == 3
+    assert snapshot['opens'] == {('connection', OTHER): 1}
+    assert sorted(snapshot['cache_hit_rate']) == ['IT', OTHER]
@@ -0,0 +1,55 @@
+from pytest import raises
+
+from controller import Controller
+from mmapindex import MmapIndex
+from rawengine import POSTALKEY, open_readonly, schema
+
+# The countries compiled in the index of the tests, see conftest.py.
+COUNTRIES = ('AD', 'DE', 'IT', 'US')
+
+
+def sample(countrycode: str, step: int = 7) -> list:
+    table, placename, _ = schema(countrycode)
+    connection = open_readonly(countrycode)
+    try:
+        return connection.execute(f'SELECT "{placename}", "{POSTALKEY}" FROM {table} WHERE rowid % {step} = 0 '
+                                  f'AND "{placename}" IS NOT NULL AND "{POSTALKEY}" IS NOT NULL').fetchall()
+    finally:
+        connection.close()
+
+
+def test_mmap_matches_sqlite(index_file) -> None:
+    index = MmapIndex(index_file)
+    try:
+        assert index.countries() == list(COUNTRIES)
+        with Controller(backend='sqlite') as controller:
+            for countrycode in COUNTRIES:
+                rows = sample(countrycode)
+                zipcodes = sorted({zipcode for _, zipcode in rows})
+                expected = controller.placenames_by_zipcodes(countrycode, zipcodes)
+                found = index.placenames_by_zipcodes(countrycode, zipcodes)
+                assert {key: sorted(value) for key, value in found.items()} == \
+                       {key: sorted(value) for key, value in expected.items()}, countrycode
+                for placename, _ in rows:
+                    zipcode = index.zipcode_by_placename(placename, countrycode)
+                    assert placename in controller.placenames_by_zipcode(countrycode, zipcode), countrycode
+        assert index.zipcode_by_placename('Nowhere', 'IT') is None
+        assert index.placenames_by_zipcode('IT', '99999') is None
+        assert index.placenames_by_zipcode('XX', '00501') is None
+    finally:
+        index.close()
+
+
+def test_leading_zeros_and_integers_are_the_same_key(index_file) -> None:
+    index = MmapIndex(index_file)
+    try:
+        assert index.placenames_by_zipcode('US', 501) == index.placenames_by_zipcode('US', '00501') == ['Holtsville']
+    finally:
+        index.close()
+
+
+def test_other_files_are_rejected(tmp_path) -> None:
+    path = tmp_path / 'zipcodes.idx'
+    path.write_bytes(b'ZIPIDX01' + bytes(8))
+    with raises(ValueError):
+        MmapIndex(path)
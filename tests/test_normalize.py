@@ -0,0 +1,21 @@
+from controller import Controller
+from normalize import placekey
+
+
+def test_umlauts_share_their_key_in_the_german_speaking_countries() -> None:
+    assert placekey('München', 'DE') == placekey('MUENCHEN', 'DE') == placekey('munchen', 'DE') == 'munchen'
+    assert placekey('Zürich', 'CH') == placekey('Zuerich', 'CH')
+    assert placekey('Saint-Étienne', 'FR') == 'saint etienne'
+    assert placekey('Muenchen', 'FR') == 'muenchen'
+    assert placekey(None, 'DE') is None
+
+
+def test_normalized_lookups_on_every_backend() -> None:
+    for backend in Controller.BACKENDS:
+        with Controller(backend=backend) as controller:
+            for placename in ('München', 'MUENCHEN', 'munchen'):
+                assert controller.zipcode_by_placename(placename, 'DE', normalize=True) == '80331', backend
+            assert controller.zipcode_by_placename('munchen', 'DE') is None, backend
+            assert controller.zipcode_by_placename('LEGGIUNO', 'IT', normalize=True) == '21038', backend
+            found = controller.zipcodes_by_placenames('DE', ['munchen', 'Nowhere'], normalize=True)
+            assert found == {'munchen': '80331', 'Nowhere': None}, backend
@@ -0,0 +1,19 @@
+from sqlite3 import connect
+
+from configuration import configuration as cfg
+from rawengine import SCHEMA, canonical, padding
+
+
+def test_paddings_follow_the_database_folder(tmp_path, monkeypatch) -> None:
+    assert padding('US') == 5
+    monkeypatch.setitem(cfg, 'db_folder', tmp_path)
+    assert padding('US') == 0
+    connection = connect(tmp_path / 'zipcodes_US.db')
+    connection.execute(f'CREATE TABLE {SCHEMA.table} ("{SCHEMA.placename}" TEXT, "postalkey" TEXT)')
+    connection.execute(f'INSERT INTO {SCHEMA.table} VALUES (?, ?)', ('Somewhere', '0123'))
+    connection.commit()
+    connection.close()
+    assert padding('US') == 4
+    assert canonical('US', 501) == '0501'
+    monkeypatch.undo()
+    assert canonical('US', 501) == '00501'
@@ -0,0 +1,40 @@
+from pytest import raises
+
+from controller import Controller
+from registry import Registry
+
+
+def registry(capacity: int, closed: list) -> Registry:
+    return Registry(lambda code: None if code == 'XX' else code.lower(), closed.append, capacity)
+
+
+def test_least_recently_used_is_evicted() -> None:
+    closed = []
+    resources = registry(2, closed)
+    assert resources.get('IT') == 'it' and resources.get('US') == 'us'
+    assert resources.get('IT') == 'it'
+    assert resources.get('DE') == 'de'
+    assert closed == ['us']
+    assert resources.keys() == ['IT', 'DE'] and 'US' not in resources and len(resources) == 2
+    resources.evict('IT')
+    resources.close()
+    assert closed == ['us', 'it', 'de'] and len(resources) == 0
+
+
+def test_unopened_resources_are_not_held() -> None:
+    resources = registry(1, [])
+    assert resources.get('XX') is None
+    assert 'XX' not in resources and len(resources) == 0
+    with raises(ValueError):
+        registry(0, [])
+
+
+def test_controller_reuses_a_bounded_number_of_engines() -> None:
+    with Controller(max_engines=2) as controller:
+        engine = controller.engine('IT')
+        assert controller.engine('IT') is engine
+        controller.engine('US')
+        controller.engine('DE')
+        assert controller._engines.keys() == ['US', 'DE']
+        assert controller.engine('XX') is None
+        assert controller.zipcode_by_placename('Leggiuno', 'IT') == '21038'
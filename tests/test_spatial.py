@@ -0,0 +1,67 @@
+from numpy import arcsin, array, cos, float64, radians, sin, sqrt
+
+from configuration import configuration as cfg
+from controller import Controller
+from spatial import EARTH_RADIUS, SpatialIndex, SpatialIndexes, load_points
+
+# The (lat, lon) points of the synthetic index, on a grid crossing the antimeridian and reaching the poles.
+POINTS = [(lat, lon) for lat in range(-90, 91, 7) for lon in range(-180, 180, 11)]
+
+
+def distance(lat: float, lon: float, other_lat: float, other_lon: float) -> float:
+    lat, lon, other_lat, other_lon = map(radians, (lat, lon, other_lat, other_lon))
+    a = sin((other_lat - lat) / 2) ** 2 + cos(lat) * cos(other_lat) * sin((other_lon - lon) / 2) ** 2
+    return float(2 * EARTH_RADIUS * arcsin(sqrt(min(a, 1.0))))
+
+
+def index() -> SpatialIndex:
+    return SpatialIndex(['XX'] * len(POINTS), [f'{n:05d}' for n in range(len(POINTS))], ['place'] * len(POINTS),
+                        array([lat for lat, _ in POINTS], dtype=float64),
+                        array([lon for _, lon in POINTS], dtype=float64))
+
+
+def test_nearest_and_within_match_brute_force() -> None:
+    spatial = index()
+    for lat, lon in [(0.0, 0.0), (45.5, 179.9), (-89.0, -10.0), (89.5, 100.0), (12.3, -170.4)]:
+        brute = sorted((distance(lat, lon, *point), f'{n:05d}') for n, point in enumerate(POINTS))
+        nearest = spatial.nearest(lat, lon, k=5)
+        assert [round(item.distance, 6) for item in nearest] == [round(d, 6) for d, _ in brute[:5]]
+        for km in (100.0, 1500.0):
+            within = spatial.within(lat, lon, km)
+            assert sorted(item.zipcode for item in within) == sorted(code for d, code in brute if d <= km)
+
+
+def test_indexes_are_bounded_and_skip_unknown_countries() -> None:
+    indexes = SpatialIndexes()
+    assert len(indexes.get('XX')) == 0
+    assert indexes.keys() == []
+    for countrycode in indexes.countrycodes()[:cfg['index_cache_size'] + 2]:
+        indexes.get(countrycode)
+    assert len(indexes.keys()) <= cfg['index_cache_size']
+
+
+def test_nearest_zipcode_of_a_known_point() -> None:
+    with Controller(backend='sqlite') as controller:
+        assert controller.nearest_zipcodes(40.8154, -73.0451, k=1, countrycode='US')[0].zipcode == '00501'
+
+
+def test_within_a_country_matches_brute_force() -> None:
+    points = load_points('AD')
+    spatial = SpatialIndex(**points)
+    coordinates = list(zip(points['latitudes'].tolist(), points['longitudes'].tolist()))
+    for km in (0.0, 5.0, 20.0):
+        within = spatial.within(42.5, 1.5, km)
+        brute = sorted(code for code, point in zip(points['zipcodes'], coordinates)
+                       if distance(42.5, 1.5, *point) <= km)
+        assert sorted(item.zipcode for item in within) == brute
+        assert [item.distance for item in within] == sorted(item.distance for item in within)
+    assert spatial.within(42.5, 1.5, -1.0) == []
+
+
+def test_within_a_zipcode() -> None:
+    with Controller(backend='sqlite') as controller:
+        nearby = controller.zipcodes_within_zipcode('US', '00501', 5.0)
+        assert [item.zipcode for item in nearby[:2]] == ['00501', '00544']
+        assert all(item.countrycode == 'US' and item.distance <= 5.0 for item in nearby)
+        assert controller.zipcodes_within_zipcode('US', '99999', 5.0) is None
+        assert controller.zipcodes_within_zipcode('IT', '21038', 5.0) is None
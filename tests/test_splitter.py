@@ -0,0 +1,49 @@
+from sqlite3 import connect
+
+from pytest import raises
+
+from splitter import COLUMNS, create_indexes, migrate, write_country
+
+
+def row(postalcode: object, placename: object) -> tuple:
+    return ('US', postalcode, placename) + (None,) * (len(COLUMNS) - 3)
+
+
+def test_write_country_indexes_the_canonical_keys(tmp_path) -> None:
+    assert write_country(tmp_path, 'US', [row(501, 'Holtsville'), row(90210, 'Beverly Hills')]) == ('US', 2)
+    assert [path.name for path in tmp_path.iterdir()] == ['zipcodes_US.db']
+    connection = connect(tmp_path / 'zipcodes_US.db')
+    try:
+        assert connection.execute('SELECT "postalkey", "placekey" FROM "geonames-postal-code" '
+                                  'ORDER BY "postalkey"').fetchall() == [('00501', 'holtsville'),
+                                                                         ('90210', 'beverly hills')]
+    finally:
+        connection.close()
+
+
+def test_write_country_removes_the_temporary_database_on_failure(tmp_path) -> None:
+    with raises(Exception):
+        write_country(tmp_path, 'US', [row(501, 'Holtsville'), row(502, ['not', 'a', 'placename'])])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_migrate_indexes_the_given_folder(tmp_path) -> None:
+    write_country(tmp_path, 'US', [row(501, 'Holtsville')])
+    migrate(tmp_path)
+    connection = connect(tmp_path / 'zipcodes_US.db')
+    try:
+        indexes = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'idx_placename', 'idx_postalcode', 'idx_placekey', 'idx_postalkey'} <= indexes
+    finally:
+        connection.close()
+
+
+def test_create_indexes_skips_missing_tables() -> None:
+    connection = connect(':memory:')
+    try:
+        connection.execute('CREATE TABLE "listacomuni" ("Comune", "CAP", "placekey", "postalkey", "Istat", "CodFisco")')
+        create_indexes(connection, {'listacomuni': ['CREATE INDEX "idx_cap" ON "listacomuni" ("CAP")'],
+                                    'missing': ['CREATE INDEX "idx_missing" ON "missing" ("name")']})
+        assert connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('idx_cap',)]
+    finally:
+        connection.close()
@@ -0,0 +1,20 @@
+from controller import Controller
+from stream import ZIPCODE, PLACENAMES, records, resolve
+
+
+def test_records_skip_invalid_lines() -> None:
+    lines = [
+        '{"countrycode": "US", "zipcode": [1]}',
+        '{"countrycode": "US", "zipcode": true}',
+        '{"countrycode": "IT", "placename": {"name": "Varese"}}',
+        '{"countrycode": 1, "zipcode": "00501"}',
+        '[1, 2]',
+        '{"countrycode": "US"',
+        '',
+        '{"countrycode": "US", "zipcode": "00501"}',
+        '{"countrycode": "IT", "placename": "Varese"}',
+    ]
+    parsed = list(records(lines))
+    assert [lookup for _, lookup in parsed] == [('US', PLACENAMES, '00501'), ('IT', ZIPCODE, 'Varese')]
+    with Controller(backend='sqlite') as controller:
+        assert resolve(controller, [lookup for _, lookup in parsed]) == [['Holtsville'], '21100']
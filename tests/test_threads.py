@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from gc import collect
+from threading import Thread
+
+from controller import Controller
+
+
+def test_threads_look_up_concurrently() -> None:
+    with Controller(backend='sqlite', thread_safe=True) as controller:
+        def lookup(index: int) -> bool:
+            return controller.placenames_by_zipcode('US', '00501') == ['Holtsville'] and \
+                controller.zipcode_by_placename('Varese', 'IT', normalize=True) == '21100'
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(lookup, range(400)))
+
+
+def test_threads_release_their_connections_on_exit() -> None:
+    with Controller(backend='sqlite', thread_safe=True) as controller:
+        results = []
+        for _ in range(50):
+            thread = Thread(target=lambda: results.append(controller.placenames_by_zipcode('IT', 21038)))
+            thread.start()
+            thread.join()
+        collect()
+        assert len(results) == 50 and all(results)
+        assert len(controller._backend._registries) == 0
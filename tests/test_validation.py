@@ -0,0 +1,29 @@
+from numpy import array, int64, str_
+
+from validation import load_rules
+
+
+def test_single_codes_and_batches_agree_on_whitespace() -> None:
+    rules = load_rules('US')
+    codes = [' 00501', '00501 ', '501 ', '\t501\n', ' 99999x', '  ']
+    for exact in (True, False):
+        assert rules.validate(codes, exact).tolist() == [rules.validate(code, exact) for code in codes]
+        assert rules.validate(array(codes, dtype=object), exact).tolist() == [rules.validate(code, exact)
+                                                                               for code in codes]
+    assert rules.validate(codes).tolist() == [True, True, True, True, False, False]
+
+
+def test_numpy_scalars_are_single_codes() -> None:
+    rules = load_rules('US')
+    assert rules.validate(int64(501)) is True
+    assert rules.validate(str_(' 00501')) is True
+    assert rules.validate(int64(-501), exact=False) is False
+
+
+def test_python_scalars_are_single_codes() -> None:
+    rules = load_rules('US')
+    assert rules.validate(501.0) is True
+    assert rules.validate(501.5) is False
+    assert rules.validate(float('nan'), exact=False) is False
+    assert rules.validate(None) is False
+    assert rules.validate(None, exact=False) is False
@@ -0,0 +1,437 @@
+"""
+It benchmarks the Controller lookups, the postal code validation and the database build steps over countries of
+different sizes, saves the results to JSON and compares two saved runs. It also checks that importing the package stays
+cheap. Run it from the repository root with the datamodel and data folders on the path, e.g.
+PYTHONPATH=.:datamodel:data python utils/benchmark.py run --output before.json, then, after a change,
+PYTHONPATH=.:datamodel:data python utils/benchmark.py compare before.json after.json, or
+PYTHONPATH=.:datamodel:data python utils/benchmark.py imports to check the import time.
+"""
+
+from argparse import ArgumentParser, Namespace
+from json import dump, load
+from logging import getLogger, basicConfig, INFO
+from os import environ, pathsep
+from pathlib import Path
+from platform import platform, python_version
+from random import Random
+from shutil import copyfile
+from sqlite3 import connect
+from subprocess import run
+from sys import argv, exit, executable
+from tempfile import TemporaryDirectory
+from time import perf_counter_ns, strftime
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from numpy import array
+
+from configuration import configuration as cfg
+from controller import Controller
+from rawengine import schema
+
+# The program timing the import of the Controller, its construction and its first lookup in a fresh interpreter.
+COLD_START = '''
+from time import perf_counter_ns
+start = perf_counter_ns()
+from controller import Controller
+controller = Controller(backend='{backend}')
+controller.placenames_by_zipcode('{countrycode}', {zipcode!r})
+print(perf_counter_ns() - start)
+'''
+
+# The program timing the import of the package in a fresh interpreter and listing the heavy modules it loaded.
+IMPORT = '''
+from sys import modules
+from time import perf_counter_ns
+start = perf_counter_ns()
+import {package}
+print(perf_counter_ns() - start, *[name for name in {heavy!r} if name in modules])
+'''
+
+# The modules the package must not load when imported.
+HEAVY = ['pandas', 'numpy', 'sqlalchemy', 'urllib.request']
+
+# The number of postal codes validated at once.
+VALIDATION_BATCH = 100000
+
+
+def keys(countrycode: str, count: int, seed: int = 0) -> Tuple[List[str], List[Any]]:
+    """
+    It samples, reproducibly, up to count distinct placenames and zipcodes of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param count: The maximum number of keys of each kind.
+    :type count: int.
+
+    :param seed: The seed of the sampling.
+    :type seed: int.
+
+    :return: It returns the placenames and the zipcodes.
+    :rtype: Tuple[List[str], List[Any]].
+    """
+    table, placename, zipcode = schema(countrycode)
+    connection = connect(cfg['db_folder'] / f'zipcodes_{countrycode}.db')
+    try:
+        placenames = [row[0] for row in connection.execute(
+            f'SELECT DISTINCT "{placename}" FROM {table} WHERE "{placename}" IS NOT NULL ORDER BY 1')]
+        zipcodes = [row[0] for row in connection.execute(
+            f'SELECT DISTINCT "{zipcode}" FROM {table} WHERE "{zipcode}" IS NOT NULL ORDER BY 1')]
+    finally:
+        connection.close()
+    random = Random(seed)
+    return random.sample(placenames, min(count, len(placenames))), random.sample(zipcodes, min(count, len(zipcodes)))
+
+
+def percentile(samples: List[int], fraction: float) -> int:
+    """
+    It gets the given percentile of the samples by the nearest rank method.
+
+    :param samples: The samples, sorted.
+    :type samples: List[int].
+
+    :param fraction: The percentile as a fraction in [0, 1].
+    :type fraction: float.
+
+    :return: See description.
+    :rtype: int.
+    """
+    return samples[min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))]
+
+
+def summary(case: str, backend: str, countrycode: str, samples: List[int], ops: int = 1) -> Dict[str, Any]:
+    """
+    It summarizes the timings of a case.
+
+    :param case: The name of the case.
+    :type case: str.
+
+    :param backend: The Controller backend, or '-' when not relevant.
+    :type backend: str.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param samples: The nanoseconds taken by each sample.
+    :type samples: List[int].
+
+    :param ops: The number of operations run by each sample.
+    :type ops: int.
+
+    :return: It returns the case with its p50 and p99 latency of a sample in microseconds and the operations per second.
+    :rtype: Dict[str, Any].
+    """
+    samples = sorted(samples)
+    return dict(
+        case=case,
+        backend=backend,
+        country=countrycode,
+        samples=len(samples),
+        p50_us=percentile(samples, 0.5) / 1e3,
+        p99_us=percentile(samples, 0.99) / 1e3,
+        ops_per_s=len(samples) * ops / (sum(samples) / 1e9),
+    )
+
+
+def timings(function: Callable[[Any], Any], arguments: List[Any]) -> List[int]:
+    """
+    It times each call of the given function on the given arguments.
+
+    :param function: The function.
+    :type function: Callable[[Any], Any].
+
+    :param arguments: The argument of each call.
+    :type arguments: List[Any].
+
+    :return: It returns the nanoseconds taken by each call.
+    :rtype: List[int].
+    """
+    samples = []
+    for argument in arguments:
+        start = perf_counter_ns()
+        function(argument)
+        samples.append(perf_counter_ns() - start)
+    return samples
+
+
+def cold_start(backend: str, countrycode: str, zipcode: Any, repeat: int) -> List[int]:
+    """
+    It times the import of the Controller, its construction and its first lookup, each time in a fresh interpreter.
+
+    :param backend: The Controller backend.
+    :type backend: str.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param zipcode: The zipcode looked up.
+    :type zipcode: Any.
+
+    :param repeat: The number of interpreters started.
+    :type repeat: int.
+
+    :return: It returns the nanoseconds taken in each interpreter.
+    :rtype: List[int].
+    """
+    program = COLD_START.format(backend=backend, countrycode=countrycode, zipcode=zipcode)
+    folder = Path(__file__).parent.parent / 'datamodel'
+    env = dict(environ, PYTHONPATH=pathsep.join([f'{folder}', environ.get('PYTHONPATH', '')]))
+    return [
+        int(run([executable, '-c', program], env=env, capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeat)
+    ]
+
+
+def import_package(repeat: int, heavy: List[str]) -> Tuple[List[int], Set[str]]:
+    """
+    It times the import of the top level package, each time in a fresh interpreter.
+
+    :param repeat: The number of interpreters started.
+    :type repeat: int.
+
+    :param heavy: The modules to look for once the package is imported.
+    :type heavy: List[str].
+
+    :return: It returns the nanoseconds taken in each interpreter and the heavy modules loaded by the import.
+    :rtype: Tuple[List[int], Set[str]].
+    """
+    root = Path(__file__).parent.parent.absolute()
+    program = IMPORT.format(package=root.name, heavy=heavy)
+    paths = [f'{root.parent}', f'{root / "data"}', f'{root / "datamodel"}', environ.get('PYTHONPATH', '')]
+    env = dict(environ, PYTHONPATH=pathsep.join(paths))
+    samples = []
+    loaded = set()
+    for _ in range(repeat):
+        output = run([executable, '-c', program], env=env, cwd=root.parent, capture_output=True, text=True,
+                     check=True).stdout.split()
+        samples.append(int(output[0]))
+        loaded.update(output[1:])
+    return samples, loaded
+
+
+def first_lookup(backend: str, countrycode: str, zipcodes: List[Any]) -> List[int]:
+    """
+    It times the first lookup of the country on fresh controllers, which opens its engine or loads its index.
+
+    :param backend: The Controller backend.
+    :type backend: str.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param zipcodes: The zipcode looked up by each controller.
+    :type zipcodes: List[Any].
+
+    :return: It returns the nanoseconds taken by each first lookup.
+    :rtype: List[int].
+    """
+    samples = []
+    for zipcode in zipcodes:
+        with Controller(backend=backend) as controller:
+            start = perf_counter_ns()
+            controller.placenames_by_zipcode(countrycode, zipcode)
+            samples.append(perf_counter_ns() - start)
+    return samples
+
+
+def build(countrycode: str, repeat: int) -> List[int]:
+    """
+    It times the splitter build steps of a country, i.e. the normalized placenames, the canonical postal codes, the
+    indexes and the planner statistics, on a copy of its database stripped of its indexes.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param repeat: The number of builds.
+    :type repeat: int.
+
+    :return: It returns the nanoseconds taken by each build.
+    :rtype: List[int].
+    """
+    from splitter import INDEXES, add_placekeys, add_postalkeys, create_indexes
+
+    samples = []
+    with TemporaryDirectory() as folder:
+        path = Path(folder) / f'zipcodes_{countrycode}.db'
+        for _ in range(repeat):
+            copyfile(cfg['db_folder'] / f'zipcodes_{countrycode}.db', path)
+            connection = connect(path)
+            try:
+                names = connection.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+                for (name,) in names.fetchall():
+                    connection.execute(f'DROP INDEX "{name}"')
+                connection.commit()
+                start = perf_counter_ns()
+                add_placekeys(connection, countrycode)
+                add_postalkeys(connection, countrycode)
+                create_indexes(connection, INDEXES)
+                samples.append(perf_counter_ns() - start)
+            finally:
+                connection.close()
+    return samples
+
+
+def benchmark(args: Namespace) -> List[Dict[str, Any]]:
+    """
+    It runs all the cases on all the given countries and backends.
+
+    :param args: The parsed command line arguments.
+    :type args: Namespace.
+
+    :return: It returns the summary of each case.
+    :rtype: List[Dict[str, Any]].
+    """
+    logger = getLogger(__name__)
+    results = []
+
+    def report(result: Dict[str, Any]) -> None:
+        results.append(result)
+        logger.info(f'{result["case"]:14s} {result["backend"]:7s} {result["country"]:4s}'
+                    f'p50 {result["p50_us"]:12.1f} us  p99 {result["p99_us"]:12.1f} us  '
+                    f'{result["ops_per_s"]:12.0f} ops/s')
+
+    backends = list(args.backends)
+    if 'mmap' in backends and not Path(cfg['index_file']).exists():
+        logger.warning('No index file compiled by data/compiler.py, the mmap backend is skipped')
+        backends.remove('mmap')
+    report(summary('import', '-', '-', import_package(args.repeat, HEAVY)[0]))
+    for countrycode in args.countries:
+        placenames, zipcodes = keys(countrycode, args.lookups, args.seed)
+        batches = [placenames[i:i + args.batch_size] for i in range(0, len(placenames), args.batch_size)]
+        for backend in backends:
+            report(summary('cold_start', backend, countrycode, cold_start(backend, countrycode, zipcodes[0],
+                                                                         args.repeat)))
+            report(summary('first_lookup', backend, countrycode,
+                           first_lookup(backend, countrycode, zipcodes[:args.repeat])))
+            with Controller(backend=backend) as controller:
+                controller.placenames_by_zipcode(countrycode, zipcodes[0])
+                report(summary('zipcode', backend, countrycode, timings(
+                    lambda placename: controller.zipcode_by_placename(placename, countrycode), placenames)))
+                report(summary('placenames', backend, countrycode, timings(
+                    lambda zipcode: controller.placenames_by_zipcode(countrycode, zipcode), zipcodes)))
+                report(summary('batch_zipcodes', backend, countrycode, timings(
+                    lambda batch: controller.zipcodes_by_placenames(countrycode, batch), batches), args.batch_size))
+        with Controller() as controller:
+            codes = [f'{zipcode}' for zipcode in zipcodes] * (VALIDATION_BATCH // len(zipcodes) + 1)
+            codes = array(codes[:VALIDATION_BATCH])
+            controller.validate_zipcodes(countrycode, codes[:1])
+            report(summary('validate', '-', countrycode, timings(
+                lambda batch: controller.validate_zipcodes(countrycode, batch), [codes] * args.repeat), len(codes)))
+        report(summary('build', '-', countrycode, build(countrycode, args.repeat)))
+    return results
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float) -> int:
+    """
+    It logs the change of the p50 latency of the cases found in both runs, flagging the slowdowns above the threshold.
+
+    :param before: The baseline run.
+    :type before: Dict[str, Any].
+
+    :param after: The new run.
+    :type after: Dict[str, Any].
+
+    :param threshold: The relative slowdown of the p50 latency regarded as a regression, e.g. 0.1 for 10%.
+    :type threshold: float.
+
+    :return: It returns the number of regressions.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    baseline = {(result['case'], result['backend'], result['country']): result for result in before['results']}
+    regressions = 0
+    for result in after['results']:
+        old = baseline.get((result['case'], result['backend'], result['country']))
+        if old is None:
+            continue
+        change = result['p50_us'] / old['p50_us'] - 1 if old['p50_us'] else 0.0
+        flag = 'REGRESSION' if change > threshold else ''
+        regressions += change > threshold
+        logger.info(f'{result["case"]:14s} {result["backend"]:7s} {result["country"]:4s}'
+                    f'p50 {old["p50_us"]:12.1f} -> {result["p50_us"]:12.1f} us  {change:+8.1%}  {flag}')
+    return regressions
+
+
+def imports(repeat: int, budget: float) -> int:
+    """
+    It checks that importing the package loads none of the heavy modules and takes less than the given budget.
+
+    :param repeat: The number of interpreters started.
+    :type repeat: int.
+
+    :param budget: The maximum p50 import time in milliseconds.
+    :type budget: float.
+
+    :return: It returns the number of failed checks.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    samples, loaded = import_package(repeat, HEAVY)
+    p50 = percentile(sorted(samples), 0.5) / 1e6
+    logger.info(f'import p50 {p50:.1f} ms (budget {budget:.1f} ms), heavy modules loaded: {sorted(loaded) or "none"}')
+    return (p50 > budget) + bool(loaded)
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    parser = ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+    runner = commands.add_parser('run', help='run the benchmarks')
+    runner.add_argument('--countries', nargs='+', default=['AD', 'IT', 'US'], help='countries to benchmark')
+    runner.add_argument('--backends', nargs='+', default=list(Controller.BACKENDS), choices=Controller.BACKENDS,
+                        help='Controller backends to benchmark')
+    runner.add_argument('--lookups', type=int, default=2000, help='distinct keys looked up by the warm cases')
+    runner.add_argument('--batch-size', type=int, default=100, help='keys per batch lookup')
+    runner.add_argument('--repeat', type=int, default=5, help='samples of the cold start, first lookup and build')
+    runner.add_argument('--seed', type=int, default=0, help='seed of the key sampling')
+    runner.add_argument('--output', type=Path, help='JSON file the results are saved to')
+    comparer = commands.add_parser('compare', help='compare two saved runs')
+    comparer.add_argument('before', type=Path, help='JSON file of the baseline run')
+    comparer.add_argument('after', type=Path, help='JSON file of the new run')
+    comparer.add_argument('--threshold', type=float, default=0.1, help='p50 slowdown regarded as a regression')
+    checker = commands.add_parser('imports', help='check the import time of the package and the modules it loads')
+    checker.add_argument('--repeat', type=int, default=5, help='interpreters started')
+    checker.add_argument('--budget', type=float, default=100.0, help='maximum p50 import time in milliseconds')
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    It runs the benchmarks or compares two runs.
+
+    :param args:    The parsed command line arguments as returned by usage();
+    :type args:     Namespace.
+
+    :return: The value returned to the OS, 1 if the comparison found regressions or the import check failed.
+    :rtype: int.
+    """
+    if args.command == 'imports':
+        return 1 if imports(args.repeat, args.budget) else 0
+    if args.command == 'compare':
+        with open(args.before) as before, open(args.after) as after:
+            return 1 if compare(load(before), load(after), args.threshold) else 0
+
+    results = benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            dump(dict(
+                created=strftime('%Y-%m-%dT%H:%M:%S'),
+                python=python_version(),
+                platform=platform(),
+                arguments={key: value for key, value in vars(args).items() if key not in ('command', 'output')},
+                results=results,
+            ), output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
+    exit(main(usage(argv[1:])))
@@ -0,0 +1,278 @@
+"""
+It enriches a CSV file with the zipcodes of its placenames, or the placenames of its zipcodes, resolving them on a
+pool of worker processes partitioned by country code. Run it with the datamodel folder on the path, e.g.
+PYTHONPATH=datamodel python utils/enrich.py input.csv output.csv --column city --country-column country.
+"""
+
+from argparse import ArgumentParser, Namespace
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from csv import reader as csv_reader, writer as csv_writer
+from itertools import islice
+from logging import getLogger, basicConfig, INFO
+from os import cpu_count
+from pathlib import Path
+from sys import argv, exit
+from time import perf_counter
+from typing import Deque, Dict, Iterator, List, Optional as Opt, Tuple
+from zlib import crc32
+
+from controller import Controller
+
+# The controller of the current worker process, created on its first task.
+controller = None
+
+
+def resolve(mode: str, backend: str, countrycode: str, keys: List[str]) -> Dict[str, str]:
+    """
+    It resolves the given keys of a country in the current worker process.
+
+    :param mode: 'zipcode' to resolve placenames to zipcodes, 'placename' to resolve zipcodes to placenames.
+    :type mode: str.
+
+    :param backend: The Controller backend.
+    :type backend: str.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param keys: The distinct placenames or zipcodes.
+    :type keys: List[str].
+
+    :return: It returns the resolved value of each key, an empty string when missing, placenames joined by '|'.
+    :rtype: Dict[str, str].
+    """
+    global controller
+    if controller is None:
+        controller = Controller(backend=backend)
+    if mode == 'zipcode':
+        found = controller.zipcodes_by_placenames(countrycode, keys)
+        return {key: '' if value is None else f'{value}' for key, value in found.items()}
+    found = controller.placenames_by_zipcodes(countrycode, keys)
+    return {key: '' if value is None else '|'.join(value) for key, value in found.items()}
+
+
+class Enricher:
+    """
+    It streams the rows of a CSV file through the worker processes and writes them back in input order, keeping at
+    most a fixed number of chunks in memory.
+    """
+
+    def __init__(self, args: Namespace, header: List[str]) -> None:
+        """
+        Constructor.
+
+        :param args: The parsed command line arguments.
+        :type args: Namespace.
+
+        :param header: The header of the input file.
+        :type header: List[str].
+        """
+        self.args = args
+        self.column = header.index(args.column)
+        self.country_column = header.index(args.country_column) if args.country_column else None
+        self.width = len(header)
+        self.rejected = 0
+        self.executors = [ProcessPoolExecutor(max_workers=1) for _ in range(args.workers)]
+
+    def key(self, row: List[str]) -> Opt[Tuple[str, str]]:
+        """
+        It gets the country code and the placename or zipcode to resolve of the given row, or None when the row is
+        too short to hold them, e.g. a blank line.
+
+        :param row: The row.
+        :type row: List[str].
+
+        :return: See description.
+        :rtype: Opt[Tuple[str, str]].
+        """
+        if len(row) <= self.column or (self.country_column is not None and len(row) <= self.country_column):
+            return None
+        return row[self.country_column] if self.country_column is not None else self.args.country, row[self.column]
+
+    def submit(self, rows: List[List[str]]) -> Dict[str, Future]:
+        """
+        It sends the distinct keys of the given rows, grouped by country, to the worker owning each country.
+
+        :param rows: The rows of a chunk.
+        :type rows: List[List[str]].
+
+        :return: It returns the pending results keyed by country code.
+        :rtype: Dict[str, Future].
+        """
+        keys = {}
+        for row in rows:
+            key = self.key(row)
+            if key is not None:
+                keys.setdefault(key[0], set()).add(key[1])
+        return {
+            countrycode: self.executors[crc32(countrycode.encode('utf-8')) % len(self.executors)].submit(
+                resolve, self.args.mode, self.args.backend, countrycode, list(values)
+            )
+            for countrycode, values in keys.items()
+        }
+
+    def rows(self, rows: List[List[str]], futures: Dict[str, Future]) -> Iterator[List[str]]:
+        """
+        It yields the given rows with the resolved value appended, waiting for the results of the chunk. The rows too
+        short to hold the key are padded to the header and passed through with an empty value, counted as rejected.
+
+        :param rows: The rows of a chunk.
+        :type rows: List[List[str]].
+
+        :param futures: The pending results of the chunk keyed by country code.
+        :type futures: Dict[str, Future].
+
+        :return: See description.
+        :rtype: Iterator[List[str]].
+        """
+        results = {countrycode: future.result() for countrycode, future in futures.items()}
+        for row in rows:
+            key = self.key(row)
+            if key is None:
+                self.rejected += 1
+                yield row + [''] * (self.width - len(row)) + ['']
+            else:
+                yield row + [results[key[0]].get(key[1], '')]
+
+    def close(self) -> None:
+        """
+        It stops the worker processes.
+
+        :return: None.
+        :rtype: None.
+        """
+        for executor in self.executors:
+            executor.shutdown()
+
+
+def chunks(rows: Iterator[List[str]], size: int) -> Iterator[List[List[str]]]:
+    """
+    It groups the given rows in consecutive chunks having at most the given size.
+
+    :param rows: The rows.
+    :type rows: Iterator[List[str]].
+
+    :param size: The maximum size of each chunk.
+    :type size: int.
+
+    :return: See description.
+    :rtype: Iterator[List[List[str]]].
+    """
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def enrich(args: Namespace) -> Tuple[int, float]:
+    """
+    It enriches the input file into the output file.
+
+    :param args: The parsed command line arguments.
+    :type args: Namespace.
+
+    :return: It returns the number of rows written and the elapsed seconds.
+    :rtype: Tuple[int, float].
+    """
+    logger = getLogger(__name__)
+    start = perf_counter()
+    count = 0
+    with open(args.input, newline='', encoding=args.encoding) as source, \
+            open(args.output, 'w', newline='', encoding=args.encoding) as target:
+        rows = csv_reader(source, delimiter=args.delimiter)
+        writer = csv_writer(target, delimiter=args.delimiter)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(f'{args.input} is empty, the header row is missing')
+        writer.writerow(header + [args.output_column or f'{args.mode}'])
+        enricher = Enricher(args, header)
+        pending: Deque[Tuple[List[List[str]], Dict[str, Future]]] = deque()
+        try:
+            for chunk in chunks(rows, args.chunk_size):
+                pending.append((chunk, enricher.submit(chunk)))
+                while len(pending) > args.window:
+                    done, futures = pending.popleft()
+                    writer.writerows(enricher.rows(done, futures))
+                    count += len(done)
+                    elapsed = perf_counter() - start
+                    logger.info(f'{count} rows, {count / elapsed:.0f} rows/s')
+            while pending:
+                done, futures = pending.popleft()
+                writer.writerows(enricher.rows(done, futures))
+                count += len(done)
+        finally:
+            enricher.close()
+    if enricher.rejected:
+        logger.warning(f'{enricher.rejected} rows too short to hold the key were passed through unresolved.')
+    return count, perf_counter() - start
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    helps = dict(
+        input='input CSV file, with a header row',
+        output='output CSV file, the input with one more column',
+        column='column holding the placenames or the zipcodes to resolve',
+        mode='zipcode: add the zipcode of each placename, placename: add the placenames of each zipcode',
+        country_column='column holding the country codes',
+        country='country code of all the rows, when there is no country column',
+        output_column='name of the added column, defaults to the mode',
+        workers='number of worker processes',
+        chunk_size='rows per chunk',
+        window='chunks in flight, bounding the memory used',
+        backend='Controller backend used by the workers',
+        delimiter='field delimiter',
+        encoding='file encoding',
+    )
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('input', type=Path, help=helps['input'])
+    parser.add_argument('output', type=Path, help=helps['output'])
+    parser.add_argument('--column', required=True, help=helps['column'])
+    parser.add_argument('--mode', choices=['zipcode', 'placename'], default='zipcode', help=helps['mode'])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--country-column', help=helps['country_column'])
+    group.add_argument('--country', help=helps['country'])
+    parser.add_argument('--output-column', help=helps['output_column'])
+    parser.add_argument('--workers', type=int, default=cpu_count() or 1, help=helps['workers'])
+    parser.add_argument('--chunk-size', type=int, default=10000, help=helps['chunk_size'])
+    parser.add_argument('--window', type=int, default=4, help=helps['window'])
+    parser.add_argument('--backend', default='sqlite', choices=Controller.BACKENDS, help=helps['backend'])
+    parser.add_argument('--delimiter', default=',', help=helps['delimiter'])
+    parser.add_argument('--encoding', default='utf-8', help=helps['encoding'])
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    It starts the application.
+
+    :param args:    The parsed command line arguments as returned by usage();
+    :type args:     Namespace.
+
+    :return: The value returned to the OS.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    try:
+        count, elapsed = enrich(args)
+    except (IOError, ValueError) as e:
+        logger.error(f'{str(e)}')
+        return 1
+    logger.info(f'Enriched {count} rows in {elapsed:.2f} s ({count / max(elapsed, 1e-9):.0f} rows/s).')
+    return 0
+
+
+if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
+    exit(main(usage(argv[1:])))
@@ -0,0 +1,126 @@
+"""
+It stresses a thread-safe Controller shared by a growing number of threads and reports the lookup throughput.
+Run it with the datamodel folder on the path, e.g. PYTHONPATH=datamodel python utils/stress.py.
+"""
+
+from argparse import ArgumentParser, Namespace
+from logging import getLogger, basicConfig, INFO
+from sqlite3 import connect
+from sys import argv, exit
+from threading import Barrier, Thread
+from time import perf_counter
+from typing import Any, List
+
+from configuration import configuration as cfg
+from controller import Controller
+from rawengine import schema
+
+
+def zipcodes(countrycode: str, count: int) -> List[Any]:
+    """
+    It returns up to count distinct zipcodes of the given country.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param count: The maximum number of zipcodes.
+    :type count: int.
+
+    :return: See description.
+    :rtype: List[Any].
+    """
+    table, _, zipcode_column = schema(countrycode)
+    connection = connect(cfg['db_folder'] / f'zipcodes_{countrycode}.db')
+    try:
+        rows = connection.execute(f'SELECT DISTINCT "{zipcode_column}" FROM {table} LIMIT ?', (count,)).fetchall()
+        return [row[0] for row in rows]
+    finally:
+        connection.close()
+
+
+def throughput(controller: Controller, countrycode: str, keys: List[Any], threads: int, lookups: int) -> float:
+    """
+    It runs the given number of lookups on each of the given number of threads sharing the controller.
+
+    :param controller: The shared controller.
+    :type controller: Controller.
+
+    :param countrycode: The country code.
+    :type countrycode: str.
+
+    :param keys: The zipcodes to look up, in round robin.
+    :type keys: List[Any].
+
+    :param threads: The number of threads.
+    :type threads: int.
+
+    :param lookups: The number of lookups run by each thread.
+    :type lookups: int.
+
+    :return: It returns the overall number of lookups per second.
+    :rtype: float.
+    """
+    barrier = Barrier(threads + 1)
+    failures = []
+
+    def work(offset: int) -> None:
+        barrier.wait()
+        for n in range(lookups):
+            if controller.placenames_by_zipcode(countrycode, keys[(offset + n) % len(keys)]) is None:
+                failures.append(n)
+
+    workers = [Thread(target=work, args=(n * 97,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = perf_counter() - start
+    if failures:
+        raise RuntimeError(f'{len(failures)} lookups failed with {threads} threads')
+    return threads * lookups / elapsed
+
+
+def usage(args: List[str]) -> Namespace:
+    """
+    It parses the given args (usually from sys.argv) and checks they conform to the rules of the application.
+
+    :param args:    The command line arguments to be parsed.
+    :type args:     List[str].
+
+    :return: See description.
+    :rtype: Namespace.
+    """
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--country', default='US', help='country to look up')
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'memory', 'mmap'], help='lookup backend')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help='thread counts to run')
+    parser.add_argument('--lookups', type=int, default=5000, help='lookups run by each thread')
+    return parser.parse_args(args)
+
+
+def main(args: Namespace) -> int:
+    """
+    It runs the stress test.
+
+    :param args:    The parsed command line arguments as returned by usage();
+    :type args:     Namespace.
+
+    :return: The value returned to the OS.
+    :rtype: int.
+    """
+    logger = getLogger(__name__)
+    keys = zipcodes(args.country, 1000)
+    with Controller(backend=args.backend, thread_safe=True) as controller:
+        baseline = None
+        for threads in args.threads:
+            rate = throughput(controller, args.country, keys, threads, args.lookups)
+            baseline = baseline or rate
+            logger.info(f'{threads:3d} threads: {rate:12.0f} lookups/s ({rate / baseline:.2f}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    basicConfig(level=INFO, format='%(message)s')
+    exit(main(usage(argv[1:])))